@@ -0,0 +1,404 @@
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import asyncio
+import fnmatch
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.environ.get("BENCHMARK_RESULTS", os.path.join(REPO_DIR, ".cache", "benchmark_results.jsonl"))
+
+# Com respostas gravadas, o limitador do Google Trends só atrasaria a medição
+os.environ.setdefault("TRENDS_RATE", "1000")
+os.environ.setdefault("TRENDS_BURST", "1000")
+os.environ.setdefault("TRENDS_MAX_RETRIES", "0")
+
+# Exportações de exemplo versionadas no repositório, usadas como entrada dos estágios offline
+SAMPLE_INPUTS = ['*_videos.tsv', '*_mentions.tsv', '*_tweets.tsv']
+# Contagens no formato exibido pelo trends24 e pelo TikTok Creative Center
+SAMPLE_COUNTS = ['2.504.253', '12K', '1.2K', '1,5 mi', '850', '3,4 mil Postagens', '1.2M', '']
+# Equivalentes em XPath dos seletores do TikTok, para ler o HTML gravado sem navegador
+TIKTOK_TITLE_XPATH = "//span[contains(@class, 'CardPc_titleText__')]"
+TIKTOK_POSTS_XPATH = "//div[contains(@class, 'CardPc_pavWrapper__')]"
+
+_BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registra um benchmark: a função prepara os dados e retorna o que será medido.
+
+    O callable retornado executa o estágio uma vez e devolve quantos itens processou.
+    ImportError ou FileNotFoundError na preparação marcam o benchmark como ignorado.
+    """
+    def register(setup):
+        _BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class Context:
+    """Dados compartilhados pelos benchmarks de uma execução."""
+
+    def __init__(self, scale=50, ner=False):
+        self.scale = scale
+        self.ner = ner
+
+    def samples(self, patterns=SAMPLE_INPUTS):
+        """Exportações de exemplo do repositório, repetidas scale vezes."""
+        import pandas as pd
+        paths = [path for pattern in patterns for path in sorted(glob.glob(os.path.join(REPO_DIR, pattern)))
+                 if not path.endswith('_processed.tsv')]
+        if not paths:
+            raise FileNotFoundError("Nenhuma exportação de exemplo encontrada.")
+        frames = [pd.read_csv(path, sep='\t', encoding='utf-8', dtype=str, keep_default_na=False) for path in paths]
+        return pd.concat(frames * self.scale, ignore_index=True)
+
+    def descriptions(self):
+        return self.samples()['Description'].tolist()
+
+    def sample_file(self, name):
+        """Uma exportação de exemplo do repositório, como linhas [coluna1, coluna2, ...]."""
+        import pandas as pd
+        return pd.read_csv(os.path.join(REPO_DIR, name), sep='\t', encoding='utf-8').values.tolist() * self.scale
+
+
+@benchmark('hashtags.parse_twitter')
+def bench_parse_twitter(ctx):
+    import gethashtags
+    import replay
+    cassette = replay.Cassette('trends')
+    page = cassette.body('trends24.in') or cassette.page('trends24.in')
+    return lambda: len(gethashtags.parse_twitter_trends_html(page))
+
+
+@benchmark('hashtags.parse_tiktok')
+def bench_parse_tiktok(ctx):
+    import gethashtags
+    import replay
+    from lxml import html
+    page = replay.Cassette('trends').page('ads.tiktok.com')
+
+    def run():
+        tree = html.fromstring(page)
+        hashtags = [element.text_content() for element in tree.xpath(TIKTOK_TITLE_XPATH)]
+        posts = [element.text_content() for element in tree.xpath(TIKTOK_POSTS_XPATH)]
+        return len(gethashtags.parse_tiktok_trends(hashtags, posts))
+    return run
+
+
+@benchmark('hashtags.normalize_vectorized')
+def bench_normalize_vectorized(ctx):
+    import pandas as pd
+    import trendranking
+    counts = pd.Series(SAMPLE_COUNTS * ctx.scale * 100, dtype=object)
+
+    def run():
+        trendranking.parse_counts(counts)
+        return len(counts)
+    return run
+
+
+@benchmark('trends.rank')
+def bench_rank(ctx):
+    import trendranking
+    trends = trendranking.trends_frame({
+        'twitter': ctx.sample_file('twitter_trends.tsv'),
+        'tiktok': ctx.sample_file('tiktok_trends.tsv'),
+        'google': ctx.sample_file('google_trends.tsv'),
+    })
+
+    def run():
+        return len(trendranking.rank_trends(trends))
+    return run
+
+
+@benchmark('hashtags.google')
+def bench_google(ctx):
+    import gethashtags
+    import trendscache
+    import replay
+    replay.Cassette('trends')  # Falha cedo se não houver gravação
+
+    def run():
+        trendscache.get_cache().clear()
+        with replay.use_cassette('trends'):
+            trends = gethashtags.get_google_trends()
+        if trends is None:
+            raise RuntimeError("O Google Trends não pôde ser reproduzido; veja os logs.")
+        return len(trends)
+    return run
+
+
+@benchmark('hashtags.save')
+def bench_save_trends(ctx):
+    import pandas as pd
+    import gethashtags
+    twitter = ctx.sample_file('twitter_trends.tsv')
+    tiktok = ctx.sample_file('tiktok_trends.tsv')
+    google = pd.DataFrame(ctx.sample_file('google_trends.tsv'), columns=["Hashtag", "Contagem"])
+
+    def run():
+        gethashtags.combine_and_save_trends(twitter, tiktok, google)
+        return len(twitter) + len(tiktok) + len(google)
+    return run
+
+
+def _replay_script(name, cleanup=()):
+    import replay
+    replay.Cassette(name).load_meta()  # Falha cedo se não houver gravação
+
+    def run():
+        # Estado deixado pela execução anterior mudaria as requisições feitas
+        for path in cleanup:
+            if os.path.exists(path):
+                os.remove(path)
+        replay.run_script(name)
+    return run
+
+
+@benchmark('twitter.collect')
+def bench_twitter(ctx):
+    import replay
+    import gettwitterposts
+    tweets = sum(len(json.loads(body).get('data', [])) for body in replay.Cassette('twitter').bodies('api.twitter.com'))
+    run_script = _replay_script('twitter', [gettwitterposts.STATE_PATH])
+    return lambda: (run_script(), tweets)[1]
+
+
+@benchmark('instagram.collect')
+def bench_instagram(ctx):
+    import replay
+    import getinstagramposts
+    # As credenciais não são verificadas na reprodução, mas o script exige que existam
+    os.environ.setdefault("INSTAGRAM_USERNAME", "replay")
+    os.environ.setdefault("INSTAGRAM_PASSWORD", "replay")
+    requests_made = len(replay.Cassette('instagram').urls())
+    run_script = _replay_script('instagram', [getinstagramposts.SESSION_PATH])
+    return lambda: (run_script(), requests_made)[1]
+
+
+@benchmark('tiktok.save')
+def bench_tiktok_save(ctx):
+    import gettiktokvideos
+    rows = ctx.samples(['*_videos.tsv'])
+    videos = [{
+        'id': f"{row['ID']}-{i}", 'desc': row['Description'], 'createTime': row['Create Time'],
+        'stats': {'diggCount': row['Likes'], 'commentCount': row['Comments'], 'shareCount': row['Shares']},
+    } for i, row in enumerate(rows.to_dict('records'))]
+
+    def run():
+        asyncio.run(gettiktokvideos.save_videos_to_tsv(videos, "benchmark_videos.tsv"))
+        return len(videos)
+    return run
+
+
+@benchmark('nlp.language')
+def bench_language(ctx):
+    import languageid
+    texts = ctx.descriptions()
+
+    def run():
+        languageid.clear_cache()
+        return len(languageid.detect_languages(texts))
+    return run
+
+
+@benchmark('nlp.rules')
+def bench_rules(ctx):
+    import nlprules
+    texts = ctx.descriptions()
+    return lambda: len([nlprules.extract_tokens(text) for text in texts])
+
+
+@benchmark('nlp.ner')
+def bench_ner(ctx):
+    if not ctx.ner:
+        raise FileNotFoundError("Use --ner para medir o NER com os modelos do spaCy.")
+    import nlpmodels
+    texts = ctx.descriptions()
+    registry = nlpmodels.ModelRegistry()
+    registry.extract_entities(texts[:50])  # Carrega os modelos fora da medição
+    return lambda: len(registry.extract_entities(texts))
+
+
+@benchmark('nlp.analyze')
+def bench_analyze(ctx):
+    import nlpmodels
+    import nlpsocialsposts
+    rows = ctx.samples(['*_mentions.tsv', '*_tweets.tsv'])
+    rows.to_csv("benchmark_tweets.tsv", sep='\t', index=False)
+    models = nlpmodels.ModelRegistry(ner=ctx.ner)
+
+    def run():
+        nlpsocialsposts.analyze_file("benchmark_tweets.tsv", models)
+        return len(rows)
+    return run
+
+
+@benchmark('storage.append')
+def bench_storage(ctx):
+    import storage
+    rows = ctx.samples(['*_mentions.tsv', '*_tweets.tsv']).to_dict('records')
+    runs = iter(range(sys.maxsize))
+
+    def run():
+        # IDs novos a cada execução, para medir inserções e não só a deduplicação
+        prefix = next(runs)
+        records = [(f"{prefix}-{i}", row['Create Time'], row['Author ID'], row['Description'], 'benchmark')
+                   for i, row in enumerate(rows)]
+        storage.append('tweets', records, 'twitter')
+        return len(records)
+    return run
+
+
+def _measure(name, setup, ctx, repeat):
+    try:
+        run = setup(ctx)
+    except (ImportError, FileNotFoundError) as e:
+        return {'name': name, 'status': 'skipped', 'reason': str(e)}
+    except (Exception, SystemExit) as e:
+        return {'name': name, 'status': 'failed', 'reason': f"preparação: {e}"}
+
+    timings = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            items = run()
+            timings.append(time.perf_counter() - start)
+        # Uma execução extra com o tracemalloc, que deixaria as medições de tempo mais lentas
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    except (Exception, SystemExit) as e:
+        return {'name': name, 'status': 'failed', 'reason': str(e)}
+
+    best = min(timings)
+    return {
+        'name': name, 'status': 'ok', 'items': items,
+        'best_s': round(best, 6), 'median_s': round(statistics.median(timings), 6),
+        'items_per_s': round(items / best, 1) if best else None, 'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(patterns=None, repeat=5, scale=50, ner=False):
+    """Executa os benchmarks selecionados em um diretório temporário e retorna os resultados."""
+    names = [name for name in _BENCHMARKS if not patterns or any(fnmatch.fnmatch(name, p) for p in patterns)]
+    ctx = Context(scale, ner)
+    workdir = tempfile.mkdtemp(prefix="cb_scrapping_benchmark_")
+    cwd = os.getcwd()
+    # Os TSVs, caches e o histórico gravados pelos estágios ficam no diretório temporário
+    os.chdir(workdir)
+    try:
+        results = []
+        for name in names:
+            result = _measure(name, _BENCHMARKS[name], ctx, repeat)
+            logger.info(f"{name}: {result['status']}")
+            results.append(result)
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results, scale, repeat, path=RESULTS_PATH):
+    """Acrescenta a execução ao histórico, identificada pelo commit atual."""
+    entry = {
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'scale': scale, 'repeat': repeat, 'results': results,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, mode='a', encoding='utf-8') as file:
+        file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return entry
+
+
+def load_history(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def previous_run(entry, history):
+    """Última execução de outro commit, com a mesma escala, para comparar."""
+    for candidate in reversed(history):
+        if candidate['commit'] != entry['commit'] and candidate['scale'] == entry['scale']:
+            return candidate
+    return None
+
+
+def _change(current, previous):
+    if current is None or not previous:
+        return ''
+    return f"{(current - previous) / previous * 100:+.1f}%"
+
+
+def print_results(entry, baseline=None):
+    before = {result['name']: result for result in (baseline or {}).get('results', []) if result['status'] == 'ok'}
+    if baseline:
+        print(f"Comparando {entry['commit']} com {baseline['commit']} ({baseline['timestamp']})")
+    print(f"{'benchmark':<24}{'itens':>9}{'itens/s':>14}{'melhor (s)':>12}{'pico (KB)':>12}{'Δ tempo':>10}{'Δ pico':>10}")
+    for result in entry['results']:
+        if result['status'] != 'ok':
+            print(f"{result['name']:<24} {result['status']}: {result['reason']}")
+            continue
+        old = before.get(result['name'], {})
+        print(f"{result['name']:<24}{result['items']:>9}{result['items_per_s'] or 0:>14,.1f}{result['best_s']:>12.4f}"
+              f"{result['peak_kb']:>12,.1f}{_change(result['best_s'], old.get('best_s')):>10}"
+              f"{_change(result['peak_kb'], old.get('peak_kb')):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede vazão e pico de memória dos estágios dos coletores, sem rede.",
+        epilog="Grave as fixtures antes com: python replay.py record trends gethashtags.py, "
+               "python replay.py record twitter gettwitterposts.py --full --username ... e "
+               "python replay.py record instagram getinstagramposts.py."
+    )
+    parser.add_argument("--only", nargs="*", help="Padrões dos benchmarks a executar (ex.: 'nlp.*').")
+    parser.add_argument("--repeat", type=int, default=5, help="Execuções medidas de cada benchmark.")
+    parser.add_argument("--scale", type=int, default=50, help="Quantas vezes as exportações de exemplo são repetidas.")
+    parser.add_argument("--ner", action="store_true", help="Inclui o NER do spaCy (exige os modelos instalados).")
+    parser.add_argument("--no-save", action="store_true", help="Não grava o resultado no histórico.")
+    parser.add_argument("--list", action="store_true", help="Lista os benchmarks disponíveis.")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs dos coletores durante as medições.")
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(_BENCHMARKS))
+        sys.exit(0)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    history = load_history()
+    results = run_benchmarks(args.only, args.repeat, args.scale, args.ner)
+    entry = {'commit': _git('rev-parse', '--short', 'HEAD'), 'scale': args.scale, 'results': results}
+    if not args.no_save:
+        entry = save_results(results, args.scale, args.repeat)
+    print_results(entry, previous_run(entry, history))
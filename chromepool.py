@@ -0,0 +1,213 @@
+import os
+import queue
+import shutil
+import atexit
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import WebDriverException
+import metrics
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Configurações padrão do pool (podem ser sobrescritas por variáveis de ambiente)
+POOL_SIZE = int(os.environ.get("CHROME_POOL_SIZE", "2"))
+MAX_USES = int(os.environ.get("CHROME_POOL_MAX_USES", "20"))
+# Diretório onde cada pool cria o seu perfil temporário (padrão: o temporário do sistema)
+PROFILE_DIR = os.environ.get("CHROME_PROFILE_DIR", tempfile.gettempdir())
+WINDOW_SIZE = (1300, 900)  # Largura maior que 1200, exigida pelo layout do TikTok
+
+
+@lru_cache(maxsize=1)
+def resolve_driver_path():
+    """Resolve o binário do chromedriver uma única vez por processo."""
+    logger.info("Resolvendo o chromedriver...")
+    with metrics.span('chrome.driver_install'):
+        return ChromeDriverManager().install()
+
+
+def build_options(slot, profile_dir):
+    """Monta as opções do Chrome headless usadas por todos os navegadores do pool."""
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument(f"window-size={WINDOW_SIZE[0]},{WINDOW_SIZE[1]}")
+    # O Chrome não permite dois processos no mesmo diretório, então cada slot usa
+    # um subdiretório do perfil do pool
+    options.add_argument(f"--user-data-dir={os.path.join(profile_dir, f'slot{slot}')}")
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    # Não espera imagens, fontes e afins: o DOM pronto já basta para os scrapers
+    options.page_load_strategy = 'eager'
+    return options
+
+
+class _PooledDriver:
+    """Navegador do pool com o número de vezes em que já foi usado."""
+
+    def __init__(self, slot, profile_dir):
+        self.slot = slot
+        self.uses = 0
+        service = Service(resolve_driver_path())
+        with metrics.span('chrome.start'):
+            self.driver = webdriver.Chrome(service=service, options=build_options(slot, profile_dir))
+
+    def reset(self):
+        """Limpa o estado deixado pelo job anterior."""
+        driver = self.driver
+        for handle in driver.window_handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(driver.window_handles[0])
+        driver.delete_all_cookies()
+        try:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except WebDriverException:
+            pass  # about:blank e páginas de erro não têm storage
+        driver.get("about:blank")
+        driver.set_window_size(*WINDOW_SIZE)
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except WebDriverException as e:
+            logger.warning(f"Erro ao fechar o navegador do slot {self.slot}: {e}")
+
+
+class ChromePool:
+    """Pool de navegadores Chrome headless mantidos aquecidos entre os jobs.
+
+    Cada pool usa um perfil próprio em PROFILE_DIR, apagado no close(), para que dois
+    processos (cron e servidor, por exemplo) nunca abram o Chrome no mesmo diretório.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_uses=MAX_USES, profile_root=PROFILE_DIR):
+        self.size = size
+        self.max_uses = max_uses
+        os.makedirs(profile_root, exist_ok=True)
+        self.profile_dir = tempfile.mkdtemp(prefix="cb_scrapping_chrome_", dir=profile_root)
+        self._idle = queue.LifoQueue()
+        self._free_slots = queue.Queue()
+        for slot in range(size):
+            self._free_slots.put(slot)
+        # Limita quantos navegadores podem estar emprestados ao mesmo tempo
+        self._available = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._borrowed = set()
+
+    def _remove_profile(self, slot):
+        shutil.rmtree(os.path.join(self.profile_dir, f'slot{slot}'), ignore_errors=True)
+        try:
+            os.rmdir(self.profile_dir)
+        except OSError:
+            pass  # Ainda há perfis de navegadores emprestados
+
+    def _checkout(self):
+        # Prefere um navegador já aquecido; só cria outro se não houver ocioso
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        slot = self._free_slots.get_nowait()
+        try:
+            logger.info(f"Iniciando navegador do pool (slot {slot})...")
+            return _PooledDriver(slot, self.profile_dir)
+        except Exception:
+            self._free_slots.put(slot)
+            raise
+
+    def _checkin(self, pooled, healthy):
+        pooled.uses += 1
+        if healthy and pooled.uses < self.max_uses and not self._closed:
+            try:
+                pooled.reset()
+                self._idle.put(pooled)
+                return
+            except WebDriverException as e:
+                logger.warning(f"Falha ao reiniciar o navegador do slot {pooled.slot}: {e}")
+        elif healthy and not self._closed:
+            logger.info(f"Reciclando navegador do slot {pooled.slot} após {pooled.uses} usos.")
+        pooled.quit()
+        self._free_slots.put(pooled.slot)
+        if self._closed:
+            # Navegador devolvido depois do close(): o perfil do slot já pode ser apagado
+            self._remove_profile(pooled.slot)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Empresta um navegador do pool e o devolve limpo ao final do bloco."""
+        if self._closed:
+            raise RuntimeError("O pool de navegadores já foi fechado.")
+        with metrics.span('chrome.acquire'):
+            if not self._available.acquire(timeout=-1 if timeout is None else timeout):
+                raise TimeoutError("Nenhum navegador disponível no pool.")
+            try:
+                pooled = self._checkout()
+            except Exception:
+                self._available.release()
+                raise
+        with self._lock:
+            self._borrowed.add(pooled.slot)
+        healthy = True
+        try:
+            yield pooled.driver
+        except WebDriverException:
+            healthy = False
+            raise
+        finally:
+            try:
+                self._checkin(pooled, healthy)
+            finally:
+                with self._lock:
+                    self._borrowed.discard(pooled.slot)
+                self._available.release()
+
+    def close(self):
+        """Fecha todos os navegadores ociosos do pool e apaga os perfis deles."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            pooled.quit()
+            self._free_slots.put(pooled.slot)
+        # Os perfis dos navegadores ainda emprestados são apagados quando eles voltam
+        with self._lock:
+            borrowed = set(self._borrowed)
+        for slot in set(range(self.size)) - borrowed:
+            self._remove_profile(slot)
+        logger.info("Pool de navegadores fechado.")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Retorna o pool compartilhado do processo, criando-o na primeira chamada."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = ChromePool()
+            # Garante que nenhum Chrome fique órfão quando o processo terminar
+            atexit.register(_pool.close)
+        return _pool
+
+
+def chrome_driver(timeout=None):
+    """Atalho para emprestar um navegador do pool compartilhado."""
+    return get_pool().driver(timeout=timeout)
@@ -1,193 +1,309 @@
+import os
 import csv
-import time
+import json
+import argparse
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
 import pandas as pd
+from lxml import html
 from pytrends.request import TrendReq
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, ElementClickInterceptedException
+from chromepool import chrome_driver
+from pagewaits import wait_until, wait_for_rerender, element_texts
+import trendsbatch
+import trendscache
+import trendsscheduler
+import storage
+import trendranking
+import metrics
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Seletor dos títulos dos cards de hashtag no TikTok Creative Center
+TIKTOK_TITLE_SELECTOR = "span[class*='CardPc_titleText__']"
+TIKTOK_POSTS_SELECTOR = "div[class*='CardPc_pavWrapper__']"
+
+# Sessão HTTP reaproveitada (keep-alive) para as páginas lidas sem navegador
+http_session = requests.Session()
+http_session.headers["User-Agent"] = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0 Safari/537.36"
+HTTP_TIMEOUT = 15
+CACHE_DIR = ".cache"
+
+# XPath equivalente ao seletor CSS td.<classe>, sem depender do cssselect
+_CLASS_XPATH = "//td[contains(concat(' ', normalize-space(@class), ' '), ' {} ')]"
+
+# Scripts que leem as tabelas inteiras em uma única chamada ao navegador, em vez de
+# uma requisição ao WebDriver para cada elemento
+_TEXTS_BY_SELECTOR_SCRIPT = """
+return Array.prototype.map.call(arguments, function (selector) {
+    return Array.from(document.querySelectorAll(selector)).map(function (e) { return e.innerText; });
+});
+"""
+
+def parse_counts(texts):
+    """Converte os textos das contagens em inteiros com trendranking.parse_counts; None se não houver número."""
+    return [None if pd.isna(count) else int(count) for count in trendranking.parse_counts(list(texts))]
+
+
+def extract_texts(driver, *selectors):
+    """Retorna os textos de todos os elementos de cada seletor com um único execute_script."""
+    return driver.execute_script(_TEXTS_BY_SELECTOR_SCRIPT, *selectors) or [[] for _ in selectors]
+
 # Função para combinar os dados em um único DataFrame e salvar como TSV
+@metrics.timed('trends.combine')
 def combine_and_save_trends(twitter_data, tiktok_data, google_data):
     logger.info("Combinando dados de todas as plataformas...")
 
-    # Convertendo os dados em DataFrames
-    twitter_df = pd.DataFrame(twitter_data, columns=["Hashtag", "Contagem"])
-    tiktok_df = pd.DataFrame(tiktok_data, columns=["Hashtag", "Contagem"])
-    google_df = google_data  # Já é um DataFrame
+    # Uma linha por plataforma e hashtag (plataformas que falharam ficam de fora)
+    trends = trendranking.trends_frame({'twitter': twitter_data, 'tiktok': tiktok_data, 'google': google_data})
+    trends['count'] = trendranking.parse_counts(trends['count'])
 
-    # Concatenando os DataFrames
-    combined_df = pd.concat([twitter_df, tiktok_df, google_df], ignore_index=True)
-
-    # Salvando em um arquivo TSV
+    # Hashtags iguais entre plataformas viram uma linha, ordenada pela pontuação combinada
+    ranked = trendranking.rank_trends(trends)
     tsv_filename = "all_trends.tsv"
-    combined_df.to_csv(tsv_filename, sep='\t', index=False)
+    ranked.drop(columns=['snapshot_date']).to_csv(tsv_filename, sep='\t', index=False)
+    metrics.current().add(rows=len(ranked))
+
+    logger.info(f"Ranking combinado de {len(ranked)} tendências salvo em {tsv_filename}.")
+
+    # Um snapshot por plataforma no histórico, com as contagens já normalizadas
+    for platform, df in trends.groupby('platform'):
+        storage.record('trends', df[['hashtag', 'count']].itertuples(index=False, name=None), platform)
+    return ranked
+
+def _conditional_get(url, cache_path):
+    """GET com ETag/If-Modified-Since; em caso de 304 devolve o HTML salvo da última resposta."""
+    cached = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as file:
+            cached = json.load(file)
+
+    headers = {}
+    if cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+
+    with metrics.span('http.conditional_get') as stage:
+        response = http_session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        stage.add(bytes=len(response.content))
+        if response.status_code == 304 and 'html' in cached:
+            logger.info("Página não mudou desde a última coleta (304).")
+            stage.add(cache_hits=1)
+            return cached['html']
+    response.raise_for_status()
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, mode='w', encoding='utf-8') as file:
+        json.dump({
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'html': response.text,
+        }, file)
+    return response.text
+
+
+def twitter_trend_rows(topics, counts):
+    """Monta as linhas [tópico, contagem] a partir dos textos das células td.topic e td.count."""
+    return [[topic.strip(), count] for topic, count in zip(topics, parse_counts(counts))]
+
+
+def _inner_text(element):
+    # Como o innerText do navegador para texto inline: espaços e quebras de linha viram um espaço
+    return ' '.join(element.text_content().split())
+
+
+@metrics.timed('twitter_trends.parse')
+def parse_twitter_trends_html(page):
+    """Extrai as linhas [tópico, contagem] da tabela do trends24 a partir do HTML."""
+    tree = html.fromstring(page)
+    topics = [_inner_text(cell) for cell in tree.xpath(_CLASS_XPATH.format('topic'))]
+    counts = [_inner_text(cell) for cell in tree.xpath(_CLASS_XPATH.format('count'))]
+    return twitter_trend_rows(topics, counts)
+
+
+def fetch_twitter_trends_static(url):
+    """Caminho rápido sem navegador: baixa o HTML do trends24 e lê a tabela com lxml."""
+    try:
+        page = _conditional_get(url, os.path.join(CACHE_DIR, 'trends24.json'))
+    except requests.RequestException as e:
+        logger.warning(f"Falha ao baixar {url} sem navegador: {e}")
+        return []
+    return parse_twitter_trends_html(page)
+
 
-    logger.info(f"Dados combinados salvos em {tsv_filename}.")
+@metrics.timed('twitter_trends.save')
+def save_twitter_trends(trends):
+    """Salva as tendências do Twitter em TSV."""
+    # Salvar em CSV com tabulação
+    csv_filename = "twitter_trends.tsv"
+    with open(csv_filename, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, delimiter='\t')
+        writer.writerow(["Hashtags", "Contagem"])
+        writer.writerows(trends)
+
+    logger.info(f"Tendências salvas em {csv_filename}.")
 
 # Funções para extrair tendências das plataformas
-# Função para extrair tendências do Twitter usando Selenium
-def get_twitter_trends(url):
+# Função para extrair tendências do Twitter (HTML estático, com Selenium como alternativa)
+@metrics.timed('twitter_trends.collect')
+def get_twitter_trends(url, wait_budgets=None, use_browser=False):
     logger.info("Iniciando extração de tendências do Twitter...")
-    service = Service(ChromeDriverManager().install())
-    options = Options()
-    options.add_argument("--headless")
-    driver = webdriver.Chrome(service=service, options=options)
-    
-    try:
+    trends = [] if use_browser else fetch_twitter_trends_static(url)
+    if trends:
+        logger.info(f"Tendências extraídas sem navegador: {len(trends)} itens encontrados.")
+    else:
+        logger.info("Tabela não encontrada no HTML estático. Usando o Selenium...")
+        with chrome_driver() as driver:
+            trends = _scrape_twitter_trends(driver, url, wait_budgets)
+
+    if trends:
+        save_twitter_trends(trends)
+    metrics.current().add(rows=len(trends))
+    return trends
+
+
+def _scrape_twitter_trends(driver, url, wait_budgets=None):
+    with metrics.span('twitter_trends.page_load'):
         driver.get(url)
-        logger.info("Página do Twitter Trends carregada.")
+    logger.info("Página do Twitter Trends carregada.")
 
-        # Verifica e fecha possíveis pop-ups sobrepondo a página
-        try:
-            logger.info("Verificando pop-ups na página...")
-            overlay_close_button = WebDriverWait(driver, 5).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Fechar' or contains(@class, 'close')]"))
-            )
-            overlay_close_button.click()
-            logger.info("Pop-up fechado com sucesso.")
-        except (TimeoutException, NoSuchElementException):
-            logger.info("Nenhum pop-up encontrado.")
-
-        # Usa JavaScript para forçar o clique no botão
-        try:
-            logger.info("Procurando botão de navegação...")
-            button = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "tab-link-table"))
-            )
-            driver.execute_script("arguments[0].scrollIntoView(true);", button)
-            driver.execute_script("arguments[0].click();", button)
-            logger.info("Botão clicado com sucesso.")
-        except TimeoutException:
-            logger.error("Botão de navegação não encontrado.")
-            return []
-
-        # Espera até que os elementos com os tópicos estejam visíveis
-        logger.info("Esperando que os tópicos sejam carregados...")
-        WebDriverWait(driver, 10).until(
-            EC.visibility_of_all_elements_located((By.CSS_SELECTOR, "td.topic a"))
+    # Verifica e fecha possíveis pop-ups sobrepondo a página
+    try:
+        logger.info("Verificando pop-ups na página...")
+        overlay_close_button = wait_until(
+            driver,
+            EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Fechar' or contains(@class, 'close')]")),
+            "twitter_popup", wait_budgets
         )
+        overlay_close_button.click()
+        logger.info("Pop-up fechado com sucesso.")
+    except (TimeoutException, NoSuchElementException):
+        logger.info("Nenhum pop-up encontrado.")
 
-        topic_elements = driver.find_elements(By.CSS_SELECTOR, "td.topic")
-        count_elements = driver.find_elements(By.CSS_SELECTOR, "td.count")
-
-        trends = []  
-        for count, topic in zip(count_elements, topic_elements):
-            formatted_count = count.text.replace('.', '').replace(',', '')  # Remove pontos e vírgulas
-            trends.append([topic.text, formatted_count])
+    # Usa JavaScript para forçar o clique no botão
+    try:
+        logger.info("Procurando botão de navegação...")
+        button = wait_until(
+            driver, EC.presence_of_element_located((By.ID, "tab-link-table")), "twitter_tab", wait_budgets
+        )
+        driver.execute_script("arguments[0].scrollIntoView(true);", button)
+        driver.execute_script("arguments[0].click();", button)
+        logger.info("Botão clicado com sucesso.")
+    except TimeoutException:
+        logger.error("Botão de navegação não encontrado.")
+        return []
 
-        logger.info(f"Tendências extraídas: {len(trends)} itens encontrados.")
-        
-        # Salvar em CSV com tabulação
-        csv_filename = "twitter_trends.tsv"
-        with open(csv_filename, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file, delimiter='\t')
-            writer.writerow(["Hashtags", "Contagem"])
-            writer.writerows(trends)
+    # Espera até que os elementos com os tópicos estejam visíveis
+    logger.info("Esperando que os tópicos sejam carregados...")
+    wait_until(
+        driver, EC.visibility_of_all_elements_located((By.CSS_SELECTOR, "td.topic a")), "twitter_topics", wait_budgets
+    )
 
-        logger.info(f"Tendências salvas em {csv_filename}.")
-        return trends if trends else []
+    with metrics.span('twitter_trends.extract') as stage:
+        topics, counts = extract_texts(driver, "td.topic", "td.count")
+        trends = twitter_trend_rows(topics, counts)
+        stage.add(rows=len(trends))
 
-    finally:
-        logger.info("Fechando o navegador do Twitter Trends.")
-        driver.quit()
+    logger.info(f"Tendências extraídas: {len(trends)} itens encontrados.")
+    return trends
 
 
 # Função para extrair hashtags populares do TikTok usando Selenium
-def get_tiktok_trends(url):
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--start-maximized")
-    options.add_argument("window-size=1300,900")  # Largura maior que 1200
+@metrics.timed('tiktok_trends.collect')
+def get_tiktok_trends(url, wait_budgets=None):
+    # O pool já abre as janelas com largura maior que 1200
+    with chrome_driver() as driver:
+        return _scrape_tiktok_trends(driver, url, wait_budgets)
 
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
 
-    try:
+def _scrape_tiktok_trends(driver, url, wait_budgets=None):
+    with metrics.span('tiktok_trends.page_load'):
         driver.get(url)
-        logger.info("Página do TikTok Trends carregada.")
+    logger.info("Página do TikTok Trends carregada.")
 
-        # Espera até que o botão de seleção de idioma esteja presente e clique nele
-        try:
-            logger.info("Procurando o botão de seleção de idioma...")
-            language_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, "span[data-testid='cc_rimless_select_language']"))
-            )
-            logger.info("Botão de idioma encontrado. Clicando...")
-            language_button.click()
-            
-            # Clica na opção "Português (Brasil)"
-            logger.info("Procurando a opção 'Português (Brasil)'...")
-            portuguese_option = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//div[text()='Português (Brasil)']"))
-            )
-            logger.info("Opção 'Português (Brasil)' encontrada. Clicando...")
-            portuguese_option.click()
-        except Exception as e:
-            logger.error(f"Erro ao selecionar o idioma: {e}")
-            return []
-
-        # Aguarda alguns segundos para que a página seja atualizada
-        logger.info("Aguardando a atualização da página...")
-        time.sleep(10)
-
-        # Fecha o pop-up do Symphony Assistant, se presente
-        try:
-            logger.info("Procurando o botão de fechamento do pop-up...")
-            close_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//img[@alt='TikTok Symphony Assistant' and contains(@src, 'logo_v2_close.svg')]"))
-            )
-            close_button.click()
-            logger.info("Botão de fechar clicado com sucesso.")
-        except (TimeoutException, NoSuchElementException) as e:
-            logger.error(f"Erro ao interagir com o botão de fechamento do pop-up: {e}")
-
-        # Coleta todas as hashtags e postagens visíveis de uma vez
-        logger.info("Coletando hashtags e postagens...")
-        hashtag_elements = driver.find_elements(By.CSS_SELECTOR, "span[class*='CardPc_titleText__']")
-        post_elements = driver.find_elements(By.CSS_SELECTOR, "div[class*='CardPc_pavWrapper__']")
-
-        trends = []
-        for hashtag, post in zip(hashtag_elements, post_elements):
-            if '#' in hashtag.text:
-                # Limpa quebras de linha e texto adicional indesejado
-                clean_hashtag = hashtag.text.replace('\n', ' ').strip()
-                clean_post = post.text.replace('\n', ' ').replace('Postagens', '').strip()
-
-                # Substitui 'k' ou 'K' por '000'
-                if 'k' in clean_post.lower():
-                    clean_post = clean_post.lower().replace('k', '000')
-
-                trends.append([clean_hashtag, clean_post])
-
-        if trends:
-            logger.info(f"Total de hashtags e postagens extraídas: {len(trends)}")
-        else:
-            logger.warning("Nenhuma hashtag ou postagem encontrada.")
+    # Espera até que o botão de seleção de idioma esteja presente e clique nele
+    try:
+        logger.info("Procurando o botão de seleção de idioma...")
+        language_button = wait_until(
+            driver,
+            EC.element_to_be_clickable((By.CSS_SELECTOR, "span[data-testid='cc_rimless_select_language']")),
+            "tiktok_language_button", wait_budgets
+        )
+        logger.info("Botão de idioma encontrado. Clicando...")
+        language_button.click()
+        
+        # Clica na opção "Português (Brasil)"
+        logger.info("Procurando a opção 'Português (Brasil)'...")
+        portuguese_option = wait_until(
+            driver,
+            EC.element_to_be_clickable((By.XPATH, "//div[text()='Português (Brasil)']")),
+            "tiktok_language_option", wait_budgets
+        )
+        logger.info("Opção 'Português (Brasil)' encontrada. Clicando...")
+        titles_before = element_texts(driver, TIKTOK_TITLE_SELECTOR)
+        portuguese_option.click()
+    except Exception as e:
+        logger.error(f"Erro ao selecionar o idioma: {e}")
+        return []
 
-        # Salvar em formato CSV sem aspas
-        csv_filename = "tiktok_trends.tsv"
-        with open(csv_filename, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file, delimiter='\t', quoting=csv.QUOTE_MINIMAL, escapechar='\\')
-            writer.writerow(["Hashtag", "Contagem"])
-            writer.writerows(trends)
+    # Aguarda os cards re-renderizarem no novo idioma (ou o DOM estabilizar)
+    logger.info("Aguardando a atualização da página...")
+    wait_for_rerender(driver, TIKTOK_TITLE_SELECTOR, titles_before, "tiktok_rerender", overrides=wait_budgets)
 
-        logger.info(f"Tendências salvas em {csv_filename}.")
-        return trends
+    # Fecha o pop-up do Symphony Assistant, se presente
+    try:
+        logger.info("Procurando o botão de fechamento do pop-up...")
+        close_button = wait_until(
+            driver,
+            EC.element_to_be_clickable((By.XPATH, "//img[@alt='TikTok Symphony Assistant' and contains(@src, 'logo_v2_close.svg')]")),
+            "tiktok_popup", wait_budgets
+        )
+        close_button.click()
+        logger.info("Botão de fechar clicado com sucesso.")
+    except (TimeoutException, NoSuchElementException) as e:
+        logger.error(f"Erro ao interagir com o botão de fechamento do pop-up: {e}")
+
+    # Coleta todas as hashtags e postagens visíveis de uma vez
+    logger.info("Coletando hashtags e postagens...")
+    with metrics.span('tiktok_trends.extract') as stage:
+        hashtags, posts = extract_texts(driver, TIKTOK_TITLE_SELECTOR, TIKTOK_POSTS_SELECTOR)
+        trends = parse_tiktok_trends(hashtags, posts)
+        stage.add(rows=len(trends))
+    if trends:
+        logger.info(f"Total de hashtags e postagens extraídas: {len(trends)}")
+    else:
+        logger.warning("Nenhuma hashtag ou postagem encontrada.")
+
+    save_tiktok_trends(trends)
+    return trends
+
+def parse_tiktok_trends(hashtags, posts):
+    """Monta as linhas [hashtag, contagem] a partir dos textos dos cards do TikTok."""
+    cards = [(hashtag, post) for hashtag, post in zip(hashtags, posts) if '#' in hashtag]
+    # Limpa quebras de linha e converte '1.2K Postagens' em 1200
+    counts = parse_counts(post.replace('Postagens', '') for _, post in cards)
+    return [[hashtag.replace('\n', ' ').strip(), count] for (hashtag, _), count in zip(cards, counts)]
 
-    finally:
-        logger.info("Fechando o navegador do TikTok Trends.")
-        driver.quit()
 
+@metrics.timed('tiktok_trends.save')
+def save_tiktok_trends(trends):
+    """Salva as tendências do TikTok em TSV."""
+    # Salvar em formato CSV sem aspas
+    csv_filename = "tiktok_trends.tsv"
+    with open(csv_filename, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, delimiter='\t', quoting=csv.QUOTE_MINIMAL, escapechar='\\')
+        writer.writerow(["Hashtag", "Contagem"])
+        writer.writerows(trends)
+
+    logger.info(f"Tendências salvas em {csv_filename}.")
+
+@metrics.timed('google_trends.collect')
 def get_google_trends():
     logger.info("Iniciando extração de tendências do Google Trends...")
 
@@ -198,32 +314,32 @@ def get_google_trends():
     try:
         # Obter as tendências diárias do Google Trends
         logger.info("Obtendo tendências diárias do Google Trends...")
-        trends = pytrends.trending_searches(pn='brazil')
+        with metrics.span('google_trends.trending'):
+            trends = trendscache.cached(
+                lambda: trendsscheduler.run(pytrends.trending_searches, pn='brazil', priority=trendsscheduler.PRIORITY_HIGH),
+                'trending_searches', geo='brazil', ttl=30 * 60
+            )
         trends.columns = ['Hashtag']  # Renomear a coluna
 
-        # Criar uma lista para armazenar os dados de contagem
-        contagens = []
-
-        # Obter o volume de pesquisa nas últimas 24 horas para cada tendência
-        for hashtag in trends['Hashtag']:
-            logger.info(f"Consultando dados de interesse ao longo do tempo para: {hashtag}")
-            pytrends.build_payload([hashtag], cat=0, timeframe='now 1-d', geo='BR')
-            interest = pytrends.interest_over_time()
-
-            if not interest.empty:
-                # Obter o último valor de contagem (mais recente)
-                last_value = interest[hashtag].iloc[-1]
-                contagens.append(last_value)
-            else:
-                contagens.append(0)  # Adicionar 0 se não houver dados
+        # Obter o volume de pesquisa nas últimas 24 horas, consultando 5 tendências por vez
+        logger.info("Consultando dados de interesse ao longo do tempo para as tendências...")
+        interest = trendsbatch.interest_over_time(
+            pytrends, trends['Hashtag'].tolist(), timeframe='now 1-d', geo='BR', priority=trendsscheduler.PRIORITY_HIGH
+        )
 
-        # Adicionar a coluna 'Contagem' ao DataFrame
-        trends['Contagem'] = contagens
+        # Usar o último valor (mais recente) de cada tendência, ou 0 se não houver dados
+        if not interest.empty:
+            last_values = interest.iloc[-1]
+            trends['Contagem'] = [round(last_values[hashtag]) for hashtag in trends['Hashtag']]
+        else:
+            trends['Contagem'] = 0
 
         # Salvar em um arquivo TSV com tabulação
         tsv_filename = "google_trends.tsv"
         trends.to_csv(tsv_filename, sep='\t', index=False)
         logger.info(f"Tendências salvas em {tsv_filename}.")
+        logger.info(f"Cache do Google Trends: {trendscache.stats()}")
+        metrics.current().add(rows=len(trends))
 
         return trends
 
@@ -231,21 +347,59 @@ def get_google_trends():
         logger.error(f"Erro durante a extração das tendências: {e}")
         return None
 
+# Executa os três coletores em paralelo e combina o que estiver disponível
+def collect_all_trends(twitter_url, tiktok_url):
+    """Roda os coletores de Twitter, TikTok e Google ao mesmo tempo e salva os dados combinados."""
+    collectors = {
+        "twitter": (get_twitter_trends, (twitter_url,)),
+        "tiktok": (get_tiktok_trends, (tiktok_url,)),
+        "google": (get_google_trends, ()),
+    }
+    results = {name: None for name in collectors}
+
+    with ThreadPoolExecutor(max_workers=len(collectors)) as executor:
+        futures = {executor.submit(func, *args): name for name, (func, args) in collectors.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+                logger.info(f"Coleta de {name} finalizada.")
+            except Exception as e:
+                logger.error(f"Erro na coleta de {name}: {e}")
+
+    failed = [name for name, data in results.items() if data is None or len(data) == 0]
+    if len(failed) == len(collectors):
+        logger.error("Erro ao obter dados de todas as plataformas. Verifique os logs para detalhes.")
+        return results
+    if failed:
+        logger.warning(f"Sem dados de: {', '.join(failed)}. Salvando resultado parcial.")
+
+    # Combinar e salvar os dados extraídos
+    combine_and_save_trends(results["twitter"], results["tiktok"], results["google"])
+    return results
+
 # Função principal
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coletar tendências do Twitter, TikTok e Google.")
+    parser.add_argument("--sequencial", action="store_true", help="Executa os coletores um após o outro.")
+    args = parser.parse_args()
+
     # URLs para tendências
     twitter_url = 'https://trends24.in/brazil/'
     titktok_url = 'https://ads.tiktok.com/business/creativecenter/inspiration/popular/hashtag/pc/pt?from=001119'
 
-    # Extrair dados de cada plataforma
-    twitter_trends_data = get_twitter_trends(twitter_url)
-    tiktok_trends_data = get_tiktok_trends(titktok_url)
-    google_trends_data = get_google_trends()
+    if args.sequencial:
+        # Extrair dados de cada plataforma
+        twitter_trends_data = get_twitter_trends(twitter_url)
+        tiktok_trends_data = get_tiktok_trends(titktok_url)
+        google_trends_data = get_google_trends()
 
-    # Combinar e salvar os dados extraídos
-    if twitter_trends_data and tiktok_trends_data and google_trends_data is not None:
-        combine_and_save_trends(twitter_trends_data, tiktok_trends_data, google_trends_data)
+        # Combinar e salvar os dados extraídos
+        if twitter_trends_data or tiktok_trends_data or google_trends_data is not None:
+            combine_and_save_trends(twitter_trends_data, tiktok_trends_data, google_trends_data)
+        else:
+            logger.error("Erro ao obter dados de uma ou mais plataformas. Verifique os logs para detalhes.")
     else:
-        logger.error("Erro ao obter dados de uma ou mais plataformas. Verifique os logs para detalhes.")
+        collect_all_trends(twitter_url, titktok_url)
 
-    logger.info("Processo concluído.")
\ No newline at end of file
+    logger.info("Processo concluído.")
@@ -1,24 +1,59 @@
 import asyncio
 import logging
+import argparse
 import csv
 from instagrapi import Client
+from instagrapi.exceptions import LoginRequired, ChallengeRequired
 import os
+import storage
+import metrics
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Arquivo com as configurações da sessão, reaproveitadas entre execuções
+SESSION_PATH = os.getenv("INSTAGRAM_SESSION_PATH", os.path.join(".cache", "instagram_session.json"))
+
+def _save_session(client):
+    """ Grava a sessão com os cookies e o estado do dispositivo atualizados pelo Instagram. """
+    os.makedirs(os.path.dirname(SESSION_PATH) or ".", exist_ok=True)
+    client.dump_settings(SESSION_PATH)
+    logger.info(f"Sessão do Instagram salva em {SESSION_PATH}")
+
 # Autenticação com instagrapi
+@metrics.timed('instagram.login')
 def authenticate():
+    """ Autentica reaproveitando a sessão salva; faz login completo só se ela não for válida. """
     client = Client()
     username = os.getenv("INSTAGRAM_USERNAME")
     password = os.getenv("INSTAGRAM_PASSWORD")
     if not username or not password:
         logger.error("Credenciais do Instagram não configuradas.")
         raise SystemExit("Erro: Credenciais do Instagram não configuradas.")
+
+    if os.path.exists(SESSION_PATH):
+        try:
+            client.load_settings(SESSION_PATH)
+            client.login(username, password)
+            client.get_timeline_feed()  # Confirma que a sessão ainda é aceita
+            logger.info("Sessão do Instagram reaproveitada.")
+            metrics.current().add(cache_hits=1)
+            _save_session(client)
+            return client
+        except LoginRequired:
+            logger.warning("Sessão salva expirada. Fazendo login novamente...")
+            # Mantém os identificadores do dispositivo para não parecer um aparelho novo
+            old_settings = client.get_settings()
+            client.set_settings({})
+            client.set_uuids(old_settings["uuids"])
+
     client.login(username, password)
+    client.get_timeline_feed()  # Atualiza cookies e estado do dispositivo antes de gravar
+    _save_session(client)
     return client
 
+@metrics.timed('instagram.save')
 def save_posts_to_tsv(posts, filename):
     """ Salva informações dos posts em um arquivo TSV. """
     with open(filename, mode='w', newline='', encoding='utf-8') as file:
@@ -33,24 +68,76 @@ def save_posts_to_tsv(posts, filename):
                 post.taken_at
             ])
     logger.info(f"Posts salvos em {filename}")
+    # No histórico a legenda vai completa
+    records = [(str(post.pk), post.caption_text, post.like_count, post.comment_count,
+                post.taken_at.isoformat() if post.taken_at else None) for post in posts]
+    storage.record('instagram_posts', records, 'instagram')
 
-def fetch_user_posts(client, username):
+def fetch_user_posts(client, username, amount=5):
     """ Busca posts de um usuário específico. """
-    user_id = client.user_id_from_username(username)
-    posts = client.user_medias(user_id, amount=5)  # Limita a 5 posts
+    with metrics.span('instagram.fetch', source='user') as stage:
+        user_id = client.user_id_from_username(username)
+        posts = client.user_medias(user_id, amount=amount)
+        stage.add(rows=len(posts))
     save_posts_to_tsv(posts, f"{username}_posts.tsv")
 
-def fetch_hashtag_posts(client, hashtag):
+def fetch_hashtag_posts(client, hashtag, amount=5):
     """ Busca posts de uma hashtag específica. """
-    posts = client.hashtag_medias_recent(hashtag, amount=5)  # Limita a 5 posts
+    with metrics.span('instagram.fetch', source='hashtag') as stage:
+        posts = client.hashtag_medias_recent(hashtag, amount=amount)
+        stage.add(rows=len(posts))
     save_posts_to_tsv(posts, f"{hashtag}_hashtag_posts.tsv")
 
-async def main():
-    client = authenticate()
-    username = "casabahia"
-    hashtag = "blackfriday"
-    fetch_user_posts(client, username)
-    fetch_hashtag_posts(client, hashtag)
+def clone_client(client):
+    """ Novo Client com a mesma sessão autenticada, sem novo login.
+
+    O Client guarda estado de cada requisição (last_json, last_response, cabeçalhos da
+    sessão HTTP), então buscas simultâneas precisam de um Client cada.
+    """
+    clone = Client()
+    clone.set_settings(client.get_settings())
+    return clone
+
+async def _run_with_client(clients, func, target, amount):
+    """ Executa uma busca bloqueante em uma thread com um Client livre; retorna o erro, se houver.
+
+    sessao_expirada indica que o Instagram recusou a sessão (login ou desafio), e não só a busca.
+    """
+    client = await clients.get()
+    try:
+        await asyncio.to_thread(func, client, target, amount)
+        return None
+    except Exception as e:
+        logger.error(f"Erro ao executar {func.__name__}({target!r}): {e}")
+        return {'alvo': target, 'erro': str(e), 'sessao_expirada': isinstance(e, (LoginRequired, ChallengeRequired))}
+    finally:
+        clients.put_nowait(client)
+
+async def main(usernames=("casabahia",), hashtags=("blackfriday",), amount=5, concurrency=4, client=None):
+    """ Busca os posts de usuários e hashtags; client permite reaproveitar uma sessão já autenticada.
+
+    Cada busca simultânea usa seu próprio Client, copiado da sessão autenticada.
+    Retorna a lista de buscas que falharam, com o alvo e o erro.
+    """
+    client = client or authenticate()
+    tasks = [(fetch_user_posts, username) for username in usernames]
+    tasks += [(fetch_hashtag_posts, hashtag) for hashtag in hashtags]
+    clients = asyncio.Queue()
+    for _ in range(max(1, min(concurrency, len(tasks)))):
+        clients.put_nowait(clone_client(client))
+    results = await asyncio.gather(*(_run_with_client(clients, func, target, amount) for func, target in tasks))
+    errors = [error for error in results if error]
+    if errors:
+        logger.warning(f"{len(errors)} de {len(tasks)} buscas do Instagram falharam.")
+    return errors
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Buscar posts de usuários e hashtags do Instagram.")
+    parser.add_argument("--users", nargs="*", default=["casabahia"], help="Usuários cujos posts serão buscados.")
+    parser.add_argument("--hashtags", nargs="*", default=["blackfriday"], help="Hashtags cujos posts serão buscados.")
+    parser.add_argument("--amount", type=int, default=5, help="Posts por usuário ou hashtag.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Buscas simultâneas.")
+    args = parser.parse_args()
+
+    if asyncio.run(main(args.users, args.hashtags, args.amount, args.concurrency)):
+        raise SystemExit(1)
@@ -1,6 +1,10 @@
 import logging
 import pandas as pd
 from pytrends.request import TrendReq
+import trendsbatch
+import trendscache
+import trendsscheduler
+import storage
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -15,12 +19,12 @@ def fetch_trends_by_category(category, products):
     timeframe = 'now 7-d'  # Última semana
 
     # Coleta de dados de tendências para os produtos
+    # Os produtos são consultados juntos (até 5 por requisição), na mesma escala
+    logger.info(f"Coletando dados para os produtos: {', '.join(products)}")
+    interest_data = trendsbatch.interest_over_time(pytrends, products, timeframe=timeframe, geo='BR')
+
     trends_data = []
     for product in products:
-        logger.info(f"Coletando dados para o produto: {product}")
-        pytrends.build_payload([product], timeframe=timeframe, geo='BR')
-        interest_data = pytrends.interest_over_time()
-
         if not interest_data.empty:
             avg_interest = round(interest_data[product].mean())
             trends_data.append([product, avg_interest])
@@ -34,6 +38,10 @@ def fetch_trends_by_category(category, products):
     filename = f"{category.replace(' ', '_').lower()}.tsv"
     df.to_csv(filename, sep='\t', index=False)
     logger.info(f"Dados de tendências salvos em {filename}")
+    storage.record('product_trends', [(product, category, 'BR', score) for product, score in trends_data], 'google')
+    logger.info(f"Consultas ao Google Trends: {trendsscheduler.stats()}")
+    logger.info(f"Cache do Google Trends: {trendscache.stats()}")
+    return df
 
 if __name__ == "__main__":
     # Definindo categorias
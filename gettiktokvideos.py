@@ -1,8 +1,11 @@
 import asyncio
 import logging
+import argparse
 import csv
 from TikTokApi import TikTokApi
 import os
+import storage
+import metrics
 
 # Configuração básica do logger para captura e exibição de logs
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,12 +30,15 @@ Obtenha seu próprio ms_token dos cookies do TikTok.com e configure como uma var
     Copie o valor do ms_token: Esse é o token que você precisa.
 """
 
-ms_token = os.environ.get("TIKTOK_MS_TOKEN")
+# Aceita vários tokens separados por vírgula para distribuir as sessões entre eles
+ms_tokens = [token.strip() for token in os.environ.get("TIKTOK_MS_TOKEN", "").split(",") if token.strip()]
+ms_token = ms_tokens[0] if ms_tokens else None
 if not ms_token:
     # Se o token não estiver configurado, registra um erro e encerra a execução
     logger.error("Variável de ambiente TIKTOK_MS_TOKEN não configurada.")
     raise SystemExit("Erro: ms_token não configurado.")
 
+@metrics.timed('tiktok.save')
 async def save_videos_to_tsv(videos, filename):
     """ Salva informações de vídeos em um arquivo TSV. """
     with open(filename, mode='w', newline='', encoding='utf-8') as file:
@@ -50,40 +56,94 @@ async def save_videos_to_tsv(videos, filename):
                 video['stats']['shareCount']
             ])
     logger.info(f"Vídeos salvos em {filename}")
+    records = [(video['id'], video.get('desc'), video.get('createTime'), video['stats'].get('diggCount'),
+                video['stats'].get('commentCount'), video['stats'].get('shareCount')) for video in videos]
+    await asyncio.to_thread(storage.record, 'tiktok_videos', records, 'tiktok')
 
-async def fetch_user_videos(username):
-    """ Busca e armazena vídeos de um usuário específico. """
-    async with TikTokApi() as api:
+class TikTokSessionManager:
+    """Abre as sessões do TikTokApi uma única vez e as empresta para buscas concorrentes.
+
+    Cada sessão é um contexto do navegador do Playwright; as buscas esperam uma sessão
+    livre e as sessões usam os ms_tokens em rodízio.
+    """
+
+    def __init__(self, tokens, num_sessions=1):
+        self.tokens = tokens
+        self.num_sessions = max(num_sessions, 1)
+        self.api = None
+        self._free = asyncio.Queue()
+
+    async def __aenter__(self):
+        self.api = TikTokApi()
+        await self.api.__aenter__()
+        # Repete os tokens em rodízio para que cada sessão receba um deles
+        tokens = [self.tokens[i % len(self.tokens)] for i in range(self.num_sessions)]
         try:
-            await api.create_sessions(ms_tokens=[ms_token], num_sessions=1)
-            user = api.user(username=username)
-            videos = []
-            # Busca até 5 vídeos do usuário
-            async for video in user.videos(count=5):
-                videos.append(video.as_dict())
-            if videos:
-                await save_videos_to_tsv(videos, f"{username}_videos.tsv")
-        except Exception as e:
-            logger.error(f"Erro ao buscar vídeos do usuário {username}: {e}")
+            with metrics.span('tiktok.sessions'):
+                await self.api.create_sessions(ms_tokens=tokens, num_sessions=self.num_sessions)
+        except Exception:
+            await self.api.__aexit__(None, None, None)
+            raise
+        for index in range(len(self.api.sessions)):
+            self._free.put_nowait(index)
+        logger.info(f"{len(self.api.sessions)} sessões do TikTok criadas.")
+        return self
 
-async def fetch_trending_videos(hashtag):
-    """ Busca e armazena vídeos trending de uma hashtag específica. """
-    async with TikTokApi() as api:
+    async def __aexit__(self, *exc):
+        await self.api.__aexit__(*exc)
+
+    async def _collect(self, videos_of, description, count):
+        index = await self._free.get()
         try:
-            await api.create_sessions(ms_tokens=[ms_token], num_sessions=1)
-            tag = api.hashtag(name=hashtag)
-            videos = []
-            # Busca até 5 vídeos trending da hashtag
-            async for video in tag.videos(count=5):
-                videos.append(video.as_dict())
-            if videos:
-                await save_videos_to_tsv(videos, f"{hashtag}_trending_videos.tsv")
+            with metrics.span('tiktok.fetch') as stage:
+                videos = []
+                async for video in videos_of(count=count, session_index=index):
+                    videos.append(video.as_dict())
+                stage.add(rows=len(videos))
+            return videos
         except Exception as e:
-            logger.error(f"Erro ao buscar vídeos da hashtag {hashtag}: {e}")
+            logger.error(f"Erro ao buscar vídeos {description}: {e}")
+            return []
+        finally:
+            self._free.put_nowait(index)
+
+    async def fetch_user_videos(self, username, count=5):
+        """ Busca e armazena vídeos de um usuário específico. """
+        videos = await self._collect(self.api.user(username=username).videos, f"do usuário {username}", count)
+        if videos:
+            await save_videos_to_tsv(videos, f"{username}_videos.tsv")
+        return videos
+
+    async def fetch_trending_videos(self, hashtag, count=5):
+        """ Busca e armazena vídeos trending de uma hashtag específica. """
+        videos = await self._collect(self.api.hashtag(name=hashtag).videos, f"da hashtag {hashtag}", count)
+        if videos:
+            await save_videos_to_tsv(videos, f"{hashtag}_trending_videos.tsv")
+        return videos
+
+async def fetch_all(usernames, hashtags, count=5, num_sessions=1):
+    """Busca vídeos de vários usuários e hashtags ao mesmo tempo, com um único navegador."""
+    async with TikTokSessionManager(ms_tokens, num_sessions) as manager:
+        await asyncio.gather(
+            *(manager.fetch_user_videos(username, count) for username in usernames),
+            *(manager.fetch_trending_videos(hashtag, count) for hashtag in hashtags)
+        )
+
+async def fetch_user_videos(username, count=5):
+    """ Busca e armazena vídeos de um usuário específico. """
+    await fetch_all([username], [], count)
+
+async def fetch_trending_videos(hashtag, count=5):
+    """ Busca e armazena vídeos trending de uma hashtag específica. """
+    await fetch_all([], [hashtag], count)
 
 if __name__ == "__main__":
-    username = "casasbahia"
-    hashtag = "blackfriday"
+    parser = argparse.ArgumentParser(description="Buscar vídeos de usuários e hashtags do TikTok.")
+    parser.add_argument("--users", nargs="*", default=["casasbahia"], help="Usuários cujos vídeos serão buscados.")
+    parser.add_argument("--hashtags", nargs="*", default=["blackfriday"], help="Hashtags cujos vídeos serão buscados.")
+    parser.add_argument("--count", type=int, default=5, help="Vídeos por usuário ou hashtag.")
+    parser.add_argument("--num_sessions", type=int, default=1, help="Sessões do navegador usadas em paralelo.")
+    args = parser.parse_args()
+
     logger.info("Iniciando a busca de vídeos...")
-    asyncio.run(fetch_user_videos(username))
-    asyncio.run(fetch_trending_videos(hashtag))
+    asyncio.run(fetch_all(args.users, args.hashtags, args.count, args.num_sessions))
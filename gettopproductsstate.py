@@ -1,8 +1,10 @@
 import pandas as pd
 from pytrends.request import TrendReq
 import logging
-import time
-import random
+import trendsbatch
+import trendscache
+import trendsscheduler
+import storage
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -53,43 +55,66 @@ product_categories  = {
 #]
 
 
-def get_trends_by_state(state):
-    logger.info(f"Iniciando consulta de tendências para o estado: {state}")
-    results = []
+def get_trends_by_region(timeframe='now 7-d'):
+    """Consulta o interesse de todos os produtos em todos os estados de uma só vez.
+
+    Usa geo='BR' com resolução REGION, que já devolve os 27 estados em cada resposta,
+    então há uma requisição por lote de produtos em vez de uma por estado e produto.
+    Retorna um DataFrame indexado pelo código do estado ('BR-SP') com um produto por coluna.
+    """
+    products = [product for category_products in product_categories.values() for product in category_products]
+    logger.info(f"Consultando {len(products)} produtos para todos os estados...")
+    return trendsbatch.interest_by_region(
+        pytrends, products, timeframe=timeframe, geo='BR', resolution='REGION',
+        priority=trendsscheduler.PRIORITY_LOW
+    )
+
+
+def get_trends_by_state(state, regional_interest):
+    """Monta o ranking de produtos de um estado a partir da consulta nacional."""
+    geo_code = f'BR-{state}'
+    if geo_code not in regional_interest.index:
+        return None
 
+    scores = regional_interest.loc[geo_code]
+    results = []
     for category, products in product_categories.items():
-        logger.info(f"Consultando categoria: {category}")
-        # Seleciona um subconjunto aleatório de produtos para consulta
-        selected_products = random.sample(products, min(len(products), random.randint(3, 5)))
-        for product in selected_products:
-            try:
-                pytrends.build_payload([product], timeframe='now 7-d', geo=f'BR-{state}')
-                regional_interest = pytrends.interest_by_region(resolution='REGION')
-                if state in regional_interest.index:
-                    score = regional_interest.loc[state, product]
-                    results.append({
-                        'Estado': state,
-                        'Produto': product
-                    })
-
-            except Exception as e:
-                logger.error(f"Erro ao consultar produto {product}: {e}")
-
-            # Espera aleatória entre consultas para evitar bloqueio
-            time.sleep(random.randint(120, 900))  # Espera de 2 a 15 minutos
-
-    return pd.DataFrame(results) if results else None
+        for product in products:
+            results.append({
+                'Estado': state,
+                'Categoria': category,
+                'Produto': product,
+                'Score': round(scores[product], 2)
+            })
+
+    df = pd.DataFrame(results).sort_values('Score', ascending=False, kind='stable')
+    return df if df['Score'].any() else None
 
 def process_all_regions():
+    """Salva o ranking de cada estado e retorna a lista dos estados com dados."""
+    try:
+        regional_interest = get_trends_by_region()
+    except Exception as e:
+        logger.error(f"Erro ao consultar tendências por estado: {e}")
+        return []
+
+    saved = []
     for state in states:
         logger.info(f"Processando o estado {state}")
-        state_results  = get_trends_by_state(state)
-        if state_results  is not None:
+        state_results = get_trends_by_state(state, regional_interest)
+        if state_results is not None:
             filename = f"tendencias_{state.lower()}.tsv"
-            state_results .to_csv(filename, sep='\t', index=False)
+            state_results.to_csv(filename, sep='\t', index=False)
             logger.info(f"Tendências salvas em {filename}.")
+            storage.record('product_trends', state_results[['Produto', 'Categoria', 'Estado', 'Score']]
+                           .itertuples(index=False, name=None), 'google')
+            saved.append(state)
         else:
             logger.warning(f"Nenhum dado encontrado para o estado {state}")
 
+    logger.info(f"Consultas ao Google Trends: {trendsscheduler.stats()}")
+    logger.info(f"Cache do Google Trends: {trendscache.stats()}")
+    return saved
+
 if __name__ == "__main__":
     process_all_regions()
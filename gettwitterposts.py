@@ -1,8 +1,16 @@
 import os
-import requests
+import re
 import csv
+import json
+import time
+import asyncio
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
 import argparse
 import logging
+import storage
+import metrics
 
 # Configuração do logger para exibir informações no console durante a execução
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -13,6 +21,17 @@ bearer_token = os.environ.get("TWITTER_BEARER_TOKEN")
 if not bearer_token:
     logger.error("TWITTER_BEARER_TOKEN não encontrado. Configure-o como uma variável de ambiente.")
 
+# HTTP/2 no cliente assíncrono depende do pacote opcional h2
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Nomes aceitos para os arquivos de saída das consultas: sem barras nem '..', que gravariam
+# fora do diretório de trabalho
+QUERY_NAME_PATTERN = re.compile(r'[\w-]+')
+
 # URL para o endpoint de busca de tweets recentes na API do Twitter
 search_url = "https://api.twitter.com/2/tweets/search/recent"
 
@@ -25,57 +44,213 @@ def bearer_oauth(r):
     r.headers["User-Agent"] = "v2RecentSearchPython"
     return r
 
+# Sessão HTTP compartilhada: mantém a conexão com a API aberta entre as páginas
+session = requests.Session()
+session.auth = bearer_oauth
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# Arquivo com o progresso de cada consulta: since_id já coletado por completo e, se a
+# última execução parou no limite de páginas, o next_token para continuar de onde parou
+STATE_PATH = os.path.join(".cache", "twitter_since_ids.json")
+MAX_RETRIES = 3
+
+# Último estado de limite de requisições informado pela API
+_rate_limit = {'remaining': None, 'reset': 0}
+
+def _wait_rate_limit_reset():
+    """Dorme até o horário de reinício da janela informada em x-rate-limit-reset."""
+    delay = max(0, _rate_limit['reset'] - time.time()) + 1
+    logger.warning(f"Limite de requisições atingido. Aguardando {delay:.0f}s pelo reinício da janela.")
+    time.sleep(delay)
+
 def connect_to_endpoint(url, params):
     """
     Função para fazer a requisição ao endpoint fornecido.
-    Exibe a URL da requisição e trata o status da resposta, retornando os dados em JSON se bem-sucedido.
+    Respeita os cabeçalhos x-rate-limit-remaining/reset: espera a janela reiniciar quando
+    o limite acaba ou quando a API responde 429. Retorna os dados em JSON se bem-sucedido.
     """
-    response = requests.get(url, auth=bearer_oauth, params=params)
-    logger.info(f"Requisição para URL: {response.url}")
-    if response.status_code != 200:
-        logger.error(f"Erro na requisição: {response.status_code} - {response.text}")
+    with metrics.span('twitter_api.request') as stage:
+        for attempt in range(MAX_RETRIES + 1):
+            if _rate_limit['remaining'] == 0 and _rate_limit['reset'] > time.time():
+                _wait_rate_limit_reset()
+
+            response = session.get(url, params=params, timeout=30)
+            logger.info(f"Requisição para URL: {response.url}")
+            stage.add(bytes=len(response.content))
+            if 'x-rate-limit-remaining' in response.headers:
+                _rate_limit['remaining'] = int(response.headers['x-rate-limit-remaining'])
+                _rate_limit['reset'] = int(response.headers.get('x-rate-limit-reset', 0))
+
+            if response.status_code == 429 and attempt < MAX_RETRIES:
+                _rate_limit['remaining'] = 0
+                _rate_limit['reset'] = max(_rate_limit['reset'], time.time() + 60 * (attempt + 1))
+                stage.add(retries=1)
+                continue
+            if response.status_code != 200:
+                logger.error(f"Erro na requisição: {response.status_code} - {response.text}")
+                return None
+            return response.json()
         return None
-    return response.json()
 
-def fetch_mentions(username, max_results):
+def load_states():
+    """Carrega o progresso de todas as consultas."""
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH, encoding='utf-8') as file:
+        return json.load(file)
+
+def load_state(query):
+    """Progresso de uma consulta: {'since_id', 'newest_id', 'next_token'}, com os ausentes em None.
+
+    next_token e newest_id só existem quando a paginação anterior não chegou ao fim.
     """
-    Busca menções recentes a um usuário específico.
-    - username: nome do usuário a ser buscado.
-    - max_results: máximo de resultados (ajustado para valores entre 10 e 100).
+    state = load_states().get(query)
+    if not isinstance(state, dict):
+        state = {'since_id': state}  # Formato antigo: só o since_id
+    return {'since_id': state.get('since_id'), 'newest_id': state.get('newest_id'),
+            'next_token': state.get('next_token')}
+
+def save_state(query, state):
+    states = load_states()
+    states[query] = {name: value for name, value in state.items() if value}
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    with open(STATE_PATH + '.tmp', mode='w', encoding='utf-8') as file:
+        json.dump(states, file, ensure_ascii=False, indent=2)
+    os.replace(STATE_PATH + '.tmp', STATE_PATH)
+
+def finish_collection(query, state, newest_id, meta):
+    """Registra o progresso ao final de uma coleta incremental.
+
+    - meta: meta da última página recebida, ou None se nenhuma chegou.
+    O since_id só avança para o tweet mais novo quando a paginação terminou (sem
+    next_token). Se parou no limite de páginas ou em um erro, guarda o next_token e mantém
+    o since_id antigo, para que a próxima execução busque os tweets que ficaram no meio.
     """
-    max_results = max(10, min(max_results, 100))  # Limita max_results entre 10 e 100
-    query = f"@{username} -is:retweet"  # Busca tweets com menções ao usuário, excluindo retweets
+    if meta is None:
+        if state['next_token']:
+            # O token pode ter expirado: recomeça a partir do since_id antigo, sem lacunas
+            logger.warning(f"Não foi possível continuar a paginação de '{query}'; ela será refeita.")
+            save_state(query, {'since_id': state['since_id']})
+        return
+    # Numa continuação, o tweet mais novo é o da primeira página da execução que começou a paginação
+    newest_id = state['newest_id'] or newest_id
+    next_token = meta.get("next_token")
+    if next_token:
+        logger.info(f"Limite de páginas atingido; a próxima execução continua a paginação de '{query}'.")
+        save_state(query, {'since_id': state['since_id'], 'newest_id': newest_id, 'next_token': next_token})
+    elif newest_id or state['next_token']:
+        save_state(query, {'since_id': newest_id or state['since_id']})
+
+def _resume_params(query, max_results, state):
+    """Parâmetros da primeira requisição, continuando a paginação pendente se houver."""
     query_params = {
         'query': query,
         'tweet.fields': 'created_at,author_id,text',
-        'max_results': max_results
+        'max_results': max(10, min(max_results, 100))  # Limita max_results entre 10 e 100
     }
+    if state['since_id']:
+        query_params['since_id'] = state['since_id']
+    if state['next_token']:
+        query_params['next_token'] = state['next_token']
+    return query_params
+
+def iter_pages(query, max_results, max_pages=1, since_id=None, next_token=None):
+    """
+    Percorre as páginas da busca recente seguindo meta.next_token.
+    - max_results: tweets por página (ajustado para valores entre 10 e 100).
+    - max_pages: limite de páginas (orçamento de requisições) por consulta.
+    - since_id: retorna apenas tweets mais novos que esse id.
+    - next_token: continua uma paginação interrompida.
+    Gera tuplas (tweets da página, meta da página).
+    """
+    query_params = _resume_params(query, max_results, {'since_id': since_id, 'next_token': next_token})
+
+    for _ in range(max_pages):
+        response_json = connect_to_endpoint(search_url, query_params)
+        if not response_json:
+            return
+        meta = response_json.get("meta", {})
+        yield response_json.get("data", []), meta
+        if not meta.get("next_token"):
+            return
+        query_params['next_token'] = meta['next_token']
+
+def mentions_query(username):
+    return f"@{username} -is:retweet"  # Busca tweets com menções ao usuário, excluindo retweets
+
+def hashtags_query(hashtags):
+    return " OR ".join(f"#{hashtag}" for hashtag in hashtags) + " -is:retweet"  # Monta query para múltiplas hashtags, excluindo retweets
+
+def fetch_mentions(username, max_results, max_pages=1):
+    """
+    Busca menções recentes a um usuário específico.
+    - username: nome do usuário a ser buscado.
+    - max_results: máximo de resultados por página (ajustado para valores entre 10 e 100).
+    """
     logger.info(f"Buscando menções para @{username}...")
-    response_json = connect_to_endpoint(search_url, query_params)
-    return response_json.get("data", []) if response_json else []
+    return [tweet for page, _ in iter_pages(mentions_query(username), max_results, max_pages) for tweet in page]
 
-def fetch_tweets_by_hashtags(hashtags, max_results):
+def fetch_tweets_by_hashtags(hashtags, max_results, max_pages=1):
     """
     Busca tweets que contêm uma ou mais hashtags.
     - hashtags: lista de hashtags para busca.
-    - max_results: máximo de resultados (ajustado para valores entre 10 e 100).
+    - max_results: máximo de resultados por página (ajustado para valores entre 10 e 100).
     """
-    max_results = max(10, min(max_results, 100))  # Limita max_results entre 10 e 100
-    query = " OR ".join(f"#{hashtag}" for hashtag in hashtags) + " -is:retweet"  # Monta query para múltiplas hashtags, excluindo retweets
-    query_params = {
-        'query': query,
-        'tweet.fields': 'created_at,author_id,text',
-        'max_results': max_results
-    }
     logger.info(f"Buscando tweets com hashtags: {', '.join(hashtags)}")
-    response_json = connect_to_endpoint(search_url, query_params)
-    return response_json.get("data", []) if response_json else []
+    return [tweet for page, _ in iter_pages(hashtags_query(hashtags), max_results, max_pages) for tweet in page]
 
-def save_to_tsv(tweets, filename):
+def write_tweets(writer, tweets):
+    """Escreve tweets em um writer TSV já aberto."""
+    for tweet in tweets:
+        # Remove tabulações e quebras de linha para manter o texto em uma única linha
+        cleaned_text = tweet['text'].replace('\n', ' ').replace('\t', ' ')
+        writer.writerow([tweet['created_at'], tweet['author_id'], cleaned_text])
+
+def store_tweets(tweets, query=''):
+    """Acrescenta os tweets ao histórico, sem duplicar os já gravados."""
+    records = [(tweet['id'], tweet.get('created_at'), tweet.get('author_id'), tweet.get('text'), query)
+               for tweet in tweets if tweet.get('id')]
+    storage.record('tweets', records, platform='twitter')
+
+@metrics.timed('twitter_api.collect')
+def collect_to_tsv(query, filename, max_results, max_pages, incremental=True):
     """
-    Salva a lista de tweets em um arquivo TSV.
+    Coleta a consulta página por página, acrescentando cada página ao TSV assim que chega.
+    Com incremental, busca apenas tweets mais novos que os da última execução.
+    Retorna o número de tweets salvos.
+    """
+    state = load_state(query) if incremental else dict.fromkeys(('since_id', 'newest_id', 'next_token'))
+    if state['since_id']:
+        logger.info(f"Buscando apenas tweets mais novos que {state['since_id']}.")
+
+    new_file = not os.path.exists(filename) or not incremental
+    newest_id = None
+    meta = None
+    total = 0
+    with open(filename, mode='w' if new_file else 'a', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, delimiter='\t')
+        if new_file:
+            writer.writerow(["Create Time", "Author ID", "Description"])
+        for tweets, meta in iter_pages(query, max_results, max_pages, state['since_id'], state['next_token']):
+            # A primeira página traz os tweets mais recentes da consulta
+            newest_id = newest_id or meta.get("newest_id")
+            write_tweets(writer, tweets)
+            file.flush()
+            store_tweets(tweets, query)
+            total += len(tweets)
+            metrics.current().add(rows=len(tweets))
+
+    if incremental:
+        finish_collection(query, state, newest_id, meta)
+    logger.info(f"{total} tweets salvos em {filename}")
+    return total
+
+def save_to_tsv(tweets, filename, query=''):
+    """
+    Salva a lista de tweets em um arquivo TSV e no histórico.
     - tweets: lista de tweets para salvar.
     - filename: nome do arquivo de saída.
+    - query: consulta que originou os tweets, guardada no histórico.
     """
     if not tweets:
         logger.info(f"Nenhum dado para salvar em {filename}")
@@ -85,26 +260,186 @@ def save_to_tsv(tweets, filename):
     with open(filename, mode='w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file, delimiter='\t')
         writer.writerow(["Create Time", "Author ID", "Description"])
-        for tweet in tweets:
-            # Remove tabulações e quebras de linha para manter o texto em uma única linha
-            cleaned_text = tweet['text'].replace('\n', ' ').replace('\t', ' ')
-            writer.writerow([tweet['created_at'], tweet['author_id'], cleaned_text])
+        write_tweets(writer, tweets)
+    store_tweets(tweets, query)
     logger.info(f"Resultados salvos em {filename}")
 
+class AsyncRateLimiter:
+    """Limita as requisições simultâneas ao menor valor entre a concorrência pedida e o
+    saldo informado em x-rate-limit-remaining, esperando o reinício quando o saldo zera."""
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.remaining = None
+        self.reset = 0
+        self.condition = asyncio.Condition()
+
+    def _allowed(self):
+        if self.remaining is None:
+            return self.concurrency
+        return min(self.concurrency, self.remaining)
+
+    async def __aenter__(self):
+        async with self.condition:
+            while True:
+                if self.remaining == 0 and self.reset > time.time():
+                    delay = self.reset - time.time() + 1
+                    logger.warning(f"Limite de requisições atingido. Aguardando {delay:.0f}s pelo reinício da janela.")
+                    # Espera soltando o lock, para que as requisições em andamento possam sair
+                    try:
+                        await asyncio.wait_for(self.condition.wait(), delay)
+                    except asyncio.TimeoutError:
+                        self.remaining = None
+                elif self.in_flight < max(1, self._allowed()):
+                    self.in_flight += 1
+                    return self
+                else:
+                    await self.condition.wait()
+
+    async def __aexit__(self, *exc):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def update(self, response):
+        if 'x-rate-limit-remaining' in response.headers:
+            self.remaining = int(response.headers['x-rate-limit-remaining'])
+            self.reset = int(response.headers.get('x-rate-limit-reset', 0))
+        if response.status_code == 429:
+            self.remaining = 0
+            self.reset = max(self.reset, time.time() + 60)
+
+async def async_connect_to_endpoint(client, limiter, params):
+    """Versão assíncrona de connect_to_endpoint, compartilhando o limitador entre consultas."""
+    with metrics.span('twitter_api.request') as stage:
+        for attempt in range(MAX_RETRIES + 1):
+            async with limiter:
+                response = await client.get(search_url, params=params)
+                limiter.update(response)
+            logger.info(f"Requisição para URL: {response.url}")
+            stage.add(bytes=len(response.content))
+            if response.status_code == 429 and attempt < MAX_RETRIES:
+                stage.add(retries=1)
+                continue
+            if response.status_code != 200:
+                logger.error(f"Erro na requisição: {response.status_code} - {response.text}")
+                return None
+            return response.json()
+        return None
+
+@metrics.timed('twitter_api.collect')
+async def async_collect_to_tsv(client, limiter, query, filename, max_results, max_pages, incremental=True):
+    """Versão assíncrona de collect_to_tsv: mesma paginação, since_id e gravação por página."""
+    state = load_state(query) if incremental else dict.fromkeys(('since_id', 'newest_id', 'next_token'))
+    query_params = _resume_params(query, max_results, state)
+
+    new_file = not os.path.exists(filename) or not incremental
+    newest_id = None
+    meta = None
+    total = 0
+    with open(filename, mode='w' if new_file else 'a', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, delimiter='\t')
+        if new_file:
+            writer.writerow(["Create Time", "Author ID", "Description"])
+        for _ in range(max_pages):
+            response_json = await async_connect_to_endpoint(client, limiter, query_params)
+            if not response_json:
+                break
+            meta = response_json.get("meta", {})
+            newest_id = newest_id or meta.get("newest_id")
+            tweets = response_json.get("data", [])
+            write_tweets(writer, tweets)
+            file.flush()
+            await asyncio.to_thread(store_tweets, tweets, query)
+            total += len(tweets)
+            metrics.current().add(rows=len(tweets))
+            if not meta.get("next_token"):
+                break
+            query_params['next_token'] = meta['next_token']
+
+    if incremental:
+        finish_collection(query, state, newest_id, meta)
+    logger.info(f"{total} tweets salvos em {filename}")
+    return total
+
+def parse_queries(lines):
+    """
+    Interpreta as consultas, uma por linha:
+    - @usuario: menções ao usuário, salvas em usuario_mentions.tsv;
+    - #hashtag: tweets com a hashtag, salvos em hashtag_hashtag_tweets.tsv;
+    - nome<TAB>consulta: consulta livre da API, salva em nome_tweets.tsv.
+    Linhas vazias e iniciadas por ';' são ignoradas, assim como nomes, usuários e hashtags
+    fora de QUERY_NAME_PATTERN, já que viram nomes de arquivo.
+    """
+    queries = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith(';'):
+            continue
+        if '\t' in line:
+            name, query = line.split('\t', 1)
+            name, query, filename = name.strip(), query.strip(), f"{name.strip()}_tweets.tsv"
+        elif line.startswith('@'):
+            name, query, filename = line[1:], mentions_query(line[1:]), f"{line[1:]}_mentions.tsv"
+        elif line.startswith('#'):
+            name, query, filename = line[1:], hashtags_query([line[1:]]), f"{line[1:]}_hashtag_tweets.tsv"
+        else:
+            logger.warning(f"Linha ignorada nas consultas: {line}")
+            continue
+        if not QUERY_NAME_PATTERN.fullmatch(name):
+            logger.warning(f"Nome de consulta inválido, use letras, números, '_' ou '-': {name!r}")
+            continue
+        queries.append((query, filename))
+    return queries
+
+def parse_queries_file(path):
+    """Lê o arquivo de consultas no formato de parse_queries."""
+    with open(path, encoding='utf-8') as file:
+        return parse_queries(file)
+
+async def collect_many(queries, max_results, max_pages, concurrency, incremental=True):
+    """Coleta várias consultas ao mesmo tempo em um cliente HTTP assíncrono compartilhado."""
+    limiter = AsyncRateLimiter(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Authorization": f"Bearer {bearer_token}", "User-Agent": "v2RecentSearchPython"}
+    async with httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits, headers=headers, timeout=30) as client:
+        results = await asyncio.gather(
+            *(async_collect_to_tsv(client, limiter, query, filename, max_results, max_pages, incremental)
+              for query, filename in queries),
+            return_exceptions=True
+        )
+    for (query, _), result in zip(queries, results):
+        if isinstance(result, Exception):
+            logger.error(f"Erro ao coletar a consulta '{query}': {result}")
+    return results
+
 if __name__ == "__main__":
     # Configura argumentos de linha de comando para o script
     parser = argparse.ArgumentParser(description="Buscar menções e tweets com hashtags.")
     parser.add_argument("--username", type=str, help="Usuário para buscar menções.")
     parser.add_argument("--hashtags", nargs="+", type=str, help="Lista de hashtags para buscar tweets.")
-    parser.add_argument("--max_results", type=int, default=10, help="Máximo de resultados (entre 10 e 100).")
+    parser.add_argument("--max_results", type=int, default=10, help="Máximo de resultados por página (entre 10 e 100).")
+    parser.add_argument("--max_pages", type=int, default=1, help="Máximo de páginas por consulta.")
+    parser.add_argument("--full", action="store_true", help="Ignora o since_id salvo e reescreve os arquivos.")
+    parser.add_argument("--queries_file", type=str, help="Arquivo com várias consultas, coletadas ao mesmo tempo.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Máximo de requisições simultâneas no modo assíncrono.")
     args = parser.parse_args()
 
+    # Coleta concorrente das consultas do arquivo, se fornecido
+    if args.queries_file:
+        queries = parse_queries_file(args.queries_file)
+        logger.info(f"Coletando {len(queries)} consultas com até {args.concurrency} requisições simultâneas...")
+        asyncio.run(collect_many(queries, args.max_results, args.max_pages, args.concurrency, not args.full))
+
     # Busca menções ao usuário especificado, se fornecido
     if args.username:
-        mentions = fetch_mentions(args.username, args.max_results)
-        save_to_tsv(mentions, f"{args.username}_mentions.tsv")
+        logger.info(f"Buscando menções para @{args.username}...")
+        collect_to_tsv(mentions_query(args.username), f"{args.username}_mentions.tsv",
+                       args.max_results, args.max_pages, not args.full)
 
     # Busca tweets com hashtags especificadas, se fornecidas
     if args.hashtags:
-        hashtag_tweets = fetch_tweets_by_hashtags(args.hashtags, args.max_results)
-        save_to_tsv(hashtag_tweets, "hashtags_tweets.tsv")
+        logger.info(f"Buscando tweets com hashtags: {', '.join(args.hashtags)}")
+        collect_to_tsv(hashtags_query(args.hashtags), "hashtags_tweets.tsv",
+                       args.max_results, args.max_pages, not args.full)
@@ -0,0 +1,196 @@
+import re
+import csv
+import sys
+import glob
+import time
+import hashlib
+import logging
+import argparse
+import threading
+import unicodedata
+from collections import OrderedDict
+from langdetect import DetectorFactory, detect, LangDetectException
+import metrics
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Torna o langdetect determinístico (por padrão ele sorteia a cada chamada)
+DetectorFactory.seed = 0
+
+# Palavras funcionais frequentes de cada idioma: cobrem quase todo texto curto de marketing
+# em pt/en/es sem precisar de modelo estatístico
+STOPWORDS = {
+    'pt': set("""
+        a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela para pra com
+        sem que e é são não sim mais muito já também seu sua seus suas meu minha você vocês
+        ele ela eles elas isso esse essa este esta aqui agora hoje até só ou mas como quando
+        tem ter tá está estão foi vai vem ao aos à às nossa nosso nossas nossos desconto
+        frete grátis oferta ofertas compre aproveite garanta loja produto
+    """.split()),
+    'en': set("""
+        the a an of to in on at for with from by and or but is are was were be been it its this
+        that these those you your we our they their he she his her not no yes all now get got
+        just more off free shop buy deal deals sale new today only out up my me i will can
+        what how why who which here there have has had
+    """.split()),
+    'es': set("""
+        el la los las un una unos unas de del en por para con sin que y o es son no sí más muy
+        ya también su sus mi mis tu tus usted ustedes él ella ellos ellas eso ese esa este esta
+        aquí ahora hoy hasta solo pero como cuando tiene tener está están fue va al lo le les
+        nuestro nuestra envío gratis oferta ofertas compra aprovecha tienda producto
+    """.split()),
+}
+
+# Letras que praticamente só aparecem em um dos idiomas
+DISTINCTIVE_CHARS = {'pt': set('ãõç'), 'es': set('ñ¿¡')}
+
+MIN_SCORE = 2    # Mínimo de evidências para aceitar a resposta rápida
+MIN_MARGIN = 2   # Vantagem mínima sobre o segundo idioma mais provável
+CACHE_SIZE = 100_000
+
+_NOISE_PATTERN = re.compile(r'https?://\S+|www\.\S+|[#@]\w+', re.UNICODE)
+_WORD_PATTERN = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+# O cache e os contadores são compartilhados pelas threads do servidor de jobs
+_lock = threading.Lock()
+_cache = OrderedDict()
+_stats = {'hits': 0, 'misses': 0, 'short_circuit': 0, 'fast_path': 0, 'langdetect': 0}
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def normalize(text):
+    """Normaliza o texto para a detecção: sem URLs, hashtags e menções, em minúsculas."""
+    text = unicodedata.normalize('NFC', text or '')
+    return ' '.join(_NOISE_PATTERN.sub(' ', text).lower().split())
+
+
+def _score(words, text):
+    scores = {lang: sum(1 for word in words if word in stopwords) for lang, stopwords in STOPWORDS.items()}
+    for lang, chars in DISTINCTIVE_CHARS.items():
+        if any(char in chars for char in text):
+            scores[lang] += MIN_MARGIN
+    return scores
+
+
+def _detect_normalized(text):
+    words = _WORD_PATTERN.findall(text)
+    if not words:
+        # Só hashtags, menções, links, números ou emojis: não há o que detectar
+        _count('short_circuit')
+        return 'unknown'
+
+    scores = _score(words, text)
+    ranking = sorted(scores, key=scores.get, reverse=True)
+    best, second = ranking[0], ranking[1]
+    if scores[best] >= MIN_SCORE and scores[best] - scores[second] >= MIN_MARGIN:
+        _count('fast_path')
+        return best
+
+    # Caso ambíguo ou outro idioma: recorre ao langdetect
+    _count('langdetect')
+    try:
+        return detect(text)
+    except LangDetectException:
+        return 'unknown'
+
+
+def _lookup(text):
+    """Retorna (idioma, veio do cache)."""
+    normalized = normalize(text)
+    key = hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+    with _lock:
+        lang = _cache.get(key)
+        if lang is not None:
+            _stats['hits'] += 1
+            _cache.move_to_end(key)
+            return lang, True
+        _stats['misses'] += 1
+
+    # A detecção roda fora do lock; duas threads com o mesmo texto só repetem o trabalho
+    lang = _detect_normalized(normalized)
+    with _lock:
+        _cache[key] = lang
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return lang, False
+
+
+def detect_language(text):
+    """Detecta o idioma do texto, com cache pelo hash do texto normalizado."""
+    return _lookup(text)[0]
+
+
+def detect_languages(texts):
+    """Detecta o idioma de vários textos; repetidos são resolvidos uma única vez."""
+    with metrics.span('nlp.language') as stage:
+        results = [_lookup(text) if isinstance(text, str) else ('unknown', False) for text in texts]
+        stage.add(rows=len(results), cache_hits=sum(hit for _, hit in results))
+    return [lang for lang, _ in results]
+
+
+def clear_cache():
+    """Esvazia o cache de idiomas já detectados."""
+    with _lock:
+        _cache.clear()
+
+
+def stats():
+    """Contadores do cache e de qual caminho resolveu cada texto."""
+    with _lock:
+        return dict(_stats)
+
+
+def _langdetect_reference(text):
+    try:
+        return detect(text)
+    except LangDetectException:
+        return 'unknown'
+
+
+def benchmark(paths):
+    """Compara velocidade e concordância com o langdetect puro nas descrições dos arquivos."""
+    texts = []
+    for path in paths:
+        with open(path, newline='', encoding='utf-8') as file:
+            texts.extend(row['Description'] for row in csv.DictReader(file, delimiter='\t') if row.get('Description'))
+    if not texts:
+        logger.warning("Nenhuma descrição encontrada para o benchmark.")
+        return None
+
+    start = time.perf_counter()
+    reference = [_langdetect_reference(text) for text in texts]
+    reference_time = time.perf_counter() - start
+
+    clear_cache()
+    start = time.perf_counter()
+    fast = detect_languages(texts)
+    fast_time = time.perf_counter() - start
+
+    # Textos que viraram 'unknown' pelo atalho não contam como discordância
+    compared = [(r, f) for r, f in zip(reference, fast) if f != 'unknown']
+    agreement = sum(1 for r, f in compared if r == f) / len(compared) if compared else 0.0
+    result = {
+        'texts': len(texts),
+        'langdetect_s': round(reference_time, 4),
+        'languageid_s': round(fast_time, 4),
+        'speedup': round(reference_time / fast_time, 1) if fast_time else None,
+        'agreement': round(agreement, 3),
+        **stats(),
+    }
+    logger.info(f"Benchmark de detecção de idioma: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comparar a detecção de idioma com o langdetect.")
+    parser.add_argument("files", nargs="*", help="Arquivos TSV com a coluna Description (padrão: *_processed.tsv).")
+    args = parser.parse_args()
+    files = args.files or sorted(glob.glob("*_processed.tsv"))
+    if benchmark(files) is None:
+        sys.exit(1)
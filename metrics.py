@@ -0,0 +1,352 @@
+import os
+import sys
+import json
+import time
+import atexit
+import asyncio
+import fnmatch
+import logging
+import threading
+import contextvars
+import multiprocessing
+from functools import wraps
+from contextlib import contextmanager
+from datetime import datetime
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Saídas opcionais, todas desligadas por padrão:
+# - METRICS_JSONL: acrescenta um evento JSON por span finalizado;
+# - METRICS_PROMETHEUS: grava as métricas em formato texto do Prometheus ao final da execução
+#   (para o textfile collector do node_exporter);
+# - METRICS_SUMMARY: grava o resumo da execução em JSON (se for um diretório, um arquivo por execução).
+METRICS_JSONL = os.environ.get("METRICS_JSONL")
+METRICS_PROMETHEUS = os.environ.get("METRICS_PROMETHEUS")
+METRICS_SUMMARY = os.environ.get("METRICS_SUMMARY")
+
+# Profiling: PROFILE=cprofile ou pyinstrument. Sem PROFILE_SPANS, perfila a thread principal
+# da execução inteira; com PROFILE_SPANS (padrão glob), perfila cada span com nome correspondente,
+# na thread em que ele roda.
+PROFILE = os.environ.get("PROFILE", "").lower()
+PROFILE_SPANS = os.environ.get("PROFILE_SPANS", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(".cache", "profiles"))
+
+PREFIX = "cb_scrapping"
+
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+_started_at = datetime.now()
+_current = contextvars.ContextVar("metrics_span", default=None)
+_profiling = threading.local()
+
+
+def _labels(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+
+
+class Span:
+    """Uma etapa em execução: duração, status e contadores como rows, bytes, retries e cache_hits."""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.counters = {}
+        self.error = None
+        self.duration = None
+
+    def add(self, **counters):
+        """Soma valores aos contadores da etapa."""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + (value or 0)
+        return self
+
+
+class _NullSpan(Span):
+    def __init__(self):
+        super().__init__(None, ())
+
+    def add(self, **counters):
+        return self
+
+
+@contextmanager
+def span(name, **labels):
+    """Mede uma etapa. Use os rótulos para dimensões de poucos valores (plataforma, idioma, etapa)."""
+    current = Span(name, _labels(labels))
+    token = _current.set(current)
+    profiler = _start_span_profiler(name)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _stop_profiler(profiler, name)
+        _current.reset(token)
+        _finish(current)
+
+
+def current():
+    """A etapa em execução neste contexto (thread ou tarefa assíncrona), ou uma que ignora contadores."""
+    return _current.get() or _NullSpan()
+
+
+def timed(name=None, **labels):
+    """Decorador que mede cada chamada da função como uma etapa; aceita funções assíncronas."""
+    def decorator(func):
+        stage = name or f"{func.__module__}.{func.__name__}"
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage, **labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1, **labels):
+    """Incrementa um contador avulso, fora de uma etapa."""
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def _finish(current):
+    key = (current.name, current.labels)
+    with _lock:
+        stage = _stages.setdefault(key, {'count': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'counters': {}})
+        stage['count'] += 1
+        stage['errors'] += current.error is not None
+        stage['seconds'] += current.duration
+        stage['max_seconds'] = max(stage['max_seconds'], current.duration)
+        for counter, value in current.counters.items():
+            stage['counters'][counter] = stage['counters'].get(counter, 0) + value
+    if METRICS_JSONL:
+        _write_event({
+            'time': datetime.now().isoformat(timespec='milliseconds'), 'span': current.name,
+            'labels': dict(current.labels), 'seconds': round(current.duration, 6), 'error': current.error,
+            **current.counters,
+        })
+
+
+def _write_event(event):
+    try:
+        with _lock, open(METRICS_JSONL, mode='a', encoding='utf-8') as file:
+            file.write(json.dumps(event, ensure_ascii=False) + '\n')
+    except OSError as e:
+        logger.warning(f"Não foi possível gravar a métrica em {METRICS_JSONL}: {e}")
+
+
+def _snapshot():
+    stages = [{'span': name, 'labels': dict(labels), **stage, 'counters': dict(stage['counters'])}
+              for (name, labels), stage in _stages.items()]
+    counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in _counters.items()]
+    return {'stages': stages, 'counters': counters}
+
+
+def snapshot():
+    """Métricas acumuladas no processo: etapas e contadores avulsos."""
+    with _lock:
+        return _snapshot()
+
+
+def reset():
+    """Zera as métricas acumuladas."""
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def drain():
+    """Retorna o snapshot e zera as métricas; usado para enviar as de um worker ao processo principal."""
+    with _lock:
+        data = _snapshot()
+        _stages.clear()
+        _counters.clear()
+    return data
+
+
+def merge(data):
+    """Soma às métricas deste processo um snapshot vindo de outro (ex.: um worker de ProcessPoolExecutor)."""
+    with _lock:
+        for stage in data['stages']:
+            key = (stage['span'], _labels(stage['labels']))
+            current = _stages.setdefault(key, {'count': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                               'counters': {}})
+            current['count'] += stage['count']
+            current['errors'] += stage['errors']
+            current['seconds'] += stage['seconds']
+            current['max_seconds'] = max(current['max_seconds'], stage['max_seconds'])
+            for counter, value in stage['counters'].items():
+                current['counters'][counter] = current['counters'].get(counter, 0) + value
+        for counter in data['counters']:
+            key = (counter['name'], _labels(counter['labels']))
+            _counters[key] = _counters.get(key, 0) + counter['value']
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metric_name(name):
+    return ''.join(char if char.isalnum() else '_' for char in name)
+
+
+def prometheus_text():
+    """Métricas no formato texto de exposição do Prometheus."""
+    families = {}
+
+    def add(family, kind, help_text, labels, value, suffix=''):
+        samples = families.setdefault(f"{PREFIX}_{family}", (kind, help_text, []))[2]
+        rendered = ','.join(f'{name}="{_escape(str(label))}"' for name, label in labels)
+        samples.append(f"{PREFIX}_{family}{suffix}{{{rendered}}} {value}")
+
+    data = snapshot()
+    for stage in data['stages']:
+        labels = [('span', stage['span']), *sorted(stage['labels'].items())]
+        add("span_seconds", "summary", "Duração das etapas.", labels, round(stage['seconds'], 6), '_sum')
+        add("span_seconds", "summary", "Duração das etapas.", labels, stage['count'], '_count')
+        add("span_max_seconds", "gauge", "Execução mais lenta da etapa.", labels, round(stage['max_seconds'], 6))
+        add("span_errors_total", "counter", "Execuções da etapa que terminaram com exceção.", labels, stage['errors'])
+        for counter, value in sorted(stage['counters'].items()):
+            add(f"span_{_metric_name(counter)}_total", "counter", f"Soma de {counter} na etapa.", labels, value)
+    for counter in data['counters']:
+        labels = [('name', counter['name']), *sorted(counter['labels'].items())]
+        add("events_total", "counter", "Contadores avulsos.", labels, counter['value'])
+
+    lines = []
+    for metric, (kind, help_text, samples) in families.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+def summary():
+    """Resumo da execução, com as etapas ordenadas pelo tempo total."""
+    data = snapshot()
+    data['stages'].sort(key=lambda stage: stage['seconds'], reverse=True)
+    finished_at = datetime.now()
+    return {
+        'script': os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+        'started_at': _started_at.isoformat(timespec='seconds'),
+        'finished_at': finished_at.isoformat(timespec='seconds'),
+        'seconds': round((finished_at - _started_at).total_seconds(), 3),
+        **data,
+    }
+
+
+def _atomic_write(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + '.tmp', mode='w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(path + '.tmp', path)
+
+
+def write_prometheus(path):
+    _atomic_write(path, prometheus_text())
+
+
+def write_summary(path):
+    """Grava o resumo em JSON; se path for um diretório, cria um arquivo por execução."""
+    data = summary()
+    if path.endswith(os.sep) or os.path.isdir(path):
+        script = os.path.splitext(data['script'] or 'run')[0]
+        path = os.path.join(path, f"{script}-{_started_at:%Y%m%d-%H%M%S}.json")
+    _atomic_write(path, json.dumps(data, ensure_ascii=False, indent=2))
+    return path
+
+
+def log_summary(limit=10):
+    """Registra no log as etapas que mais consumiram tempo."""
+    for stage in summary()['stages'][:limit]:
+        labels = ', '.join(f"{name}={value}" for name, value in stage['labels'].items())
+        logger.info(f"{stage['span']}{f' ({labels})' if labels else ''}: {stage['count']}x, "
+                    f"{stage['seconds']:.3f}s no total, {stage['errors']} erros, {stage['counters']}")
+
+
+def _new_profiler():
+    if PROFILE == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return None  # Já há outro profiler ativo nesta thread
+        return profiler
+    if PROFILE == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument não está instalado; profiling desativado.")
+            return None
+        profiler = Profiler()
+        profiler.start()
+        return profiler
+    logger.warning(f"Profiler desconhecido: {PROFILE}. Use cprofile ou pyinstrument.")
+    return None
+
+
+def _start_span_profiler(name):
+    # Só o span mais externo que corresponde ao padrão é perfilado em cada thread
+    if not PROFILE or not PROFILE_SPANS or getattr(_profiling, 'active', False):
+        return None
+    if not fnmatch.fnmatch(name, PROFILE_SPANS):
+        return None
+    profiler = _new_profiler()
+    _profiling.active = profiler is not None
+    return profiler
+
+
+def _stop_profiler(profiler, name):
+    if profiler is None:
+        return
+    _profiling.active = False
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"{name}-{datetime.now():%Y%m%d-%H%M%S}-{threading.get_ident()}")
+        if PROFILE == 'cprofile':
+            profiler.disable()
+            path = base + '.prof'  # Abra com python -m pstats ou snakeviz
+            profiler.dump_stats(path)
+        else:
+            profiler.stop()
+            path = base + '.html'
+            with open(path, mode='w', encoding='utf-8') as file:
+                file.write(profiler.output_html())
+        logger.info(f"Perfil de {name} salvo em {path}")
+    except Exception as e:
+        logger.warning(f"Não foi possível salvar o perfil de {name}: {e}")
+
+
+# Sem PROFILE_SPANS, o perfil cobre a execução inteira a partir da primeira importação
+_process_profiler = _new_profiler() if PROFILE and not PROFILE_SPANS else None
+
+
+@atexit.register
+def _at_exit():
+    if multiprocessing.parent_process() is not None:
+        return  # Workers de multiprocessing não sobrescrevem as saídas do processo principal
+    script = os.path.splitext(os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'run')[0]
+    _stop_profiler(_process_profiler, script)
+    try:
+        if METRICS_PROMETHEUS:
+            write_prometheus(METRICS_PROMETHEUS)
+        if METRICS_SUMMARY:
+            logger.info(f"Resumo das métricas salvo em {write_summary(METRICS_SUMMARY)}")
+    except OSError as e:
+        logger.warning(f"Não foi possível gravar as métricas da execução: {e}")
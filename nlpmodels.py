@@ -0,0 +1,223 @@
+import os
+import stat
+import logging
+import secrets
+import argparse
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+import spacy
+import languageid
+import nlprules
+import metrics
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Modelos do spaCy por idioma suportado
+MODEL_NAMES = {
+    'en': "en_core_web_sm",
+    'pt': "pt_core_news_sm",
+    'es': "es_core_news_sm",
+}
+
+# Componentes dos pipelines que não influenciam o NER e nem precisam ser carregados
+NER_UNUSED_COMPONENTS = ['tagger', 'parser', 'lemmatizer', 'attribute_ruler', 'morphologizer', 'senter']
+BATCH_SIZE = 256
+
+# Endereço do worker que mantém os modelos carregados
+WORKER_HOST = os.environ.get("NER_WORKER_HOST", "localhost")
+WORKER_PORT = int(os.environ.get("NER_WORKER_PORT", "6100"))
+# A conexão do multiprocessing desserializa (pickle) o que recebe, então a chave é o que
+# impede outros processos de executar código no worker. Sem NER_WORKER_AUTHKEY, o worker
+# gera uma chave aleatória em um arquivo legível só pelo usuário, e o cliente a lê de lá.
+WORKER_AUTHKEY_PATH = os.environ.get("NER_WORKER_AUTHKEY_FILE", os.path.join(".cache", "ner_worker.key"))
+
+
+def worker_authkey(create=False):
+    """Chave do worker: NER_WORKER_AUTHKEY ou o arquivo de chave; None se não houver.
+
+    Com create, gera o arquivo com permissão 0600 quando ele ainda não existe.
+    """
+    if os.environ.get("NER_WORKER_AUTHKEY"):
+        return os.environ["NER_WORKER_AUTHKEY"].encode('utf-8')
+    if create and not os.path.exists(WORKER_AUTHKEY_PATH):
+        os.makedirs(os.path.dirname(WORKER_AUTHKEY_PATH) or ".", exist_ok=True)
+        try:
+            fd = os.open(WORKER_AUTHKEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # Outro processo criou a chave ao mesmo tempo
+        else:
+            with os.fdopen(fd, mode='w', encoding='utf-8') as file:
+                file.write(secrets.token_hex(32))
+            logger.info(f"Chave do worker de NER gerada em {WORKER_AUTHKEY_PATH}")
+    if not os.path.exists(WORKER_AUTHKEY_PATH):
+        return None
+    if os.stat(WORKER_AUTHKEY_PATH).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise PermissionError(f"{WORKER_AUTHKEY_PATH} pode ser lido por outros usuários; use chmod 600.")
+    with open(WORKER_AUTHKEY_PATH, encoding='utf-8') as file:
+        return file.read().strip().encode('utf-8')
+
+
+class ModelRegistry:
+    """Carrega cada modelo do spaCy só na primeira vez em que o idioma aparece.
+
+    Com ner=False, só a extração por regras (nlprules) é feita e nenhum modelo é carregado.
+    """
+
+    def __init__(self, model_names=None, ner=True):
+        self.model_names = dict(model_names or MODEL_NAMES)
+        self.ner = ner
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def supports(self, lang):
+        return lang in self.model_names
+
+    def get(self, lang):
+        """Retorna o modelo do idioma, carregando-o apenas com os componentes do NER."""
+        with self._lock:
+            if lang not in self._models:
+                name = self.model_names[lang]
+                try:
+                    with metrics.span('nlp.model_load', lang=lang):
+                        self._models[lang] = spacy.load(name, exclude=NER_UNUSED_COMPONENTS)
+                except Exception as e:
+                    logger.error(f"Falha ao carregar o modelo de linguagem {name}: {e}")
+                    raise
+                logger.info(f"Modelo {name} carregado.")
+            return self._models[lang]
+
+    def loaded(self):
+        """Idiomas cujos modelos já estão em memória."""
+        return sorted(self._models)
+
+    def extract_entities(self, texts, batch_size=BATCH_SIZE, n_process=1):
+        """Extrai as entidades de vários textos de uma vez, usando nlp.pipe por idioma.
+
+        Hashtags, menções, URLs, preços, porcentagens e cupons saem primeiro por regras e
+        são removidos do texto. O restante é agrupado pelo idioma detectado, cada grupo
+        passa em lote pelo seu modelo e o resultado volta na ordem original.
+        """
+        entities, clean_texts = [], []
+        with metrics.span('nlp.rules') as stage:
+            for text in texts:
+                tokens, clean_text = nlprules.extract_tokens(text)
+                entities.append(tokens)
+                clean_texts.append(clean_text)
+            stage.add(rows=len(clean_texts))
+        texts = clean_texts
+        if not self.ner:
+            return entities
+
+        groups = {}
+        for i, (text, lang) in enumerate(zip(texts, languageid.detect_languages(texts))):
+            if not text:
+                continue
+            if self.supports(lang):
+                groups.setdefault(lang, []).append(i)
+            else:
+                logger.info(f"Idioma não identificado ou suportado para o texto: {text}")
+
+        for lang, indexes in groups.items():
+            model = self.get(lang)
+            with metrics.span('nlp.ner', lang=lang) as stage:
+                docs = model.pipe((texts[i] for i in indexes), batch_size=batch_size, n_process=n_process)
+                for i, doc in zip(indexes, docs):
+                    entities[i] = entities[i] + [(ent.text, ent.label_) for ent in doc.ents]
+                stage.add(rows=len(indexes))
+            logger.info(f"{len(indexes)} textos processados com o modelo '{lang}'.")
+
+        return entities
+
+
+class WorkerClient:
+    """Cliente do worker de NER; tem a mesma interface de extração do ModelRegistry."""
+
+    def __init__(self, host=WORKER_HOST, port=WORKER_PORT, authkey=None, ner=True):
+        self.address = (host, port)
+        self.authkey = authkey
+        self.ner = ner
+
+    def available(self):
+        """Verifica se há um worker aceitando conexões."""
+        if self.authkey is None:
+            try:
+                self.authkey = worker_authkey()
+            except PermissionError as e:
+                logger.error(str(e))
+                return False
+            if self.authkey is None:
+                return False  # Sem chave, não há worker deste usuário no ar
+        try:
+            with Client(self.address, authkey=self.authkey) as conn:
+                conn.send({'op': 'ping'})
+                return conn.recv().get('ok', False)
+        except (OSError, EOFError, AuthenticationError):
+            return False
+
+    def extract_entities(self, texts, batch_size=BATCH_SIZE, n_process=1):
+        texts = [text if isinstance(text, str) else '' for text in texts]
+        if self.authkey is None:
+            self.authkey = worker_authkey()
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send({'op': 'extract', 'texts': texts, 'batch_size': batch_size, 'n_process': n_process,
+                       'ner': self.ner})
+            response = conn.recv()
+        if not response.get('ok'):
+            raise RuntimeError(f"Erro no worker de NER: {response.get('error')}")
+        return response['entities']
+
+
+def _handle(conn, registry, lock):
+    with conn:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        try:
+            if request.get('op') == 'ping':
+                conn.send({'ok': True, 'loaded': registry.loaded()})
+            elif request.get('op') == 'extract':
+                # Os modelos do spaCy não são seguros para uso simultâneo em threads
+                with lock:
+                    registry.ner = request.get('ner', True)
+                    entities = registry.extract_entities(
+                        request['texts'], request.get('batch_size', BATCH_SIZE), request.get('n_process', 1)
+                    )
+                conn.send({'ok': True, 'entities': entities})
+            else:
+                conn.send({'ok': False, 'error': f"Operação desconhecida: {request.get('op')}"})
+        except Exception as e:
+            logger.error(f"Erro ao atender requisição do worker: {e}")
+            conn.send({'ok': False, 'error': str(e)})
+
+
+def serve(host=WORKER_HOST, port=WORKER_PORT, authkey=None, preload=()):
+    """Mantém os modelos carregados e atende pedidos de extração pela conexão local."""
+    authkey = authkey or worker_authkey(create=True)
+    registry = ModelRegistry()
+    for lang in preload:
+        registry.get(lang)
+    lock = threading.Lock()
+    with Listener((host, port), authkey=authkey) as listener:
+        logger.info(f"Worker de NER aguardando conexões em {host}:{port}.")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # Conexões com chave errada não devem derrubar o worker
+                logger.warning(f"Conexão recusada: {e}")
+                continue
+            threading.Thread(target=_handle, args=(conn, registry, lock), daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker que mantém os modelos do spaCy carregados.")
+    parser.add_argument("--host", default=WORKER_HOST, help="Endereço em que o worker escuta.")
+    parser.add_argument("--port", type=int, default=WORKER_PORT, help="Porta em que o worker escuta.")
+    parser.add_argument("--preload", nargs="*", default=[], choices=sorted(MODEL_NAMES),
+                        help="Idiomas cujos modelos são carregados já na inicialização.")
+    args = parser.parse_args()
+    serve(args.host, args.port, preload=args.preload)
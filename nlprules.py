@@ -0,0 +1,44 @@
+import re
+
+# Padrões dos tokens estruturados dos posts, combinados em uma única expressão para
+# extrair tudo em uma passada. A ordem importa: URLs antes de hashtags/menções e
+# preços antes de porcentagens (em 'R$169,9943% OFF' o preço é R$169,99 e o desconto 43%).
+_PATTERNS = [
+    ('URL', r'https?://\S+|www\.\S+'),
+    ('PRICE', r'R\$\s?\d{1,3}(?:\.?\d{3})*(?!\d)(?:,\d{2})?'),
+    ('PERCENT', r'\d{1,3}(?:[.,]\d+)?\s?%(?:\s?(?:off|de desconto)\b)?'),
+    ('HASHTAG', r'#\w+'),
+    ('MENTION', r'@\w+'),
+    # Cupons: palavra em maiúsculas com letras e dígitos, como BLACKFRIDAY30
+    ('COUPON', r'\b(?=[A-Z0-9]*\d)[A-Z][A-Z0-9]{4,24}\b'),
+]
+TOKEN_PATTERN = re.compile('|'.join(f'(?P<{label}>{pattern})' for label, pattern in _PATTERNS), re.IGNORECASE)
+_COUPON_PATTERN = re.compile(_PATTERNS[-1][1])
+_SPACES = re.compile(r'\s+')
+
+LABELS = [label for label, _ in _PATTERNS]
+
+
+def extract_tokens(text):
+    """Extrai hashtags, menções, URLs, preços, porcentagens e cupons em uma única passada.
+
+    Retorna (entidades, texto_limpo): as entidades como (texto, rótulo), na ordem em que
+    aparecem, e o texto sem esses tokens, pronto para o NER.
+    """
+    if not isinstance(text, str) or not text:
+        return [], ''
+
+    entities = []
+    pieces = []
+    position = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        label = match.lastgroup
+        value = match.group()
+        # O IGNORECASE vale para 'OFF' e 'R$', mas cupons precisam estar em maiúsculas
+        if label == 'COUPON' and not _COUPON_PATTERN.fullmatch(value):
+            continue
+        entities.append((value.strip(), label))
+        pieces.append(text[position:match.start()])
+        position = match.end()
+    pieces.append(text[position:])
+    return entities, _SPACES.sub(' ', ' '.join(pieces)).strip()
@@ -1,61 +1,344 @@
-import spacy
+import os
+import glob
+import json
+import hashlib
 import pandas as pd
-from langdetect import detect, LangDetectException
 import logging
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import languageid
+import nlpmodels
+import storage
+import metrics
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def load_models():
-    """Carrega os modelos de linguagem para inglês, português e espanhol do spaCy."""
-    try:
-        nlp_en = spacy.load("en_core_web_sm")
-        nlp_pt = spacy.load("pt_core_news_sm")
-        nlp_es = spacy.load("es_core_news_sm")
-        logger.info("Modelos de linguagem carregados com sucesso.")
-        return nlp_en, nlp_pt, nlp_es
-    except Exception as e:
-        logger.error(f"Falha ao carregar os modelos de linguagem: {e}")
-        raise
+# Onde ficam os índices das linhas já processadas no modo incremental
+INDEX_DIR = os.path.join(".cache", "nlp_index")
+# Onde fica o progresso do modo em partes, para retomar jobs interrompidos
+CHECKPOINT_DIR = os.path.join(".cache", "nlp_checkpoints")
+CHUNK_SIZE = 10_000
+
+# Colunas que entram no hash de conteúdo do modo incremental: só a entrada do NER. Curtidas,
+# comentários e compartilhamentos mudam a cada coleta e não alteram as entidades.
+CONTENT_COLUMNS = ['Description']
+
+# Exportações dos coletores processadas quando nenhum arquivo é informado
+DEFAULT_INPUTS = ['*_videos.tsv', '*_mentions.tsv', '*_tweets.tsv']
+
+def load_models(use_worker=False, ner=True):
+    """Prepara a extração de entidades para inglês, português e espanhol.
+
+    Os modelos do spaCy só são carregados quando o idioma aparece pela primeira vez.
+    Com use_worker, usa o worker de NER (nlpmodels.py) se ele estiver no ar, evitando
+    carregar os modelos neste processo. Com ner=False, só a extração por regras é feita.
+    """
+    if use_worker:
+        client = nlpmodels.WorkerClient(ner=ner)
+        if client.available():
+            logger.info("Usando o worker de NER com os modelos já carregados.")
+            return client
+        logger.warning("Worker de NER indisponível. Carregando os modelos localmente.")
+    return nlpmodels.ModelRegistry(ner=ner)
 
 def detect_language(text):
     """Detecta o idioma do texto fornecido."""
-    try:
-        return detect(text)
-    except LangDetectException:
-        return 'unknown'
+    return languageid.detect_language(text)
 
-def process_text(text, nlp_en, nlp_pt, nlp_es):
+def process_text(text, models):
     """Processa o texto usando o modelo de linguagem apropriado baseado no idioma detectado."""
-    lang = detect_language(text)
-    if lang == 'en':
-        doc = nlp_en(text)
-    elif lang == 'pt':
-        doc = nlp_pt(text)
-    elif lang == 'es':
-        doc = nlp_es(text)
+    return models.extract_entities([text])[0]
+
+def row_keys(df):
+    """Identificador de cada linha: o ID do vídeo/tweet ou, sem ele, Create Time + Author ID."""
+    if 'ID' in df.columns:
+        keys = df['ID'].astype(str)
     else:
-        logger.info(f"Idioma não identificado ou suportado para o texto: {text}")
-        return []
-    return [(ent.text, ent.label_) for ent in doc.ents]
+        keys = df['Create Time'].astype(str) + '|' + df['Author ID'].astype(str)
+    # Chaves repetidas (ex.: dois tweets do mesmo autor no mesmo segundo) recebem um sufixo
+    occurrence = keys.groupby(keys).cumcount()
+    return keys.where(occurrence == 0, keys + '#' + occurrence.astype(str))
+
+def row_hashes(df):
+    """Hash do conteúdo de cada linha (CONTENT_COLUMNS), para perceber linhas já vistas que mudaram."""
+    rows = df[CONTENT_COLUMNS].astype(str).agg('\t'.join, axis=1)
+    return rows.map(lambda row: hashlib.blake2b(row.encode('utf-8'), digest_size=16).hexdigest())
+
+def store_entities(file_path, df):
+    """Acrescenta as entidades extraídas ao histórico, uma linha por post."""
+    platform = 'tiktok' if file_path.endswith('_videos.tsv') else 'twitter'
+    records = zip([os.path.basename(file_path)] * len(df), row_keys(df), df['Description'], df['Entities'])
+    storage.record('post_entities', records, platform)
+
+def index_path(output_path):
+    """Arquivo com o índice das linhas já processadas de uma saída."""
+    return os.path.join(INDEX_DIR, os.path.basename(output_path) + '.index.json')
+
+def load_index(output_path):
+    """Carrega o índice {chave: hash} ou None se a saída ainda não tiver um índice válido."""
+    path = index_path(output_path)
+    if not (os.path.exists(path) and os.path.exists(output_path)):
+        return None
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+def save_index(output_path, index):
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    path = index_path(output_path)
+    with open(path + '.tmp', mode='w', encoding='utf-8') as file:
+        json.dump(index, file)
+    os.replace(path + '.tmp', path)
+
+@metrics.timed('nlp.analyze_file', mode='incremental')
+def analyze_file_incremental(file_path, models, batch_size=nlpmodels.BATCH_SIZE, n_process=1):
+    """Processa apenas as linhas novas ou alteradas desde a última execução.
+
+    As linhas novas são acrescentadas ao _processed.tsv. Se alguma linha já processada
+    mudou, a versão antiga é substituída.
+    """
+    output_path = file_path.replace('.tsv', '_processed.tsv')
+    try:
+        df = pd.read_csv(file_path, sep='\t', encoding='utf-8', dtype=str, keep_default_na=False)
+        logger.info(f"Arquivo {file_path} carregado com sucesso.")
+
+        keys, hashes = row_keys(df), row_hashes(df)
+        index = load_index(output_path)
+        if index is None:
+            logger.info(f"Sem índice para {output_path}; processando o arquivo inteiro.")
+            index = {}
+
+        pending = [(key not in index or index[key] != digest) for key, digest in zip(keys, hashes)]
+        new_rows = df[pending].copy()
+        if new_rows.empty:
+            logger.info(f"Nenhuma linha nova em {file_path}.")
+            return
+
+        changed = {key for key in keys[pending] if key in index}
+        new_rows['Entities'] = models.extract_entities(new_rows['Description'].tolist(), batch_size, n_process)
+
+        if not index:
+            new_rows.to_csv(output_path, sep='\t', index=False)
+        elif changed:
+            # Reescreve a saída sem as versões antigas das linhas alteradas
+            processed = pd.read_csv(output_path, sep='\t', encoding='utf-8', dtype=str, keep_default_na=False)
+            processed = processed[~row_keys(processed).isin(changed)]
+            pd.concat([processed, new_rows], ignore_index=True).to_csv(output_path, sep='\t', index=False)
+        else:
+            new_rows.to_csv(output_path, sep='\t', index=False, mode='a', header=False)
+
+        store_entities(file_path, new_rows)
+        metrics.current().add(rows=len(new_rows))
+        index.update(zip(keys[pending], hashes[pending]))
+        save_index(output_path, index)
+        logger.info(f"{len(new_rows)} linhas novas ou alteradas processadas e salvas em {output_path}")
+    except Exception as e:
+        logger.error(f"Erro ao processar o arquivo {file_path}: {e}")
+
+def checkpoint_path(output_path):
+    """Arquivo com o progresso do processamento em partes de uma saída."""
+    return os.path.join(CHECKPOINT_DIR, os.path.basename(output_path) + '.checkpoint.json')
 
-def analyze_file(file_path, nlp_en, nlp_pt, nlp_es):
-    """Analisa o arquivo TSV e processa cada descrição com o modelo apropriado."""
+def input_fingerprint(file_path, head_bytes=64 * 1024):
+    """Identifica a versão do arquivo de entrada: tamanho, mtime e hash do início."""
+    stat = os.stat(file_path)
+    with open(file_path, mode='rb') as file:
+        head = hashlib.blake2b(file.read(head_bytes), digest_size=16).hexdigest()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'head': head}
+
+@metrics.timed('nlp.analyze_file', mode='streaming')
+def analyze_file_streaming(file_path, models, batch_size=nlpmodels.BATCH_SIZE, n_process=1, chunksize=CHUNK_SIZE):
+    """Processa o arquivo em partes de chunksize linhas, gravando cada parte assim que termina.
+
+    O uso de memória não depende do tamanho do arquivo. Após cada parte, um checkpoint
+    guarda quantas linhas e bytes já foram gravados; se o job for interrompido, a próxima
+    execução descarta a parte incompleta e continua de onde parou. O checkpoint só vale
+    para a mesma versão da entrada: se o coletor regravou o arquivo, o processamento recomeça.
+    """
+    output_path = file_path.replace('.tsv', '_processed.tsv')
+    checkpoint_file = checkpoint_path(output_path)
+    try:
+        fingerprint = input_fingerprint(file_path)
+    except OSError as e:
+        logger.error(f"Erro ao processar o arquivo {file_path}: {e}")
+        return
+    checkpoint = {'rows': 0, 'output_bytes': 0, 'input': fingerprint}
+    if os.path.exists(checkpoint_file) and os.path.exists(output_path):
+        with open(checkpoint_file, encoding='utf-8') as file:
+            saved = json.load(file)
+        if saved.get('input') == fingerprint:
+            checkpoint = saved
+            logger.info(f"Retomando {file_path} a partir da linha {checkpoint['rows']}.")
+            with open(output_path, mode='r+b') as file:
+                file.truncate(checkpoint['output_bytes'])  # Descarta a parte que não chegou ao checkpoint
+        else:
+            logger.warning(f"{file_path} mudou desde o checkpoint; processando o arquivo desde o início.")
+
+    try:
+        reader = pd.read_csv(
+            file_path, sep='\t', encoding='utf-8', dtype=str, keep_default_na=False,
+            chunksize=chunksize, skiprows=range(1, checkpoint['rows'] + 1)
+        )
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        for chunk in reader:
+            chunk['Entities'] = models.extract_entities(chunk['Description'].tolist(), batch_size, n_process)
+            first = checkpoint['rows'] == 0
+            chunk.to_csv(output_path, sep='\t', index=False, mode='w' if first else 'a', header=first)
+            store_entities(file_path, chunk)
+            metrics.current().add(rows=len(chunk))
+
+            checkpoint = {'rows': checkpoint['rows'] + len(chunk), 'output_bytes': os.path.getsize(output_path),
+                          'input': fingerprint}
+            with open(checkpoint_file + '.tmp', mode='w', encoding='utf-8') as file:
+                json.dump(checkpoint, file)
+            os.replace(checkpoint_file + '.tmp', checkpoint_file)
+            logger.info(f"{checkpoint['rows']} linhas de {file_path} processadas.")
+
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+        logger.info(f"Arquivo processado salvo em {output_path}")
+    except Exception as e:
+        logger.error(f"Erro ao processar o arquivo {file_path}: {e}")
+
+@metrics.timed('nlp.analyze_file', mode='full')
+def analyze_file(file_path, models, batch_size=nlpmodels.BATCH_SIZE, n_process=1):
+    """Analisa o arquivo TSV e processa as descrições em lote com o modelo apropriado."""
     try:
         df = pd.read_csv(file_path, sep='\t', encoding='utf-8')
         logger.info(f"Arquivo {file_path} carregado com sucesso.")
         
-        df['Entities'] = df['Description'].apply(lambda x: process_text(x, nlp_en, nlp_pt, nlp_es))
+        df['Entities'] = models.extract_entities(df['Description'].tolist(), batch_size, n_process)
         
         output_path = file_path.replace('.tsv', '_processed.tsv')
         df.to_csv(output_path, sep='\t', index=False)
+        store_entities(file_path, df)
+        metrics.current().add(rows=len(df))
         logger.info(f"Arquivo processado salvo em {output_path}")
     except Exception as e:
         logger.error(f"Erro ao processar o arquivo {file_path}: {e}")
 
+# Modelos do processo worker, carregados uma vez pelo initializer do pool
+_worker_models = None
+
+def _init_worker(ner=True):
+    global _worker_models
+    _worker_models = nlpmodels.ModelRegistry(ner=ner)
+
+def _extract_chunk(texts, batch_size):
+    # As métricas do worker voltam junto com o resultado, para entrar no resumo do processo principal
+    entities = _worker_models.extract_entities(texts, batch_size, 1)
+    return entities, metrics.drain()
+
+def find_input_files(patterns):
+    """Expande os padrões glob, ignorando saídas já processadas, em ordem determinística.
+
+    Padrões que não correspondem a nenhum arquivo são ignorados com um aviso.
+    """
+    files = []
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            logger.warning(f"Nenhum arquivo encontrado para {pattern}.")
+        for path in paths:
+            if not path.endswith('_processed.tsv') and path not in files:
+                files.append(path)
+    return files
+
+@metrics.timed('nlp.analyze_file', mode='parallel')
+def analyze_files_parallel(file_paths, workers, batch_size=nlpmodels.BATCH_SIZE, chunksize=CHUNK_SIZE, ner=True):
+    """Distribui arquivos e partes de arquivos grandes entre processos.
+
+    Cada worker carrega seus modelos uma única vez. As partes são gravadas na ordem
+    original de cada arquivo, então a saída é a mesma do processamento sequencial.
+    Cada saída é montada em um arquivo temporário que só substitui o _processed.tsv
+    se todas as partes derem certo; não há retomada de jobs interrompidos.
+    """
+    pending = deque()
+    failed = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(ner,)) as executor:
+
+        def write_oldest():
+            file_path, output_path, chunk, first, future = pending.popleft()
+            temp_path = output_path + '.tmp'
+            if chunk is None:
+                # Marcador de fim do arquivo: publica a saída completa ou descarta a parcial
+                if file_path in failed:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    logger.error(f"{output_path} não foi atualizado por causa de erros no processamento.")
+                elif os.path.exists(temp_path):
+                    os.replace(temp_path, output_path)
+                    logger.info(f"Arquivo processado salvo em {output_path}")
+                return
+            if file_path in failed:
+                future.cancel()
+                return
+            try:
+                entities, worker_metrics = future.result()
+                metrics.merge(worker_metrics)
+                chunk['Entities'] = entities
+                chunk.to_csv(temp_path, sep='\t', index=False, mode='w' if first else 'a', header=first)
+                store_entities(file_path, chunk)
+                metrics.current().add(rows=len(chunk))
+            except Exception as e:
+                logger.error(f"Erro ao processar parte de {output_path}: {e}")
+                failed.add(file_path)
+
+        for file_path in file_paths:
+            output_path = file_path.replace('.tsv', '_processed.tsv')
+            try:
+                reader = pd.read_csv(file_path, sep='\t', encoding='utf-8', dtype=str, keep_default_na=False,
+                                     chunksize=chunksize)
+                logger.info(f"Arquivo {file_path} carregado com sucesso.")
+                for i, chunk in enumerate(reader):
+                    future = executor.submit(_extract_chunk, chunk['Description'].tolist(), batch_size)
+                    pending.append((file_path, output_path, chunk, i == 0, future))
+                    # Limita quantas partes ficam em memória esperando o resultado
+                    while len(pending) > workers * 2:
+                        write_oldest()
+            except Exception as e:
+                logger.error(f"Erro ao processar o arquivo {file_path}: {e}")
+                failed.add(file_path)
+            pending.append((file_path, output_path, None, False, None))
+
+        while pending:
+            write_oldest()
+    logger.info(f"{len(file_paths)} arquivos processados com {workers} workers.")
+
 if __name__ == "__main__":
-    nlp_en, nlp_pt, nlp_es = load_models()
-    files = ['blackfriday_trending_videos.tsv', 'casasbahia_mentions.tsv', 'casasbahia_videos.tsv', 'hashtags_tweets.tsv']
-    for file in files:
-        analyze_file(file, nlp_en, nlp_pt, nlp_es)
+    parser = argparse.ArgumentParser(description="Extrair entidades das descrições dos posts coletados.")
+    parser.add_argument("files", nargs="*", default=DEFAULT_INPUTS, help="Arquivos TSV ou padrões glob a processar.")
+    parser.add_argument("--batch-size", type=int, default=nlpmodels.BATCH_SIZE, help="Textos por lote enviados ao spaCy.")
+    parser.add_argument("--n-process", type=int, default=1, help="Processos usados pelo nlp.pipe.")
+    parser.add_argument("--worker", action="store_true", help="Usa o worker de NER (python nlpmodels.py) se estiver no ar.")
+    parser.add_argument("--incremental", action="store_true", help="Processa apenas as linhas novas ou alteradas.")
+    parser.add_argument("--chunksize", type=int, help="Processa em partes desse número de linhas, com retomada.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processos para distribuir arquivos e partes de arquivos. Não combina com --incremental, "
+                             "--worker e --n-process, e não retoma jobs interrompidos.")
+    parser.add_argument("--no-ner", action="store_true",
+                        help="Extrai só hashtags, menções, URLs, preços, porcentagens e cupons, sem o spaCy.")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        conflicts = [flag for flag, used in (("--incremental", args.incremental), ("--worker", args.worker),
+                                             ("--n-process", args.n_process != 1)) if used]
+        if conflicts:
+            parser.error(f"--workers maior que 1 não pode ser usado com {', '.join(conflicts)}.")
+        if args.chunksize:
+            logger.warning("Com --workers, --chunksize só define o tamanho das partes; não há checkpoint para retomar.")
+
+    files = find_input_files(args.files)
+    if args.workers > 1:
+        analyze_files_parallel(files, args.workers, args.batch_size, args.chunksize or CHUNK_SIZE, not args.no_ner)
+    else:
+        models = load_models(args.worker, not args.no_ner)
+        for file in files:
+            if args.incremental:
+                analyze_file_incremental(file, models, args.batch_size, args.n_process)
+            elif args.chunksize:
+                analyze_file_streaming(file, models, args.batch_size, args.n_process, args.chunksize)
+            else:
+                analyze_file(file, models, args.batch_size, args.n_process)
@@ -0,0 +1,142 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+import metrics
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Intervalo entre verificações das condições (bem menor que o padrão de 0,5 s do Selenium)
+POLL_INTERVAL = float(os.environ.get("WAIT_POLL_INTERVAL", "0.1"))
+
+# Tempos máximos por etapa, em segundos. Podem ser sobrescritos com WAIT_<ETAPA>=segundos
+DEFAULT_BUDGETS = {
+    "twitter_popup": 5,
+    "twitter_tab": 10,
+    "twitter_topics": 10,
+    "tiktok_language_button": 10,
+    "tiktok_language_option": 10,
+    "tiktok_rerender": 10,
+    "tiktok_popup": 10,
+}
+
+# Script que instala um MutationObserver e guarda o horário da última alteração do DOM.
+# Com arguments[0], recomeça a contagem; retorna -1 enquanto nenhuma alteração acontecer
+# desde então, ou os milissegundos desde a última.
+_OBSERVER_SCRIPT = """
+if (!window.__cbObserver) {
+    window.__cbObserver = new MutationObserver(function () {
+        window.__cbMutated = true;
+        window.__cbLastMutation = Date.now();
+    });
+    window.__cbObserver.observe(document, {childList: true, subtree: true, characterData: true});
+    window.__cbMutated = false;
+}
+if (arguments[0]) { window.__cbMutated = false; }
+return window.__cbMutated ? Date.now() - window.__cbLastMutation : -1;
+"""
+
+# Lê de uma vez os textos de todos os elementos de um seletor CSS
+_TEXTS_SCRIPT = "return Array.from(document.querySelectorAll(arguments[0])).map(function (e) { return e.innerText; });"
+
+# Só as esperas mais recentes ficam guardadas, para não crescer sem limite no servidor residente
+_timings = deque(maxlen=int(os.environ.get("WAIT_TIMINGS_MAX", "1000")))
+_timings_lock = threading.Lock()
+
+
+def budget(step, overrides=None):
+    """Retorna o tempo máximo configurado para uma etapa."""
+    if overrides and step in overrides:
+        return overrides[step]
+    env_value = os.environ.get(f"WAIT_{step.upper()}")
+    if env_value:
+        return float(env_value)
+    return DEFAULT_BUDGETS.get(step, 10)
+
+
+def _record(step, elapsed, ok):
+    with _timings_lock:
+        _timings.append((step, elapsed, ok))
+    status = "ok" if ok else "tempo esgotado"
+    logger.info(f"Espera '{step}' levou {elapsed:.2f}s ({status}).")
+
+
+def wait_timings(clear=False):
+    """Retorna as esperas registradas como (etapa, segundos, sucesso)."""
+    with _timings_lock:
+        timings = list(_timings)
+        if clear:
+            _timings.clear()
+    return timings
+
+
+def wait_until(driver, condition, step, overrides=None):
+    """Espera uma condição do Selenium respeitando o tempo da etapa e registra a duração.
+
+    Repassa a TimeoutException para quem chamou, como o WebDriverWait faz.
+    """
+    start = time.perf_counter()
+    with metrics.span('page.wait', step=step):
+        try:
+            result = WebDriverWait(driver, budget(step, overrides), poll_frequency=POLL_INTERVAL).until(condition)
+        except TimeoutException:
+            _record(step, time.perf_counter() - start, False)
+            raise
+    _record(step, time.perf_counter() - start, True)
+    return result
+
+
+def element_texts(driver, css_selector):
+    """Retorna o texto de todos os elementos do seletor em uma única chamada ao navegador."""
+    return driver.execute_script(_TEXTS_SCRIPT, css_selector) or []
+
+
+def texts_changed(css_selector, previous):
+    """Condição: os textos dos elementos existem e são diferentes do retrato anterior."""
+    def _condition(driver):
+        current = element_texts(driver, css_selector)
+        return current if current and current != previous else False
+    return _condition
+
+
+def dom_quiet(quiet_ms=500):
+    """Condição: o DOM mudou desde o início da espera e está sem mutações há quiet_ms milissegundos.
+
+    Enquanto nenhuma mutação acontecer (ex.: a requisição da troca de idioma ainda não
+    voltou), a condição não é satisfeita.
+    """
+    def _condition(driver):
+        return driver.execute_script(_OBSERVER_SCRIPT, False) >= quiet_ms
+    return _condition
+
+
+def any_of(*conditions):
+    """Condição satisfeita assim que qualquer uma das condições for verdadeira."""
+    def _condition(driver):
+        for condition in conditions:
+            result = condition(driver)
+            if result:
+                return result
+        return False
+    return _condition
+
+
+def wait_for_rerender(driver, css_selector, previous, step, quiet_ms=500, overrides=None):
+    """Espera a página re-renderizar após uma ação sem usar uma pausa fixa.
+
+    Retorna assim que os textos do seletor mudarem ou, depois que o DOM começar a mudar,
+    ele ficar estável por quiet_ms. Se o tempo da etapa acabar, apenas registra e segue
+    com o que estiver na página.
+    """
+    # Instala o observer (ou zera o relógio dele) antes de começar a esperar
+    driver.execute_script(_OBSERVER_SCRIPT, True)
+    try:
+        return wait_until(driver, any_of(texts_changed(css_selector, previous), dom_quiet(quiet_ms)), step, overrides)
+    except TimeoutException:
+        logger.warning(f"A página não estabilizou dentro do tempo da etapa '{step}'.")
+        return False
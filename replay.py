@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import base64
+import runpy
+import logging
+import argparse
+import threading
+from http import HTTPStatus
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlencode, parse_qsl
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+# Cada cassete é um diretório com cassette.jsonl (respostas HTTP), meta.json (script e
+# argumentos gravados) e pages/ (HTML das páginas lidas pelo Selenium). As respostas
+# podem conter cookies e tokens de sessão, por isso fixtures/ fica fora do git.
+REPLAY_DIR = os.environ.get("REPLAY_DIR", os.path.join(REPO_DIR, "fixtures"))
+
+# Parâmetros que mudam entre execuções e não identificam a resposta. As respostas de uma
+# mesma chave são reproduzidas na ordem gravada, então a paginação continua correta.
+VOLATILE_PARAMS = {'since_id', 'next_token', '_', 'timestamp'}
+# Cabeçalhos que descrevem o corpo original, não o corpo já decodificado que é gravado
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'set-cookie'}
+
+
+def request_key(method, url):
+    """Chave de uma requisição: método e URL com a query ordenada, sem os parâmetros voláteis."""
+    parts = urlsplit(url)
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if name not in VOLATILE_PARAMS)
+    return f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path}?{urlencode(query)}"
+
+
+class Cassette:
+    """Respostas HTTP e páginas gravadas de um cenário, para reproduzir sem rede.
+
+    Em replay, as respostas de cada chave voltam na ordem gravada e recomeçam do início
+    quando acabam, para que o mesmo cenário possa ser repetido nos benchmarks.
+    """
+
+    def __init__(self, name, mode='replay', directory=REPLAY_DIR):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Modo inválido: {mode}. Use 'record' ou 'replay'.")
+        self.name = name
+        self.mode = mode
+        self.path = os.path.join(directory, name)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._positions = {}
+        self._pages = {}
+        if mode == 'record':
+            os.makedirs(os.path.join(self.path, 'pages'), exist_ok=True)
+            open(self.cassette_path, mode='w', encoding='utf-8').close()  # Começa uma gravação nova
+        elif not os.path.exists(self.cassette_path):
+            raise FileNotFoundError(f"Cassete '{name}' não encontrado em {self.path}")
+        else:
+            with open(self.cassette_path, encoding='utf-8') as file:
+                for line in file:
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry['key'], []).append(entry)
+
+    @property
+    def cassette_path(self):
+        return os.path.join(self.path, 'cassette.jsonl')
+
+    def record(self, method, url, status, headers, body, cookies=None):
+        """Grava uma resposta recebida."""
+        entry = {
+            'key': request_key(method, url), 'url': url, 'status': status,
+            'headers': {name: value for name, value in headers.items() if name.lower() not in _DROPPED_HEADERS},
+            'cookies': cookies or {}, 'body': base64.b64encode(body or b'').decode('ascii'),
+        }
+        with self._lock:
+            self._entries.setdefault(entry['key'], []).append(entry)
+            with open(self.cassette_path, mode='a', encoding='utf-8') as file:
+                file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def play(self, method, url):
+        """Próxima resposta gravada para a requisição, com o corpo em bytes, ou None."""
+        key = request_key(method, url)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            entry = entries[position % len(entries)]
+        return dict(entry, body=base64.b64decode(entry['body']))
+
+    def urls(self):
+        """URLs gravadas, na ordem das chaves."""
+        return [entry['url'] for entries in self._entries.values() for entry in entries]
+
+    def bodies(self, host):
+        """Corpos, em texto, de todas as respostas gravadas de um host."""
+        return [base64.b64decode(entry['body']).decode('utf-8', errors='replace')
+                for entries in self._entries.values() for entry in entries
+                if (urlsplit(entry['url']).hostname or '').endswith(host)]
+
+    def body(self, host):
+        """Corpo, em texto, da primeira resposta gravada de um host, ou None."""
+        bodies = self.bodies(host)
+        return bodies[0] if bodies else None
+
+    def save_page(self, url, page):
+        """Guarda o HTML de uma página do Selenium em pages/<host>.html."""
+        host = urlsplit(url).hostname or 'page'
+        with self._lock:
+            count = self._pages[host] = self._pages.get(host, 0) + 1
+        filename = f"{host}.html" if count == 1 else f"{host}-{count}.html"
+        with open(os.path.join(self.path, 'pages', filename), mode='w', encoding='utf-8') as file:
+            file.write(page)
+
+    def page(self, host):
+        """HTML gravado de um host; levanta FileNotFoundError se não houver."""
+        with open(os.path.join(self.path, 'pages', f"{host}.html"), encoding='utf-8') as file:
+            return file.read()
+
+    def save_meta(self, script, args):
+        with open(os.path.join(self.path, 'meta.json'), mode='w', encoding='utf-8') as file:
+            json.dump({'script': os.path.relpath(os.path.abspath(script), REPO_DIR), 'args': list(args)}, file,
+                      ensure_ascii=False, indent=2)
+
+    def load_meta(self):
+        with open(os.path.join(self.path, 'meta.json'), encoding='utf-8') as file:
+            return json.load(file)
+
+
+def _reason(status):
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return ''
+
+
+def _patch_requests(cassette):
+    """Intercepta requests.Session.send, por onde passam requests, pytrends e instagrapi."""
+    import requests
+    from requests.cookies import cookiejar_from_dict
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+
+    original = requests.Session.send
+
+    def send(session, request, **kwargs):
+        if cassette.mode == 'record':
+            # Sem GET condicional, para gravar a resposta completa em vez de um 304
+            request.headers.pop('If-None-Match', None)
+            request.headers.pop('If-Modified-Since', None)
+            response = original(session, request, **kwargs)
+            cassette.record(request.method, request.url, response.status_code, response.headers,
+                            response.content, response.cookies.get_dict())
+            return response
+
+        entry = cassette.play(request.method, request.url)
+        if entry is None:
+            raise requests.ConnectionError(f"Sem resposta gravada para {request.method} {request.url}",
+                                           request=request)
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = _reason(entry['status'])
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry['body']
+        response.url = request.url
+        response.request = request
+        response.cookies = cookiejar_from_dict(entry['cookies'])
+        session.cookies.update(response.cookies)
+        return response
+
+    requests.Session.send = send
+    return lambda: setattr(requests.Session, 'send', original)
+
+
+def _patch_httpx(cassette):
+    """Intercepta httpx.AsyncClient.send, usado na coleta assíncrona do Twitter."""
+    try:
+        import httpx
+    except ImportError:
+        return lambda: None
+
+    original = httpx.AsyncClient.send
+
+    async def send(client, request, **kwargs):
+        if cassette.mode == 'record':
+            response = await original(client, request, **kwargs)
+            await response.aread()
+            cassette.record(request.method, str(request.url), response.status_code, response.headers,
+                            response.content, dict(response.cookies))
+            return response
+
+        entry = cassette.play(request.method, str(request.url))
+        if entry is None:
+            raise httpx.ConnectError(f"Sem resposta gravada para {request.method} {request.url}", request=request)
+        return httpx.Response(entry['status'], headers=entry['headers'], content=entry['body'], request=request)
+
+    httpx.AsyncClient.send = send
+    return lambda: setattr(httpx.AsyncClient, 'send', original)
+
+
+def _patch_selenium(cassette):
+    """Na gravação, salva o HTML da página sempre que gethashtags.extract_texts lê as tabelas.
+
+    O HTML é salvo em pages/ do cassete e usado nos benchmarks dos parsers; em replay não há
+    Selenium, então nada é interceptado.
+    """
+    if cassette.mode != 'record':
+        return lambda: None
+    try:
+        from selenium.webdriver.remote.webdriver import WebDriver
+        from gethashtags import _TEXTS_BY_SELECTOR_SCRIPT
+    except ImportError:
+        return lambda: None
+
+    original = WebDriver.execute_script
+
+    def execute_script(driver, script, *args):
+        if script == _TEXTS_BY_SELECTOR_SCRIPT:
+            try:
+                cassette.save_page(driver.current_url, driver.page_source)
+            except Exception as e:
+                logger.warning(f"Não foi possível salvar o HTML da página: {e}")
+        return original(driver, script, *args)
+
+    WebDriver.execute_script = execute_script
+    return lambda: setattr(WebDriver, 'execute_script', original)
+
+
+@contextmanager
+def use_cassette(name, mode='replay', directory=REPLAY_DIR):
+    """Grava ou reproduz todas as requisições HTTP feitas dentro do bloco.
+
+    Na gravação, também guarda o HTML das páginas lidas pelo Selenium. As interceptações
+    valem para o processo inteiro: use um cassete de cada vez.
+    """
+    cassette = Cassette(name, mode, directory)
+    restores = [_patch_requests(cassette), _patch_httpx(cassette), _patch_selenium(cassette)]
+    logger.info(f"Cassete '{name}' em modo {mode}.")
+    try:
+        yield cassette
+    finally:
+        for restore in reversed(restores):
+            restore()
+
+
+def run_script(name, mode='replay', script=None, args=None, directory=REPLAY_DIR):
+    """Executa um coletor como __main__ gravando ou reproduzindo o cassete.
+
+    Em replay, script e argumentos vêm do meta.json gravado, se não forem informados.
+    """
+    with use_cassette(name, mode, directory) as cassette:
+        if mode == 'record':
+            args = list(args or [])
+            cassette.save_meta(script, args)
+        else:
+            meta = cassette.load_meta()
+            script = script or os.path.join(REPO_DIR, meta['script'])
+            args = meta['args'] if args is None else args
+        argv = sys.argv
+        sys.argv = [script, *args]
+        try:
+            runpy.run_path(script, run_name='__main__')
+        finally:
+            sys.argv = argv
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gravar e reproduzir as respostas HTTP dos coletores.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="Executa um coletor gravando as respostas.")
+    record_parser.add_argument("name", help="Nome do cassete (diretório em fixtures/).")
+    record_parser.add_argument("script", help="Script do coletor, como gettwitterposts.py.")
+    record_parser.add_argument("args", nargs=argparse.REMAINDER, help="Argumentos repassados ao coletor.")
+    replay_parser = subparsers.add_parser("replay", help="Executa de novo um coletor gravado, sem rede.")
+    replay_parser.add_argument("name", help="Nome do cassete.")
+    replay_parser.add_argument("args", nargs=argparse.REMAINDER, help="Substitui os argumentos gravados.")
+    subparsers.add_parser("list", help="Lista os cassetes gravados.")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        run_script(args.name, 'record', args.script, args.args)
+    elif args.command == "replay":
+        run_script(args.name, 'replay', args=args.args or None)
+    else:
+        for name in sorted(os.listdir(REPLAY_DIR)) if os.path.isdir(REPLAY_DIR) else []:
+            print(name)
@@ -0,0 +1,581 @@
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import metrics
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SERVER_HOST = os.environ.get("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", "8080"))
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", "4"))
+SCHEDULES_PATH = os.environ.get("SERVER_SCHEDULES", os.path.join(".cache", "schedules.json"))
+MAX_FINISHED_JOBS = int(os.environ.get("SERVER_MAX_FINISHED_JOBS", "500"))
+# Tempo máximo de espera por um job do TikTok no event loop das sessões
+TIKTOK_JOB_TIMEOUT = float(os.environ.get("SERVER_TIKTOK_TIMEOUT", "600"))
+
+# Jobs simultâneos por plataforma (SERVER_LIMIT_<PLATAFORMA>). Com o padrão 1, jobs da
+# mesma plataforma rodam um de cada vez e nunca disputam os mesmos TSVs.
+PLATFORM_LIMITS = {
+    platform: int(os.environ.get(f"SERVER_LIMIT_{platform.upper()}", "1"))
+    for platform in ('trends', 'google', 'twitter', 'tiktok', 'instagram', 'nlp')
+}
+
+TWITTER_TRENDS_URL = 'https://trends24.in/brazil/'
+TIKTOK_TRENDS_URL = 'https://ads.tiktok.com/business/creativecenter/inspiration/popular/hashtag/pc/pt?from=001119'
+
+
+# Os coletores são importados na primeira execução e ficam carregados (pool do Chrome,
+# cache e fila do Google Trends, sessões HTTP e modelos) para os jobs seguintes.
+
+def run_trends(params):
+    import gethashtags
+    results = gethashtags.collect_all_trends(params.get('twitter_url', TWITTER_TRENDS_URL),
+                                             params.get('tiktok_url', TIKTOK_TRENDS_URL))
+    return {name: 0 if data is None else len(data) for name, data in results.items()}
+
+
+def run_products(params):
+    import getproductstrends
+    return getproductstrends.fetch_trends_by_category(params['category'], params['products'])
+
+
+def run_states(params):
+    import gettopproductsstate
+    return {'estados': gettopproductsstate.process_all_regions()}
+
+
+def run_tweets(params):
+    import gettwitterposts
+    queries = gettwitterposts.parse_queries(params['queries'])
+    if not queries:
+        raise ValueError("Nenhuma consulta válida.")
+    results = asyncio.run(gettwitterposts.collect_many(
+        queries, params.get('max_results', 10), params.get('max_pages', 1), params.get('concurrency', 10),
+        not params.get('full', False)
+    ))
+    if all(isinstance(result, Exception) for result in results):
+        raise results[0]
+    return {query: None if isinstance(result, Exception) else result for (query, _), result in zip(queries, results)}
+
+
+class TikTokSessions:
+    """Mantém as sessões do TikTokApi abertas entre os jobs, em um event loop próprio.
+
+    Se todas as buscas de um job voltarem vazias, as sessões são marcadas como suspeitas e
+    recriadas antes do próximo job.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True, name='tiktok-loop').start()
+        self.manager = None
+        self.num_sessions = 0
+        self.in_flight = 0
+        self.stale = False
+        self._lock = asyncio.Lock()
+
+    async def _close(self):
+        if self.manager is not None:
+            manager, self.manager = self.manager, None
+            try:
+                await manager.__aexit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"Erro ao fechar as sessões do TikTok: {e}")
+
+    async def _acquire(self, num_sessions):
+        import gettiktokvideos
+        async with self._lock:
+            needs_more = self.num_sessions < num_sessions
+            if self.manager is not None and (self.stale or needs_more) and self.in_flight == 0:
+                await self._close()
+            if self.manager is None:
+                manager = gettiktokvideos.TikTokSessionManager(gettiktokvideos.ms_tokens, num_sessions)
+                self.manager = await manager.__aenter__()
+                self.num_sessions, self.stale = num_sessions, False
+            self.in_flight += 1
+            return self.manager
+
+    async def _fetch(self, usernames, hashtags, count, num_sessions):
+        manager = await self._acquire(num_sessions)
+        try:
+            results = await asyncio.gather(
+                *(manager.fetch_user_videos(username, count) for username in usernames),
+                *(manager.fetch_trending_videos(hashtag, count) for hashtag in hashtags)
+            )
+        finally:
+            self.in_flight -= 1
+        if results and not any(results):
+            self.stale = True
+        names = [*usernames, *(f"#{hashtag}" for hashtag in hashtags)]
+        return {name: len(videos) for name, videos in zip(names, results)}
+
+    def fetch(self, usernames, hashtags, count=5, num_sessions=1, timeout=TIKTOK_JOB_TIMEOUT):
+        coroutine = self._fetch(usernames, hashtags, count, num_sessions)
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Busca do TikTok sem resposta após {timeout}s.") from None
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(timeout=30)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_tiktok = None
+_instagram_client = None
+_nlp_models = {}
+_resources_lock = threading.Lock()
+
+
+def run_tiktok(params):
+    global _tiktok
+    # Importa aqui, e não no event loop das sessões: sem TIKTOK_MS_TOKEN o módulo encerra com
+    # SystemExit, que no loop derrubaria a thread e travaria os jobs seguintes
+    try:
+        import gettiktokvideos  # noqa: F401
+    except SystemExit as e:
+        raise RuntimeError(str(e)) from None
+    with _resources_lock:
+        if _tiktok is None:
+            _tiktok = TikTokSessions()
+    return _tiktok.fetch(params.get('users', []), params.get('hashtags', []), params.get('count', 5),
+                         params.get('num_sessions', 1))
+
+
+def _instagram_session(expired=None):
+    """Cliente autenticado compartilhado pelos jobs; expired descarta essa sessão e faz login de novo."""
+    global _instagram_client
+    import getinstagramposts
+    with _resources_lock:
+        if _instagram_client is None or _instagram_client is expired:
+            _instagram_client = None
+            _instagram_client = getinstagramposts.authenticate()
+        return _instagram_client
+
+
+def run_instagram(params):
+    import getinstagramposts
+    users, hashtags = params.get('users', []), params.get('hashtags', [])
+    amount, concurrency = params.get('amount', 5), params.get('concurrency', 4)
+    client = _instagram_session()
+    errors = asyncio.run(getinstagramposts.main(users, hashtags, amount, concurrency, client=client))
+    if any(error['sessao_expirada'] for error in errors):
+        # A sessão salva expirou: autentica de novo e repete o job uma vez
+        logger.warning("Sessão do Instagram recusada; autenticando de novo.")
+        client = _instagram_session(expired=client)
+        errors = asyncio.run(getinstagramposts.main(users, hashtags, amount, concurrency, client=client))
+    if errors and len(errors) == len(users) + len(hashtags):
+        raise RuntimeError(f"Todas as buscas do Instagram falharam: {errors[0]['erro']}")
+    return {'usuarios': users, 'hashtags': hashtags, 'erros': errors}
+
+
+def run_nlp(params):
+    import nlpsocialsposts
+    ner, worker = not params.get('no_ner', False), bool(params.get('worker', False))
+    with _resources_lock:
+        if (ner, worker) not in _nlp_models:
+            _nlp_models[ner, worker] = nlpsocialsposts.load_models(worker, ner)
+    models = _nlp_models[ner, worker]
+    batch_size = params.get('batch_size', nlpsocialsposts.nlpmodels.BATCH_SIZE)
+    files = nlpsocialsposts.find_input_files(params.get('files') or nlpsocialsposts.DEFAULT_INPUTS)
+    for file in files:
+        # No servidor o padrão é processar só as linhas novas
+        if params.get('incremental', True):
+            nlpsocialsposts.analyze_file_incremental(file, models, batch_size)
+        else:
+            nlpsocialsposts.analyze_file(file, models, batch_size)
+    return {'arquivos': files}
+
+
+# Tipo de job: (plataforma, função, parâmetros obrigatórios)
+JOB_KINDS = {
+    'trends': ('trends', run_trends, ()),
+    'products': ('google', run_products, ('category', 'products')),
+    'states': ('google', run_states, ()),
+    'tweets': ('twitter', run_tweets, ('queries',)),
+    'tiktok': ('tiktok', run_tiktok, ()),
+    'instagram': ('instagram', run_instagram, ()),
+    'nlp': ('nlp', run_nlp, ()),
+}
+# Parâmetros que são listas de textos: uma string seria percorrida letra a letra
+LIST_PARAMS = ('queries', 'products', 'users', 'hashtags', 'files')
+
+
+def validate(kind, params):
+    """Confere o tipo do job, os parâmetros obrigatórios e os de lista; levanta ValueError se inválidos."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Tipo de job desconhecido: {kind}. Tipos: {', '.join(sorted(JOB_KINDS))}")
+    if not isinstance(params, dict):
+        raise ValueError("Os parâmetros do job devem ser um objeto JSON.")
+    missing = [name for name in JOB_KINDS[kind][2] if name not in params]
+    if missing:
+        raise ValueError(f"Parâmetros obrigatórios ausentes para {kind}: {', '.join(missing)}")
+    for name in LIST_PARAMS:
+        value = params.get(name)
+        if value is not None and not (isinstance(value, list) and all(isinstance(item, str) for item in value)):
+            raise ValueError(f"O parâmetro {name} deve ser uma lista de textos.")
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _jsonable(value):
+    """Converte o resultado de um job para algo serializável em JSON."""
+    if hasattr(value, 'to_json'):
+        return json.loads(value.to_json(orient='records', force_ascii=False))
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+class JobManager:
+    """Fila de jobs atendida por um número fixo de threads, com limite por plataforma.
+
+    Um job idêntico (mesmo tipo e parâmetros) a outro ainda na fila ou em execução não é
+    enfileirado de novo: o pedido devolve o job existente.
+    """
+
+    def __init__(self, workers=SERVER_WORKERS, limits=None, max_finished=MAX_FINISHED_JOBS):
+        self.limits = dict(limits or PLATFORM_LIMITS)
+        self.max_finished = max_finished
+        self._running = {platform: 0 for platform in self.limits}
+        self._queue = []
+        self._jobs = OrderedDict()
+        self._signatures = {}
+        self._active = {}
+        self._condition = threading.Condition()
+        self._stopping = False
+        for i in range(workers):
+            threading.Thread(target=self._work, daemon=True, name=f'job-worker-{i}').start()
+
+    def submit(self, kind, params=None, schedule_id=None):
+        """Enfileira um job; retorna (job, criado), com criado False se já havia um igual ativo."""
+        params = params if params is not None else {}
+        validate(kind, params)
+        signature = json.dumps([kind, params], sort_keys=True, ensure_ascii=False)
+        with self._condition:
+            if signature in self._active:
+                return dict(self._jobs[self._active[signature]]), False
+            job = {
+                'id': uuid.uuid4().hex[:12], 'kind': kind, 'params': params, 'schedule_id': schedule_id,
+                'status': 'queued', 'created_at': _now(), 'started_at': None, 'finished_at': None,
+                'duration_s': None, 'result': None, 'error': None,
+            }
+            self._jobs[job['id']] = job
+            self._signatures[job['id']] = signature
+            self._active[signature] = job['id']
+            self._queue.append(job['id'])
+            self._condition.notify_all()
+            logger.info(f"Job {job['id']} ({kind}) enfileirado.")
+            return dict(job), True
+
+    def _next(self):
+        # O primeiro job da fila cuja plataforma ainda tem vaga
+        for i, job_id in enumerate(self._queue):
+            platform = JOB_KINDS[self._jobs[job_id]['kind']][0]
+            if self._running[platform] < self.limits[platform]:
+                del self._queue[i]
+                return job_id, platform
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopping:
+                        return
+                    picked = self._next()
+                    if picked:
+                        break
+                    self._condition.wait()
+                job_id, platform = picked
+                self._running[platform] += 1
+                job = self._jobs[job_id]
+                job.update(status='running', started_at=_now())
+
+            logger.info(f"Job {job_id} ({job['kind']}) iniciado.")
+            start = time.perf_counter()
+            try:
+                with metrics.span('server.job', kind=job['kind']):
+                    result, error, status = _jsonable(JOB_KINDS[job['kind']][1](job['params'])), None, 'done'
+            except (Exception, SystemExit) as e:
+                logger.error(f"Erro no job {job_id} ({job['kind']}): {e}")
+                result, error, status = None, str(e), 'failed'
+            duration = round(time.perf_counter() - start, 3)
+
+            with self._condition:
+                job.update(status=status, result=result, error=error, finished_at=_now(), duration_s=duration)
+                self._running[platform] -= 1
+                del self._active[self._signatures.pop(job_id)]
+                self._prune()
+                self._condition.notify_all()
+            logger.info(f"Job {job_id} ({job['kind']}) finalizado em {duration}s: {status}.")
+
+    def _prune(self):
+        # Descarta os jobs finalizados mais antigos acima do limite
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in ('done', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self, status=None, kind=None):
+        with self._condition:
+            return [dict(job) for job in self._jobs.values()
+                    if (status is None or job['status'] == status) and (kind is None or job['kind'] == kind)]
+
+    def stats(self):
+        """Jobs na fila e em execução por plataforma."""
+        with self._condition:
+            return {'queued': len(self._queue), 'running': dict(self._running), 'limits': dict(self.limits)}
+
+    def stop(self):
+        """Para de iniciar jobs; os que estão em execução terminam normalmente."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+
+class Scheduler:
+    """Enfileira jobs em intervalos fixos; os agendamentos ficam salvos em SCHEDULES_PATH.
+
+    Se a execução anterior ainda estiver ativa, o job não é duplicado, e execuções perdidas
+    (servidor parado ou job demorado) não se acumulam.
+    """
+
+    def __init__(self, jobs, path=SCHEDULES_PATH):
+        self.jobs = jobs
+        self.path = path
+        self._schedules = {}
+        self._condition = threading.Condition()
+        self._stopping = False
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                for schedule in json.load(file):
+                    self.add(schedule['kind'], schedule.get('params', {}), schedule['interval'],
+                             schedule.get('id'), save=False)
+            logger.info(f"{len(self._schedules)} agendamentos carregados de {path}.")
+        threading.Thread(target=self._run, daemon=True, name='scheduler').start()
+
+    def add(self, kind, params, interval, schedule_id=None, run_now=True, save=True):
+        """Agenda um job a cada interval segundos; com run_now, a primeira execução é imediata."""
+        params = params if params is not None else {}
+        validate(kind, params)
+        if not isinstance(interval, (int, float)) or interval <= 0:
+            raise ValueError("O intervalo deve ser um número positivo de segundos.")
+        schedule = {
+            'id': schedule_id or uuid.uuid4().hex[:12], 'kind': kind, 'params': params, 'interval': interval,
+            'next_run': time.time() + (0 if run_now else interval), 'last_job': None,
+        }
+        with self._condition:
+            self._schedules[schedule['id']] = schedule
+            if save:
+                self._save()
+            self._condition.notify_all()
+        return self._public(schedule)
+
+    def remove(self, schedule_id):
+        with self._condition:
+            if self._schedules.pop(schedule_id, None) is None:
+                return False
+            self._save()
+            return True
+
+    def list(self):
+        with self._condition:
+            return [self._public(schedule) for schedule in self._schedules.values()]
+
+    @staticmethod
+    def _public(schedule):
+        return dict(schedule, next_run=datetime.fromtimestamp(schedule['next_run']).isoformat(timespec='seconds'))
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        schedules = [{name: schedule[name] for name in ('id', 'kind', 'params', 'interval')}
+                     for schedule in self._schedules.values()]
+        with open(self.path + '.tmp', mode='w', encoding='utf-8') as file:
+            json.dump(schedules, file, ensure_ascii=False, indent=2)
+        os.replace(self.path + '.tmp', self.path)
+
+    def _run(self):
+        with self._condition:
+            while not self._stopping:
+                now = time.time()
+                for schedule in self._schedules.values():
+                    if schedule['next_run'] > now:
+                        continue
+                    try:
+                        job, _ = self.jobs.submit(schedule['kind'], schedule['params'], schedule['id'])
+                        schedule['last_job'] = job['id']
+                    except ValueError as e:
+                        logger.error(f"Agendamento {schedule['id']} inválido: {e}")
+                    while schedule['next_run'] <= now:
+                        schedule['next_run'] += schedule['interval']
+                upcoming = min((schedule['next_run'] for schedule in self._schedules.values()), default=now + 60)
+                self._condition.wait(max(0.1, upcoming - time.time()))
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """API HTTP local:
+
+    GET    /health               estado da fila, do Google Trends e do cache
+    GET    /metrics              métricas das etapas no formato do Prometheus
+    GET    /jobs[?status=&kind=]  jobs recentes
+    GET    /jobs/<id>            status e resultado de um job
+    POST   /jobs                 {"kind": ..., "params": {...}}
+    GET    /schedules            agendamentos
+    POST   /schedules            {"kind": ..., "params": {...}, "interval": segundos, "run_now": true}
+    DELETE /schedules/<id>       remove um agendamento
+    GET    /data/<fonte>[?platform=&since=&limit=]  linhas mais recentes do histórico (storage.py)
+    """
+
+    server_version = "cb_scrapping_server"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8'):
+        if isinstance(body, str):
+            data = body.encode('utf-8')
+        else:
+            data = json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        return parts, query
+
+    def do_GET(self):
+        parts, query = self._route()
+        jobs, scheduler = self.server.jobs, self.server.scheduler
+        if parts == ['health']:
+            body = {'status': 'ok', 'jobs': jobs.stats()}
+            # Só informa o que já foi carregado por algum job
+            for name in ('trendsscheduler', 'trendscache'):
+                if name in sys.modules:
+                    body[name] = sys.modules[name].stats()
+            self._send(200, body)
+        elif parts == ['metrics']:
+            self._send(200, metrics.prometheus_text(), 'text/plain; version=0.0.4; charset=utf-8')
+        elif parts == ['jobs']:
+            self._send(200, jobs.list(query.get('status'), query.get('kind')))
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = jobs.get(parts[1])
+            if job:
+                self._send(200, job)
+            else:
+                self._send(404, {'error': f"Job {parts[1]} não encontrado."})
+        elif parts == ['schedules']:
+            self._send(200, scheduler.list())
+        elif len(parts) == 2 and parts[0] == 'data':
+            import storage
+            if parts[1] not in storage.SCHEMAS:
+                self._send(404, {'error': f"Fonte desconhecida: {parts[1]}"})
+                return
+            try:
+                limit = int(query.get('limit', 100))
+                if limit < 0:
+                    raise ValueError
+            except ValueError:
+                self._send(400, {'error': f"limit deve ser um inteiro não negativo: {query['limit']}"})
+                return
+            try:
+                df = storage.read(parts[1], query.get('platform'), query.get('since'))
+                self._send(200, _jsonable(df.tail(limit)))
+            except Exception as e:
+                logger.error(f"Erro ao ler o histórico de {parts[1]}: {e}")
+                self._send(500, {'error': str(e)})
+        else:
+            self._send(404, {'error': "Rota não encontrada."})
+
+    def do_POST(self):
+        parts, _ = self._route()
+        try:
+            body = self._read_json()
+            if parts == ['jobs']:
+                job, created = self.server.jobs.submit(body.get('kind'), body.get('params'))
+                self._send(202 if created else 200, job)
+            elif parts == ['schedules']:
+                schedule = self.server.scheduler.add(body.get('kind'), body.get('params'), body.get('interval'),
+                                                     run_now=body.get('run_now', True))
+                self._send(201, schedule)
+            else:
+                self._send(404, {'error': "Rota não encontrada."})
+        except (ValueError, AttributeError) as e:
+            # JSON inválido, corpo que não é objeto ou parâmetros inválidos
+            self._send(400, {'error': str(e)})
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) == 2 and parts[0] == 'schedules':
+            if self.server.scheduler.remove(parts[1]):
+                self._send(200, {'deleted': parts[1]})
+            else:
+                self._send(404, {'error': f"Agendamento {parts[1]} não encontrado."})
+        else:
+            self._send(404, {'error': "Rota não encontrada."})
+
+
+def serve(host=SERVER_HOST, port=SERVER_PORT, workers=SERVER_WORKERS, schedules_path=SCHEDULES_PATH):
+    """Sobe a API e atende até ser interrompido (Ctrl+C)."""
+    jobs = JobManager(workers)
+    scheduler = Scheduler(jobs, schedules_path)
+    httpd = ThreadingHTTPServer((host, port), RequestHandler)
+    httpd.jobs, httpd.scheduler = jobs, scheduler
+    logger.info(f"Servidor de coleta em http://{host}:{port} com {workers} workers.")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Encerrando o servidor...")
+    finally:
+        httpd.server_close()
+        scheduler.stop()
+        jobs.stop()
+        if _tiktok is not None:
+            _tiktok.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de coleta com fila de jobs e agendamentos.")
+    parser.add_argument("--host", default=SERVER_HOST, help="Endereço em que a API escuta.")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="Porta em que a API escuta.")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Jobs executados ao mesmo tempo.")
+    parser.add_argument("--schedules", default=SCHEDULES_PATH, help="Arquivo JSON com os agendamentos.")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.schedules)
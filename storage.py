@@ -0,0 +1,316 @@
+import os
+import json
+import uuid
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import date
+from contextlib import contextmanager
+import pandas as pd
+import metrics
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "sqlite")
+STORAGE_PATH = os.environ.get("STORAGE_PATH", "data")
+
+# Esquema tipado de cada fonte: colunas (nome, tipo) e chave primária usada na deduplicação.
+# Toda linha recebe também as colunas de partição snapshot_date e platform.
+# Tipos: text, integer, real e entities (lista de pares (texto, rótulo)).
+# on_conflict diz o que fazer com uma chave já gravada:
+# - update: a linha nova substitui a antiga, inclusive snapshot_date e platform. Usado nas fontes
+#   mutáveis (curtidas e comentários mudam a cada coleta; entidades mudam quando o modelo muda);
+# - ignore: vale a primeira gravação. Usado em tweets, cujo conteúdo não muda e cuja data é a da
+#   primeira coleta, e nas tendências, em que o primeiro snapshot do dia é o registro do dia.
+SCHEMAS = {
+    'tweets': {
+        'columns': [('id', 'text'), ('created_at', 'text'), ('author_id', 'text'), ('text', 'text'),
+                    ('query', 'text')],
+        'key': ['id'],
+        'on_conflict': 'ignore',
+    },
+    'tiktok_videos': {
+        'columns': [('id', 'text'), ('description', 'text'), ('create_time', 'integer'), ('likes', 'integer'),
+                    ('comments', 'integer'), ('shares', 'integer')],
+        'key': ['id'],
+        'on_conflict': 'update',
+    },
+    'instagram_posts': {
+        'columns': [('pk', 'text'), ('caption', 'text'), ('likes', 'integer'), ('comments', 'integer'),
+                    ('taken_at', 'text')],
+        'key': ['pk'],
+        'on_conflict': 'update',
+    },
+    'trends': {
+        'columns': [('hashtag', 'text'), ('count', 'real')],
+        'key': ['snapshot_date', 'platform', 'hashtag'],
+        'on_conflict': 'ignore',
+    },
+    'product_trends': {
+        'columns': [('product', 'text'), ('category', 'text'), ('state', 'text'), ('score', 'real')],
+        'key': ['snapshot_date', 'platform', 'state', 'product'],
+        'on_conflict': 'ignore',
+    },
+    'post_entities': {
+        'columns': [('source_file', 'text'), ('row_key', 'text'), ('description', 'text'),
+                    ('entities', 'entities')],
+        'key': ['source_file', 'row_key'],
+        'on_conflict': 'update',
+    },
+}
+PARTITION_COLUMNS = [('snapshot_date', 'text'), ('platform', 'text')]
+
+_SQLITE_TYPES = {'text': 'TEXT', 'integer': 'INTEGER', 'real': 'REAL', 'entities': 'TEXT'}
+
+
+def _columns(source):
+    return PARTITION_COLUMNS + SCHEMAS[source]['columns']
+
+
+def _updates(source):
+    return SCHEMAS[source]['on_conflict'] == 'update'
+
+
+def _to_frame(source, records, platform, snapshot_date):
+    """Converte os registros para um DataFrame com as colunas e tipos do esquema."""
+    df = pd.DataFrame.from_records(records, columns=[name for name, _ in SCHEMAS[source]['columns']])
+    df.insert(0, 'platform', platform)
+    if not isinstance(snapshot_date, str):
+        snapshot_date = (snapshot_date or date.today()).isoformat()
+    df.insert(0, 'snapshot_date', snapshot_date)
+    for name, kind in _columns(source):
+        if kind == 'integer':
+            df[name] = pd.to_numeric(df[name], errors='coerce').astype('Int64')
+        elif kind == 'real':
+            df[name] = pd.to_numeric(df[name], errors='coerce')
+        elif kind == 'text':
+            df[name] = df[name].astype('string')
+    return df.drop_duplicates(subset=SCHEMAS[source]['key'], keep='last')
+
+
+class SQLiteBackend:
+    """Um banco SQLite com uma tabela tipada por fonte; entidades ficam em JSON (consultável com JSON1)."""
+
+    def __init__(self, path=STORAGE_PATH):
+        os.makedirs(path, exist_ok=True)
+        self.db_path = os.path.join(path, "cb_scrapping.sqlite")
+        with self._connect() as conn:
+            for source in SCHEMAS:
+                columns = ', '.join(f'"{name}" {_SQLITE_TYPES[kind]}' for name, kind in _columns(source))
+                key = ', '.join(f'"{name}"' for name in SCHEMAS[source]['key'])
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {source} ({columns}, PRIMARY KEY ({key}))')
+                conn.execute(f'CREATE INDEX IF NOT EXISTS {source}_partition ON {source} (snapshot_date, platform)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def append(self, source, df):
+        names = [name for name, _ in _columns(source)]
+        rows = []
+        for row in df[names].itertuples(index=False):
+            rows.append(tuple(
+                json.dumps(value, ensure_ascii=False) if kind == 'entities'
+                else (None if pd.isna(value) else value.item() if hasattr(value, 'item') else value)
+                for value, (_, kind) in zip(row, _columns(source))
+            ))
+        placeholders = ', '.join('?' for _ in names)
+        if _updates(source):
+            key = SCHEMAS[source]['key']
+            assignments = ', '.join(f'"{name}" = excluded."{name}"' for name in names if name not in key)
+            conflict = ', '.join(f'"{name}"' for name in key)
+            statement = (f'INSERT INTO {source} VALUES ({placeholders}) '
+                         f'ON CONFLICT ({conflict}) DO UPDATE SET {assignments}')
+        else:
+            statement = f'INSERT OR IGNORE INTO {source} VALUES ({placeholders})'
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(statement, rows)
+            return conn.total_changes - before
+
+    def read(self, source, platform=None, since=None):
+        query, params = f'SELECT * FROM {source} WHERE 1 = 1', []
+        if platform:
+            query += ' AND platform = ?'
+            params.append(platform)
+        if since:
+            query += ' AND snapshot_date >= ?'
+            params.append(since)
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        for name, kind in _columns(source):
+            if kind == 'entities':
+                df[name] = df[name].map(lambda value: [tuple(item) for item in json.loads(value)] if value else [])
+        return df
+
+
+class ParquetBackend:
+    """Arquivos Parquet particionados por fonte, plataforma e data; entidades como lista de structs.
+
+    Depende do pyarrow, que não faz parte do requirements.txt e precisa ser instalado à parte.
+    """
+
+    def __init__(self, path=STORAGE_PATH):
+        try:
+            import pyarrow
+            import pyarrow.dataset
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("STORAGE_BACKEND=parquet exige o pyarrow, que não está no requirements.txt: "
+                              "instale com 'pip install pyarrow' ou use STORAGE_BACKEND=sqlite.") from e
+        self.pa = pyarrow
+        self.ds = pyarrow.dataset
+        self.pq = pyarrow.parquet
+        self.path = path
+
+    def _schema(self, columns):
+        pa = self.pa
+        types = {'text': pa.string(), 'integer': pa.int64(), 'real': pa.float64(),
+                 'entities': pa.list_(pa.struct([('text', pa.string()), ('label', pa.string())]))}
+        return pa.schema([(name, types[kind]) for name, kind in columns])
+
+    def _dataset(self, source):
+        directory = os.path.join(self.path, source)
+        if not os.path.isdir(directory):
+            return None
+        # As colunas de partição vêm dos nomes dos diretórios, não dos arquivos
+        partitioning = self.ds.partitioning(self._schema(PARTITION_COLUMNS), flavor='hive')
+        return self.ds.dataset(directory, schema=self._schema(_columns(source)), format='parquet',
+                               partitioning=partitioning)
+
+    def _directory(self, source, snapshot_date, platform):
+        return os.path.join(self.path, source, f"snapshot_date={snapshot_date}", f"platform={platform}")
+
+    def _remove_keys(self, source, existing, df):
+        """Reescreve as partições que têm chaves de df sem essas linhas, para que a versão nova as substitua."""
+        key = SCHEMAS[source]['key']
+        partitions = [name for name, _ in PARTITION_COLUMNS]
+        new_keys = pd.MultiIndex.from_frame(df[key].astype(object))
+        seen = existing.to_table(columns=list(dict.fromkeys(key + partitions))).to_pandas()
+        seen = seen[pd.MultiIndex.from_frame(seen[key].astype(object)).isin(new_keys)]
+        for (snapshot_date, platform), _ in seen.groupby(partitions):
+            directory = self._directory(source, snapshot_date, platform)
+            files = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.parquet')]
+            table = self.ds.dataset(files, schema=self._schema(SCHEMAS[source]['columns']), format='parquet').to_table()
+            keys = table.select([name for name in key if name not in partitions]).to_pandas()
+            keys = keys.assign(snapshot_date=snapshot_date, platform=platform)[key].astype(object)
+            kept = table.filter(self.pa.array(~pd.MultiIndex.from_frame(keys).isin(new_keys)))
+            # Grava o que sobrou antes de apagar os arquivos antigos, para não perder linhas numa falha
+            if kept.num_rows:
+                self.pq.write_table(kept, os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet"))
+            for file in files:
+                os.remove(file)
+
+    def append(self, source, df):
+        key = SCHEMAS[source]['key']
+        existing = self._dataset(source)
+        if existing is not None and _updates(source):
+            self._remove_keys(source, existing, df)
+        elif existing is not None:
+            # Lê só as colunas da chave para descartar linhas já gravadas
+            seen = existing.to_table(columns=key).to_pandas()
+            df = df.merge(seen.drop_duplicates(), on=key, how='left', indicator=True)
+            df = df[df['_merge'] == 'left_only'].drop(columns='_merge')
+        if df.empty:
+            return 0
+
+        df = df.copy()
+        for name, kind in _columns(source):
+            if kind == 'entities':
+                df[name] = df[name].map(lambda items: [{'text': text, 'label': label} for text, label in items])
+        for (snapshot_date, platform), part in df.groupby(['snapshot_date', 'platform']):
+            directory = self._directory(source, snapshot_date, platform)
+            os.makedirs(directory, exist_ok=True)
+            part = part.drop(columns=[name for name, _ in PARTITION_COLUMNS])
+            table = self.pa.Table.from_pandas(part, schema=self._schema(SCHEMAS[source]['columns']),
+                                              preserve_index=False)
+            self.pq.write_table(table, os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet"))
+        return len(df)
+
+    def read(self, source, platform=None, since=None):
+        dataset = self._dataset(source)
+        if dataset is None:
+            return pd.DataFrame(columns=[name for name, _ in _columns(source)])
+        condition = None
+        if platform:
+            condition = self.ds.field('platform') == platform
+        if since:
+            since_condition = self.ds.field('snapshot_date') >= since
+            condition = since_condition if condition is None else condition & since_condition
+        df = dataset.to_table(filter=condition).to_pandas()
+        for name, kind in _columns(source):
+            if kind == 'entities':
+                df[name] = df[name].map(lambda items: [(item['text'], item['label']) for item in items])
+        return df
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Retorna o backend configurado em STORAGE_BACKEND (sqlite ou parquet)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if STORAGE_BACKEND == 'parquet':
+                _backend = ParquetBackend()
+            else:
+                _backend = SQLiteBackend()
+        return _backend
+
+
+def append(source, records, platform, snapshot_date=None):
+    """Acrescenta registros de uma fonte ao histórico.
+
+    Chaves já gravadas são atualizadas ou ignoradas conforme o on_conflict da fonte em SCHEMAS.
+    Retorna o número de linhas gravadas, novas ou atualizadas.
+    """
+    df = _to_frame(source, records, platform, snapshot_date)
+    if df.empty:
+        return 0
+    backend = get_backend()
+    with metrics.span('storage.append', source=source) as stage, _backend_lock:
+        added = backend.append(source, df)
+        stage.add(rows=added)
+    logger.info(f"{added} linhas de {source} ({platform}) gravadas no histórico.")
+    return added
+
+
+def record(source, records, platform, snapshot_date=None):
+    """Como append, mas uma falha no histórico só é registrada, sem interromper a coleta."""
+    try:
+        return append(source, records, platform, snapshot_date)
+    except Exception as e:
+        logger.error(f"Erro ao gravar {source} no histórico: {e}")
+        return 0
+
+
+def read(source, platform=None, since=None):
+    """Lê o histórico de uma fonte, opcionalmente filtrado por plataforma e data inicial."""
+    return get_backend().read(source, platform, since)
+
+
+def export_tsv(source, filename, platform=None, since=None):
+    """Exporta o histórico de uma fonte para TSV."""
+    df = read(source, platform, since)
+    df.to_csv(filename, sep='\t', index=False)
+    logger.info(f"{len(df)} linhas de {source} exportadas para {filename}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exportar o histórico armazenado para TSV.")
+    parser.add_argument("source", choices=sorted(SCHEMAS), help="Fonte a exportar.")
+    parser.add_argument("filename", help="Arquivo TSV de saída.")
+    parser.add_argument("--platform", help="Filtra por plataforma.")
+    parser.add_argument("--since", help="Filtra snapshots a partir dessa data (AAAA-MM-DD).")
+    args = parser.parse_args()
+    export_tsv(args.source, args.filename, args.platform, args.since)
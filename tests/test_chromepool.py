@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+chromepool = pytest.importorskip("chromepool")
+
+
+def test_each_pool_gets_its_own_profile_and_removes_it(tmp_path):
+    first = chromepool.ChromePool(size=2, profile_root=str(tmp_path))
+    second = chromepool.ChromePool(size=2, profile_root=str(tmp_path))
+    assert first.profile_dir != second.profile_dir
+
+    options = chromepool.build_options(1, first.profile_dir)
+    assert f"--user-data-dir={os.path.join(first.profile_dir, 'slot1')}" in options.arguments
+
+    os.makedirs(os.path.join(first.profile_dir, 'slot0', 'Default'))
+    first.close()
+    assert not os.path.exists(first.profile_dir)
+    assert os.path.isdir(second.profile_dir)
+    second.close()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,135 @@
+import os
+from html.parser import HTMLParser
+
+import pytest
+
+gethashtags = pytest.importorskip("gethashtags")
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'trends24.html')
+
+
+class _SeleniumTexts(HTMLParser):
+    """Textos que o caminho do Selenium lê: innerText de cada td com a classe pedida.
+
+    Reproduz document.querySelectorAll('td.<classe>') e o innerText de células com
+    conteúdo inline, em que espaços, quebras de linha e &nbsp; viram um único espaço.
+    """
+
+    def __init__(self, class_name):
+        super().__init__(convert_charrefs=True)
+        self.class_name = class_name
+        self.depth = 0
+        self.texts = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.depth:
+            self.depth += 1
+        elif tag == 'td' and self.class_name in (dict(attrs).get('class') or '').split():
+            self.depth = 1
+            self.texts.append('')
+
+    def handle_endtag(self, tag):
+        if self.depth:
+            self.depth -= 1
+
+    def handle_data(self, data):
+        if self.depth:
+            self.texts[-1] += data
+
+    def result(self):
+        return [' '.join(text.split()) for text in self.texts]
+
+
+def _selenium_rows(page):
+    texts = []
+    for class_name in ('topic', 'count'):
+        parser = _SeleniumTexts(class_name)
+        parser.feed(page)
+        texts.append(parser.result())
+    return gethashtags.twitter_trend_rows(*texts)
+
+
+def test_static_parser_matches_selenium_extraction():
+    with open(FIXTURE, encoding='utf-8') as file:
+        page = file.read()
+
+    rows = gethashtags.parse_twitter_trends_html(page)
+
+    assert rows == _selenium_rows(page)
+    assert rows == [
+        ['Agnaldo Rayol', None],
+        ['#JACKANDJOKEREP9', 2504253],
+        ['#Enem2024', 1912862],
+        ['EP9 U STEAL MY HEART', 2300000],
+        ['São Paulo', 41000],
+        ['rita lee new', 1500],
+    ]
+
+
+def test_both_paths_write_the_same_tsv(tmp_path, monkeypatch):
+    with open(FIXTURE, encoding='utf-8') as file:
+        page = file.read()
+    monkeypatch.chdir(tmp_path)
+
+    gethashtags.save_twitter_trends(gethashtags.parse_twitter_trends_html(page))
+    static = (tmp_path / 'twitter_trends.tsv').read_bytes()
+    gethashtags.save_twitter_trends(_selenium_rows(page))
+
+    assert static == (tmp_path / 'twitter_trends.tsv').read_bytes()
+
+
+def test_conditional_get_counts_304_as_cache_hit(tmp_path, monkeypatch):
+    import json
+    import metrics
+
+    class NotModified:
+        status_code = 304
+        content = b''
+
+    cache_path = tmp_path / 'trends24.json'
+    cache_path.write_text(json.dumps({'etag': '"abc"', 'html': '<html></html>'}))
+    monkeypatch.setattr(gethashtags.http_session, 'get', lambda url, headers, timeout: NotModified())
+    metrics.reset()
+
+    assert gethashtags._conditional_get('https://trends24.in/brazil/', str(cache_path)) == '<html></html>'
+    stage = next(stage for stage in metrics.snapshot()['stages'] if stage['span'] == 'http.conditional_get')
+    assert stage['counters'] == {'bytes': 0, 'cache_hits': 1}
+
+
+def test_collect_all_trends_runs_concurrently_and_keeps_partial_results(monkeypatch):
+    import threading
+    barrier = threading.Barrier(2, timeout=5)
+    saved = []
+
+    def twitter(url):
+        barrier.wait()  # Só passa se o Google estiver rodando ao mesmo tempo
+        return [['#Finados', 1000]]
+
+    def google():
+        barrier.wait()
+        return [['Enem', 80]]
+
+    def tiktok(url):
+        raise RuntimeError("Chrome indisponível")
+
+    monkeypatch.setattr(gethashtags, 'get_twitter_trends', twitter)
+    monkeypatch.setattr(gethashtags, 'get_tiktok_trends', tiktok)
+    monkeypatch.setattr(gethashtags, 'get_google_trends', google)
+    monkeypatch.setattr(gethashtags, 'combine_and_save_trends', lambda *data: saved.append(data))
+
+    results = gethashtags.collect_all_trends('https://trends24.in/brazil/', 'https://ads.tiktok.com/')
+
+    assert results == {'twitter': [['#Finados', 1000]], 'tiktok': None, 'google': [['Enem', 80]]}
+    assert saved == [([['#Finados', 1000]], None, [['Enem', 80]])]
+
+
+def test_collect_all_trends_saves_nothing_when_every_platform_fails(monkeypatch):
+    saved = []
+    monkeypatch.setattr(gethashtags, 'get_twitter_trends', lambda url: [])
+    monkeypatch.setattr(gethashtags, 'get_tiktok_trends', lambda url: None)
+    monkeypatch.setattr(gethashtags, 'get_google_trends', lambda: [])
+    monkeypatch.setattr(gethashtags, 'combine_and_save_trends', lambda *data: saved.append(data))
+
+    gethashtags.collect_all_trends('https://trends24.in/brazil/', 'https://ads.tiktok.com/')
+
+    assert saved == []
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+getinstagramposts = pytest.importorskip("getinstagramposts")
+
+
+class FakeClient:
+    """Client sem rede: cada chamada à API renova os cookies, como o Instagram faz."""
+
+    def __init__(self):
+        self.settings = {}
+        self.requests = 0
+
+    def load_settings(self, path):
+        with open(path, encoding='utf-8') as file:
+            self.settings = json.load(file)
+
+    def login(self, username, password):
+        self.settings.setdefault('uuids', {'phone_id': 'p'})
+
+    def get_timeline_feed(self):
+        self.requests += 1
+        self.settings['cookies'] = {'sessionid': f"renovado-{self.requests}"}
+
+    def get_settings(self):
+        return dict(self.settings)
+
+    def set_settings(self, settings):
+        self.settings = dict(settings)
+
+    def dump_settings(self, path):
+        with open(path, mode='w', encoding='utf-8') as file:
+            json.dump(self.settings, file)
+
+
+@pytest.fixture
+def session_path(tmp_path, monkeypatch):
+    path = tmp_path / 'session.json'
+    monkeypatch.setattr(getinstagramposts, 'SESSION_PATH', str(path))
+    monkeypatch.setattr(getinstagramposts, 'Client', FakeClient)
+    monkeypatch.setenv('INSTAGRAM_USERNAME', 'usuario')
+    monkeypatch.setenv('INSTAGRAM_PASSWORD', 'senha')
+    return path
+
+
+def test_reused_session_is_saved_with_the_refreshed_cookies(session_path):
+    session_path.write_text(json.dumps({'uuids': {'phone_id': 'p'}, 'cookies': {'sessionid': 'antigo'}}))
+
+    getinstagramposts.authenticate()
+
+    assert json.loads(session_path.read_text())['cookies'] == {'sessionid': 'renovado-1'}
+
+
+def test_new_login_is_saved(session_path):
+    getinstagramposts.authenticate()
+
+    assert json.loads(session_path.read_text())['cookies'] == {'sessionid': 'renovado-1'}
+
+
+def test_clone_keeps_the_session_in_a_separate_client():
+    client = getinstagramposts.Client()
+    client.set_settings({'uuids': {'phone_id': 'p', 'uuid': 'u'}, 'authorization_data': {'sessionid': 's'}})
+
+    clone = getinstagramposts.clone_client(client)
+
+    assert clone is not client
+    assert clone.get_settings()['uuids']['phone_id'] == 'p'
+    assert clone.get_settings()['authorization_data'] == {'sessionid': 's'}
+
+
+def test_concurrent_fetches_never_share_a_client(monkeypatch):
+    import time
+    import threading
+    lock, in_use, used = threading.Lock(), set(), set()
+
+    def fetch(client, target, amount):
+        with lock:
+            assert id(client) not in in_use, "Client usado por duas buscas ao mesmo tempo"
+            in_use.add(id(client))
+            used.add(id(client))
+        time.sleep(0.02)
+        with lock:
+            in_use.discard(id(client))
+        if target == 'falha':
+            raise RuntimeError("not found")
+
+    monkeypatch.setattr(getinstagramposts, 'fetch_user_posts', fetch)
+    monkeypatch.setattr(getinstagramposts, 'fetch_hashtag_posts', fetch)
+    client = getinstagramposts.Client()
+
+    errors = getinstagramposts.asyncio.run(getinstagramposts.main(
+        ['a', 'b', 'falha'], ['c', 'd'], amount=1, concurrency=2, client=client))
+
+    assert len(used) == 2 and id(client) not in used
+    assert errors == [{'alvo': 'falha', 'erro': 'not found', 'sessao_expirada': False}]
@@ -0,0 +1,111 @@
+import os
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("TIKTOK_MS_TOKEN", "teste")
+gettiktokvideos = pytest.importorskip("gettiktokvideos")
+import server
+
+
+class FakeVideo:
+    def __init__(self, video_id):
+        self.video_id = video_id
+
+    def as_dict(self):
+        return {'id': self.video_id}
+
+
+class FakeApi:
+    """TikTokApi sem navegador; registra as sessões criadas e quais estão em uso."""
+
+    instances = []
+
+    def __init__(self):
+        self.sessions = []
+        self.tokens = None
+        self.in_use = set()
+        self.used = []
+        self.closed = False
+        self.empty = set()
+        FakeApi.instances.append(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    async def create_sessions(self, ms_tokens, num_sessions):
+        self.tokens = list(ms_tokens)
+        self.sessions = [object() for _ in range(num_sessions)]
+
+    def _videos(self, name):
+        async def videos(count, session_index):
+            assert session_index not in self.in_use, "sessão emprestada a duas buscas"
+            self.in_use.add(session_index)
+            self.used.append(session_index)
+            await asyncio.sleep(0.01)
+            self.in_use.discard(session_index)
+            if name == 'falha':
+                raise RuntimeError("captcha")
+            if name not in self.empty:
+                for i in range(count):
+                    yield FakeVideo(f"{name}-{i}")
+        return videos
+
+    def user(self, username):
+        return SimpleNamespace(videos=self._videos(username))
+
+    def hashtag(self, name):
+        return SimpleNamespace(videos=self._videos(name))
+
+
+@pytest.fixture(autouse=True)
+def fake_api(monkeypatch):
+    FakeApi.instances = []
+    monkeypatch.setattr(gettiktokvideos, 'TikTokApi', FakeApi)
+
+    async def save(videos, filename):
+        pass
+    monkeypatch.setattr(gettiktokvideos, 'save_videos_to_tsv', save)
+
+
+def test_sessions_rotate_tokens_and_are_never_shared():
+    async def scenario():
+        async with gettiktokvideos.TikTokSessionManager(['t1', 't2'], num_sessions=3) as manager:
+            results = await asyncio.gather(
+                *(manager.fetch_user_videos(f"user{i}", 2) for i in range(5)),
+                manager.fetch_trending_videos('falha', 2),
+                manager.fetch_trending_videos('blackfriday', 2),
+            )
+            return manager, results
+
+    manager, results = asyncio.run(scenario())
+    api = FakeApi.instances[0]
+
+    assert api.tokens == ['t1', 't2', 't1']
+    assert sorted(set(api.used)) == [0, 1, 2]
+    assert results[5] == [] and results[6] == [{'id': 'blackfriday-0'}, {'id': 'blackfriday-1'}]
+    # A sessão da busca que falhou voltou para a fila
+    assert manager._free.qsize() == 3
+    assert api.closed
+
+
+def test_server_reuses_sessions_and_recreates_them_when_every_fetch_is_empty():
+    sessions = server.TikTokSessions()
+    try:
+        assert sessions.fetch(['casasbahia'], [], count=1) == {'casasbahia': 1}
+        assert sessions.fetch([], ['blackfriday'], count=1) == {'#blackfriday': 1}
+        assert len(FakeApi.instances) == 1
+
+        FakeApi.instances[0].empty.add('casasbahia')
+        assert sessions.fetch(['casasbahia'], [], count=1) == {'casasbahia': 0}
+        assert sessions.fetch(['casasbahia'], [], count=1) == {'casasbahia': 1}
+        assert len(FakeApi.instances) == 2 and FakeApi.instances[0].closed
+
+        sessions.fetch(['casasbahia'], [], count=1, num_sessions=2)
+        assert len(FakeApi.instances) == 3 and len(FakeApi.instances[2].sessions) == 2
+    finally:
+        sessions.close()
@@ -0,0 +1,74 @@
+import pytest
+
+gettwitterposts = pytest.importorskip("gettwitterposts")
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """Busca recente simulada: três páginas, do tweet mais novo (3) para o mais antigo (1)."""
+    monkeypatch.setattr(gettwitterposts, 'STATE_PATH', str(tmp_path / 'state.json'))
+    monkeypatch.setattr(gettwitterposts, 'store_tweets', lambda tweets, query='': None)
+    pages = {None: ('3', 't2'), 't2': ('2', 't1'), 't1': ('1', None)}
+    requests = []
+
+    def connect(url, params):
+        requests.append(dict(params))
+        tweet_id, next_token = pages[params.get('next_token')]
+        meta = {'newest_id': tweet_id}
+        if next_token:
+            meta['next_token'] = next_token
+        return {'data': [{'id': tweet_id, 'created_at': '', 'author_id': '', 'text': tweet_id}], 'meta': meta}
+
+    monkeypatch.setattr(gettwitterposts, 'connect_to_endpoint', connect)
+    return requests
+
+
+def test_since_id_advances_only_after_pagination_finishes(api, tmp_path):
+    filename = str(tmp_path / 'out.tsv')
+    gettwitterposts.save_state('q', {'since_id': '0'})
+
+    gettwitterposts.collect_to_tsv('q', filename, 10, max_pages=2)
+    assert gettwitterposts.load_state('q') == {'since_id': '0', 'newest_id': '3', 'next_token': 't1'}
+
+    gettwitterposts.collect_to_tsv('q', filename, 10, max_pages=2)
+    assert api[-1] == {'query': 'q', 'tweet.fields': 'created_at,author_id,text', 'max_results': 10,
+                       'since_id': '0', 'next_token': 't1'}
+    assert gettwitterposts.load_state('q') == {'since_id': '3', 'newest_id': None, 'next_token': None}
+
+
+def test_legacy_state_is_a_plain_since_id(api, tmp_path):
+    (tmp_path / 'state.json').write_text('{"q": "7"}')
+    assert gettwitterposts.load_state('q') == {'since_id': '7', 'newest_id': None, 'next_token': None}
+
+
+def test_parse_queries_rejects_names_that_leave_the_directory():
+    queries = gettwitterposts.parse_queries([
+        '@casasbahia', '#BlackFriday', 'promo\tdesconto lang:pt',
+        '../../etc/x\tdesconto', '@../x', '#a/b', 'dados/x\tconsulta',
+    ])
+
+    assert [filename for _, filename in queries] == [
+        'casasbahia_mentions.tsv', 'BlackFriday_hashtag_tweets.tsv', 'promo_tweets.tsv',
+    ]
+
+
+def test_rate_limiter_lets_requests_finish_while_waiting_for_the_reset():
+    import asyncio
+    import time
+
+    async def scenario():
+        limiter = gettwitterposts.AsyncRateLimiter(2)
+        await limiter.__aenter__()
+        limiter.remaining, limiter.reset = 0, time.time() + 0.2
+        waiting = asyncio.create_task(limiter.__aenter__())
+        await asyncio.sleep(0.05)
+
+        start = time.perf_counter()
+        await limiter.__aexit__(None, None, None)
+        exited = time.perf_counter() - start
+        await asyncio.wait_for(waiting, 5)
+        return exited, limiter.in_flight
+
+    exited, in_flight = asyncio.run(scenario())
+    assert exited < 0.5
+    assert in_flight == 1
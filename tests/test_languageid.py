@@ -0,0 +1,31 @@
+import threading
+
+import pytest
+
+languageid = pytest.importorskip("languageid")
+
+
+def test_concurrent_detection_keeps_the_cache_bounded_and_counts_every_call(monkeypatch):
+    monkeypatch.setattr(languageid, 'CACHE_SIZE', 50)
+    languageid.clear_cache()
+    before = languageid.stats()
+    texts = [f"aproveite o desconto de hoje na loja {i}" for i in range(200)]
+    errors = []
+
+    def work():
+        try:
+            for _ in range(5):
+                assert set(languageid.detect_languages(texts)) == {'pt'}
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    after = languageid.stats()
+    assert errors == []
+    assert len(languageid._cache) <= 50
+    assert (after['hits'] + after['misses']) - (before['hits'] + before['misses']) == 8 * 5 * len(texts)
@@ -0,0 +1,34 @@
+import metrics
+
+
+def _stage(name):
+    return next(stage for stage in metrics.snapshot()['stages'] if stage['span'] == name)
+
+
+def test_span_counters_and_errors():
+    metrics.reset()
+    with metrics.span('test.stage', lang='pt') as stage:
+        stage.add(rows=3, cache_hits=1)
+    try:
+        with metrics.span('test.stage', lang='pt'):
+            raise ValueError
+    except ValueError:
+        pass
+
+    stage = _stage('test.stage')
+    assert (stage['count'], stage['errors'], stage['counters']) == (2, 1, {'rows': 3, 'cache_hits': 1})
+
+
+def test_worker_metrics_are_merged_into_the_parent():
+    metrics.reset()
+    with metrics.span('nlp.ner', lang='pt') as stage:
+        stage.add(rows=10)
+    worker = metrics.drain()
+    assert metrics.snapshot() == {'stages': [], 'counters': []}
+
+    metrics.merge(worker)
+    metrics.merge(worker)
+
+    stage = _stage('nlp.ner')
+    assert (stage['count'], stage['labels'], stage['counters']) == (2, {'lang': 'pt'}, {'rows': 20})
+    assert 'cb_scrapping_span_rows_total{span="nlp.ner",lang="pt"} 20' in metrics.prometheus_text()
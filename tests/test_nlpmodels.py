@@ -0,0 +1,92 @@
+import os
+import stat
+
+import pytest
+
+nlpmodels = pytest.importorskip("nlpmodels")
+
+
+def test_worker_key_is_random_and_private(tmp_path, monkeypatch):
+    monkeypatch.delenv("NER_WORKER_AUTHKEY", raising=False)
+    monkeypatch.setattr(nlpmodels, 'WORKER_AUTHKEY_PATH', str(tmp_path / 'ner_worker.key'))
+
+    assert nlpmodels.worker_authkey() is None
+    key = nlpmodels.worker_authkey(create=True)
+
+    assert len(key) == 64
+    assert stat.S_IMODE(os.stat(tmp_path / 'ner_worker.key').st_mode) == 0o600
+    assert nlpmodels.worker_authkey() == key
+
+
+def test_worker_key_readable_by_others_is_refused(tmp_path, monkeypatch):
+    monkeypatch.delenv("NER_WORKER_AUTHKEY", raising=False)
+    path = tmp_path / 'ner_worker.key'
+    path.write_text('abc')
+    path.chmod(0o644)
+    monkeypatch.setattr(nlpmodels, 'WORKER_AUTHKEY_PATH', str(path))
+
+    with pytest.raises(PermissionError):
+        nlpmodels.worker_authkey()
+
+
+class FakeEntity:
+    def __init__(self, text, label):
+        self.text, self.label_ = text, label
+
+
+class FakeDoc:
+    def __init__(self, text, lang):
+        self.ents = [FakeEntity(word, lang.upper()) for word in text.split() if word.istitle()]
+
+
+class FakeModel:
+    def __init__(self, lang):
+        self.lang = lang
+        self.batches = []
+
+    def pipe(self, texts, batch_size=None, n_process=1):
+        texts = list(texts)
+        self.batches.append(texts)
+        return (FakeDoc(text, self.lang) for text in texts)
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    loads = []
+
+    def load(name, exclude=()):
+        loads.append((name, list(exclude)))
+        return FakeModel(name[:2])
+
+    monkeypatch.setattr(nlpmodels.spacy, 'load', load)
+    nlpmodels.languageid.clear_cache()
+    return loads
+
+
+def test_registry_loads_only_the_languages_it_sees_without_unused_components(loads):
+    registry = nlpmodels.ModelRegistry()
+    texts = [
+        'Aproveite a oferta da Casas Bahia em São Paulo hoje',
+        'Compre agora na loja da Magazine Luiza com frete grátis',
+        '#blackfriday @casasbahia',
+        None,
+    ]
+
+    entities = registry.extract_entities(texts)
+
+    assert loads == [('pt_core_news_sm', nlpmodels.NER_UNUSED_COMPONENTS)]
+    assert registry.loaded() == ['pt']
+    # Um único nlp.pipe para os textos do idioma, com os tokens das regras já removidos
+    assert registry._models['pt'].batches == [[texts[0], texts[1]]]
+    assert entities[0] == [('Aproveite', 'PT'), ('Casas', 'PT'), ('Bahia', 'PT'), ('São', 'PT'), ('Paulo', 'PT')]
+    assert entities[2] == [('#blackfriday', 'HASHTAG'), ('@casasbahia', 'MENTION')]
+    assert entities[3] == []
+
+
+def test_registry_without_ner_never_loads_a_model(loads):
+    registry = nlpmodels.ModelRegistry(ner=False)
+
+    entities = registry.extract_entities(['Aproveite a oferta da Casas Bahia com o cupom BLACK30'])
+
+    assert entities == [[('BLACK30', 'COUPON')]]
+    assert loads == []
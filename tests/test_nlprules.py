@@ -0,0 +1,33 @@
+import pytest
+
+nlprules = pytest.importorskip("nlprules")
+
+
+def test_structured_tokens_come_out_in_order_and_leave_the_text():
+    entities, clean = nlprules.extract_tokens(
+        'Só hoje! Smart TV por R$ 1.999,90 com 15% OFF em https://casasbahia.com.br/tv #blackfriday @casasbahia'
+    )
+
+    assert entities == [
+        ('R$ 1.999,90', 'PRICE'), ('15% OFF', 'PERCENT'), ('https://casasbahia.com.br/tv', 'URL'),
+        ('#blackfriday', 'HASHTAG'), ('@casasbahia', 'MENTION'),
+    ]
+    assert clean == 'Só hoje! Smart TV por com em'
+
+
+def test_price_glued_to_a_percentage_is_split():
+    entities, _ = nlprules.extract_tokens('Fogão R$169,9943% OFF')
+
+    assert entities == [('R$169,99', 'PRICE'), ('43% OFF', 'PERCENT')]
+
+
+def test_coupons_must_be_uppercase_with_a_digit():
+    entities, clean = nlprules.extract_tokens('Use o cupom BLACK30 e não blackfriday30 nem NATAL')
+
+    assert entities == [('BLACK30', 'COUPON')]
+    assert 'blackfriday30' in clean and 'NATAL' in clean
+
+
+@pytest.mark.parametrize('text', [None, '', float('nan')])
+def test_empty_values_have_no_tokens(text):
+    assert nlprules.extract_tokens(text) == ([], '')
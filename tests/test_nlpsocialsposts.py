@@ -0,0 +1,41 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+nlpsocialsposts = pytest.importorskip("nlpsocialsposts")
+
+
+def test_row_hashes_ignore_engagement_counts():
+    before = pd.DataFrame({'ID': ['1'], 'Description': ['#blackfriday'], 'Likes': ['10'], 'Shares': ['1']})
+    after = before.assign(Likes='25', Shares='3')
+    edited = before.assign(Description='#blackfriday #casasbahia')
+
+    assert nlpsocialsposts.row_hashes(before).tolist() == nlpsocialsposts.row_hashes(after).tolist()
+    assert nlpsocialsposts.row_hashes(before).tolist() != nlpsocialsposts.row_hashes(edited).tolist()
+
+
+def test_find_input_files_skips_unmatched_patterns(tmp_path):
+    (tmp_path / 'a_videos.tsv').write_text('ID\tDescription\n')
+    (tmp_path / 'a_videos_processed.tsv').write_text('ID\tDescription\tEntities\n')
+
+    files = nlpsocialsposts.find_input_files([str(tmp_path / '*_videos.tsv'), str(tmp_path / '*_tweets.tsv')])
+
+    assert files == [str(tmp_path / 'a_videos.tsv')]
+
+
+class FakeModels:
+    def extract_entities(self, texts, batch_size=None, n_process=1):
+        return [[] for _ in texts]
+
+
+def test_streaming_run_records_its_span(tmp_path, monkeypatch):
+    metrics = pytest.importorskip("metrics")
+    monkeypatch.setattr(nlpsocialsposts, 'CHECKPOINT_DIR', str(tmp_path / 'checkpoints'))
+    monkeypatch.setattr(nlpsocialsposts, 'store_entities', lambda file_path, df: None)
+    input_path = tmp_path / 'a_videos.tsv'
+    input_path.write_text('ID\tDescription\n1\t#a\n2\t#b\n3\t#c\n')
+    metrics.reset()
+
+    nlpsocialsposts.analyze_file_streaming(str(input_path), FakeModels(), chunksize=2)
+
+    stage = next(stage for stage in metrics.snapshot()['stages'] if stage['span'] == 'nlp.analyze_file')
+    assert (stage['count'], stage['labels'], stage['counters']) == (1, {'mode': 'streaming'}, {'rows': 3})
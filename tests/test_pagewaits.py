@@ -0,0 +1,60 @@
+import time
+from collections import deque
+
+import pytest
+
+pagewaits = pytest.importorskip("pagewaits")
+
+
+class FakeDriver:
+    """Simula o observer do DOM: -1 até a primeira mutação, depois ms desde a última."""
+
+    def __init__(self, since_mutation, texts):
+        self.since_mutation = since_mutation
+        self.texts = texts
+
+    def execute_script(self, script, *args):
+        if script == pagewaits._OBSERVER_SCRIPT:
+            return self.since_mutation
+        return self.texts
+
+
+def test_dom_quiet_waits_for_a_first_mutation():
+    quiet = pagewaits.dom_quiet(500)
+
+    assert not quiet(FakeDriver(-1, []))
+    assert quiet(FakeDriver(800, []))
+
+
+def test_rerender_does_not_return_before_the_page_changes(monkeypatch):
+    monkeypatch.setattr(pagewaits, 'POLL_INTERVAL', 0.01)
+    driver = FakeDriver(-1, ['Old'])
+
+    assert pagewaits.wait_for_rerender(driver, 'span', ['Old'], 'test_rerender', overrides={'test_rerender': 0.1}) is False
+
+    driver.texts = ['Novo']
+    assert pagewaits.wait_for_rerender(driver, 'span', ['Old'], 'test_rerender', overrides={'test_rerender': 0.1}) == ['Novo']
+
+
+def test_wait_timings_keep_only_the_newest_waits(monkeypatch):
+    monkeypatch.setattr(pagewaits, '_timings', deque(maxlen=3))
+
+    for i in range(5):
+        pagewaits.wait_until(FakeDriver(-1, []), lambda driver: True, f'step{i}')
+
+    assert [step for step, _, ok in pagewaits.wait_timings(clear=True) if ok] == ['step2', 'step3', 'step4']
+    assert pagewaits.wait_timings() == []
+
+
+def test_wait_env_budget_is_applied(monkeypatch):
+    from selenium.common.exceptions import TimeoutException
+    monkeypatch.setattr(pagewaits, 'POLL_INTERVAL', 0.01)
+    monkeypatch.setenv('WAIT_TWITTER_POPUP', '0.05')
+
+    assert pagewaits.budget('twitter_popup') == 0.05
+    assert pagewaits.budget('twitter_popup', {'twitter_popup': 2}) == 2
+    start = time.perf_counter()
+    with pytest.raises(TimeoutException):
+        pagewaits.wait_until(FakeDriver(-1, []), lambda driver: False, 'twitter_popup')
+    assert time.perf_counter() - start < 1
+    assert pagewaits.wait_timings(clear=True)[-1][0::2] == ('twitter_popup', False)
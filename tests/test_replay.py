@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+replay = pytest.importorskip("replay")
+gethashtags = pytest.importorskip("gethashtags")
+from selenium.webdriver.remote.webdriver import WebDriver
+
+
+class FakeDriver(WebDriver):
+    """WebDriver sem navegador: responde aos comandos com valores fixos."""
+
+    def __init__(self):
+        pass
+
+    @property
+    def current_url(self):
+        return 'https://trends24.in/brazil/'
+
+    @property
+    def page_source(self):
+        return '<html><body>trends</body></html>'
+
+    def execute(self, driver_command, params=None):
+        return {'value': [['#Finados']]}
+
+
+def test_recording_saves_the_pages_read_by_extract_texts(tmp_path):
+    with replay.use_cassette('trends', 'record', str(tmp_path)):
+        assert gethashtags.extract_texts(FakeDriver(), 'span') == [['#Finados']]
+        FakeDriver().execute_script('return 1')
+
+    assert os.listdir(tmp_path / 'trends' / 'pages') == ['trends24.in.html']
+    assert replay.Cassette('trends', directory=str(tmp_path)).page('trends24.in') == FakeDriver().page_source
+
+
+def test_live_scrape_is_not_intercepted(tmp_path):
+    original = WebDriver.execute_script
+    with replay.use_cassette('trends', 'record', str(tmp_path)):
+        pass
+
+    assert WebDriver.execute_script is original
+    gethashtags.extract_texts(FakeDriver(), 'span')
+    assert os.listdir(tmp_path / 'trends' / 'pages') == []
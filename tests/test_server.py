@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+def test_tiktok_fetch_times_out_and_the_loop_keeps_serving(monkeypatch):
+    sessions = server.TikTokSessions()
+
+    async def slow(usernames, hashtags, count, num_sessions):
+        await asyncio.sleep(10 if usernames else 0)
+        return {'ok': len(hashtags)}
+
+    monkeypatch.setattr(sessions, '_fetch', slow)
+    try:
+        with pytest.raises(TimeoutError):
+            sessions.fetch(['casabahia'], [], timeout=0.1)
+        assert sessions.fetch([], ['blackfriday'], timeout=5) == {'ok': 1}
+    finally:
+        sessions.close()
+
+
+def test_tiktok_job_without_token_fails_without_starting_the_loop(monkeypatch):
+    pytest.importorskip("TikTokApi")
+    monkeypatch.delenv("TIKTOK_MS_TOKEN", raising=False)
+    monkeypatch.delitem(server.sys.modules, 'gettiktokvideos', raising=False)
+    monkeypatch.setattr(server, '_tiktok', None)
+
+    with pytest.raises(RuntimeError):
+        server.run_tiktok({'users': ['casabahia']})
+    assert server._tiktok is None
+
+
+def test_instagram_job_logs_in_again_when_the_session_expires(monkeypatch):
+    getinstagramposts = pytest.importorskip("getinstagramposts")
+    logins, calls = [], []
+
+    def authenticate():
+        logins.append(object())
+        return logins[-1]
+
+    async def main(users, hashtags, amount, concurrency, client=None):
+        calls.append(client)
+        expired = client is logins[0]
+        return [{'alvo': user, 'erro': 'login_required', 'sessao_expirada': True} for user in users if expired]
+
+    monkeypatch.setattr(getinstagramposts, 'authenticate', authenticate)
+    monkeypatch.setattr(getinstagramposts, 'main', main)
+    monkeypatch.setattr(server, '_instagram_client', None)
+
+    result = server.run_instagram({'users': ['casabahia']})
+
+    assert result['erros'] == []
+    assert calls == logins and len(logins) == 2
+    assert server._instagram_client is logins[1]
+
+
+def test_nlp_models_are_cached_per_worker_mode(monkeypatch, tmp_path):
+    nlpsocialsposts = pytest.importorskip("nlpsocialsposts")
+    loaded = []
+    monkeypatch.setattr(nlpsocialsposts, 'load_models', lambda worker, ner: loaded.append((worker, ner)) or (worker, ner))
+    monkeypatch.setattr(server, '_nlp_models', {})
+
+    for worker in (False, True, True, False):
+        server.run_nlp({'worker': worker, 'files': [str(tmp_path / '*.tsv')]})
+
+    assert loaded == [(False, True), (True, True)]
+
+
+@pytest.mark.parametrize('queries', ['#blackfriday', [1, 2], {'q': 'x'}])
+def test_validate_rejects_queries_that_are_not_a_list_of_strings(queries):
+    with pytest.raises(ValueError):
+        server.validate('tweets', {'queries': queries})
+
+
+def test_validate_accepts_a_list_of_queries():
+    server.validate('tweets', {'queries': ['#blackfriday', '@casasbahia']})
+
+
+@pytest.fixture
+def api(tmp_path):
+    import json
+    import threading
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+
+    jobs = server.JobManager(workers=0)
+    scheduler = server.Scheduler(jobs, str(tmp_path / 'schedules.json'))
+    httpd = server.ThreadingHTTPServer(('127.0.0.1', 0), server.RequestHandler)
+    httpd.jobs, httpd.scheduler = jobs, scheduler
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    def request(method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        url = f"http://127.0.0.1:{httpd.server_address[1]}{path}"
+        try:
+            with urlopen(Request(url, data=data, method=method)) as response:
+                return response.status
+        except HTTPError as e:
+            return e.code
+
+    yield request
+    httpd.shutdown()
+    httpd.server_close()
+    scheduler.stop()
+
+
+def test_api_rejects_a_string_of_queries(api):
+    assert api('POST', '/jobs', {'kind': 'tweets', 'params': {'queries': '#blackfriday'}}) == 400
+    assert api('POST', '/jobs', {'kind': 'tweets', 'params': {'queries': ['#blackfriday']}}) == 202
+
+
+@pytest.mark.parametrize('limit', ['abc', '-1', '1.5'])
+def test_api_rejects_an_invalid_data_limit(api, limit):
+    pytest.importorskip("storage")
+    assert api('GET', f'/data/tweets?limit={limit}') == 400
@@ -0,0 +1,54 @@
+import sys
+
+import pytest
+
+storage = pytest.importorskip("storage")
+
+
+def _backend(kind, path):
+    if kind == 'parquet':
+        pytest.importorskip("pyarrow")
+        return storage.ParquetBackend(str(path))
+    return storage.SQLiteBackend(str(path))
+
+
+@pytest.mark.parametrize('kind', ['sqlite', 'parquet'])
+def test_mutable_sources_keep_the_latest_metrics(tmp_path, kind):
+    backend = _backend(kind, tmp_path)
+    backend.append('tiktok_videos', storage._to_frame(
+        'tiktok_videos', [('1', 'a', 10, 5, 0, 0), ('2', 'b', 10, 7, 0, 0)], 'tiktok', '2024-11-01'))
+    backend.append('tiktok_videos', storage._to_frame(
+        'tiktok_videos', [('1', 'a', 10, 50, 3, 1)], 'tiktok', '2024-11-02'))
+
+    df = backend.read('tiktok_videos').sort_values('id').reset_index(drop=True)
+    assert df['id'].tolist() == ['1', '2']
+    assert df['likes'].tolist() == [50, 7]
+    assert df['snapshot_date'].astype(str).tolist() == ['2024-11-02', '2024-11-01']
+
+
+@pytest.mark.parametrize('kind', ['sqlite', 'parquet'])
+def test_first_write_wins_sources_ignore_repeated_keys(tmp_path, kind):
+    backend = _backend(kind, tmp_path)
+    assert backend.append('tweets', storage._to_frame('tweets', [('1', '', '', 'first', 'q')], 'twitter', '2024-11-01')) == 1
+    assert backend.append('tweets', storage._to_frame('tweets', [('1', '', '', 'second', 'q')], 'twitter', '2024-11-02')) == 0
+
+    assert backend.read('tweets')['text'].tolist() == ['first']
+
+
+@pytest.mark.parametrize('kind', ['sqlite', 'parquet'])
+def test_updated_entities_replace_the_old_row(tmp_path, kind):
+    backend = _backend(kind, tmp_path)
+    for entities in ([('Lula', 'PER')], [('Lula', 'PER'), ('Brasília', 'LOC')]):
+        backend.append('post_entities', storage._to_frame(
+            'post_entities', [('posts.tsv', 'abc', 'texto', entities)], 'instagram', '2024-11-01'))
+
+    df = backend.read('post_entities')
+    assert len(df) == 1
+    assert df['entities'].tolist() == [[('Lula', 'PER'), ('Brasília', 'LOC')]]
+
+
+def test_parquet_backend_explains_the_missing_dependency(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+
+    with pytest.raises(ImportError, match='pip install pyarrow'):
+        storage.ParquetBackend(str(tmp_path))
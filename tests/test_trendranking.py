@@ -0,0 +1,37 @@
+import math
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+trendranking = pytest.importorskip("trendranking")
+
+
+def test_parse_counts_handles_separators_and_suffixes():
+    counts = trendranking.parse_counts(pd.Series(['2.504.253', '1,5 mi', '3,4 mil Postagens', '12K', '1.2K', '']))
+
+    assert counts.tolist()[:5] == [2504253, 1500000, 3400, 12000, 1200]
+    assert math.isnan(counts.iloc[5])
+
+
+def test_hashtag_keys_keep_non_latin_scripts():
+    keys = trendranking.hashtag_keys(pd.Series(['#Ação', '# São_João!', '東京 2024']))
+
+    assert keys.tolist() == ['acao', 'saojoao', '東京2024']
+
+
+def test_rank_trends_merges_spellings_across_platforms():
+    trends = pd.DataFrame({
+        'snapshot_date': '2024-11-02',
+        'platform': ['twitter', 'twitter', 'tiktok', 'google', 'google'],
+        'hashtag': ['#Finados', 'Enem 2024', '#finados', 'Enem2024', 'Outra'],
+        'count': ['10K', '5K', '300', '80', '20'],
+    })
+
+    ranked = trendranking.rank_trends(trends).set_index('hashtag')
+
+    assert len(ranked) == 3
+    assert ranked.loc['#Finados', 'platforms'] == 'twitter,tiktok'
+    assert ranked.loc['#Finados', 'count_twitter'] == 10000
+    assert ranked.loc['#Finados', 'count_tiktok'] == 300
+    assert ranked.loc['Enem2024', 'platforms'] == 'twitter,google'
+    assert ranked.loc['#Finados', 'rank'] == 1
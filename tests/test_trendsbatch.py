@@ -0,0 +1,76 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+trendsbatch = pytest.importorskip("trendsbatch")
+
+
+def test_region_batches_are_rescaled_per_state():
+    # A âncora 'A' tem participações diferentes em cada estado e em cada lote
+    first = pd.DataFrame({'A': [50, 20], 'B': [50, 80]}, index=['BR-SP', 'BR-RJ'])
+    second = pd.DataFrame({'A': [25, 40], 'C': [75, 60]}, index=['BR-RJ', 'BR-SP'])
+
+    combined = trendsbatch._rescale([first, second], 'A', by_row=True)
+
+    # SP: fator 50/40, RJ: fator 20/25, alinhados pelo código do estado
+    assert combined.loc['BR-SP', 'C'] == pytest.approx(60 * 50 / 40)
+    assert combined.loc['BR-RJ', 'C'] == pytest.approx(75 * 20 / 25)
+    assert combined.loc['BR-SP', 'B'] == 50
+
+
+def test_region_rows_without_anchor_fall_back_to_mean_factor():
+    first = pd.DataFrame({'A': [40, 0], 'B': [60, 100]}, index=['BR-SP', 'BR-AC'])
+    second = pd.DataFrame({'A': [20, 0], 'C': [80, 100]}, index=['BR-SP', 'BR-AC'])
+
+    combined = trendsbatch._rescale([first, second], 'A', by_row=True)
+
+    assert combined.loc['BR-SP', 'C'] == pytest.approx(80 * 2)
+    assert combined.loc['BR-AC', 'C'] == pytest.approx(100 * 20 / 10)
+
+
+def test_time_series_keeps_mean_factor():
+    first = pd.DataFrame({'A': [10, 30], 'B': [1, 2]})
+    second = pd.DataFrame({'A': [5, 15], 'C': [4, 8]})
+
+    combined = trendsbatch._rescale([first, second], 'A')
+
+    assert combined['C'].tolist() == [8, 16]
+
+
+class FakePytrends:
+    """Simula o Google Trends: cada consulta normaliza o interesse dos seus termos para o máximo 100."""
+
+    def __init__(self, interest):
+        self.interest = interest
+        self.payloads = []
+
+    def build_payload(self, keywords, **payload):
+        self.payloads.append(list(keywords))
+
+    def interest_over_time(self):
+        keywords = self.payloads[-1]
+        frame = pd.DataFrame({keyword: self.interest[keyword] for keyword in keywords})
+        return (frame * 100 / frame.max().max()).assign(isPartial=False)
+
+
+def test_make_batches_repeat_the_anchor_in_batches_of_five():
+    batches, anchor = trendsbatch.make_batches(['a', 'b', 'c', 'd', 'e', 'f', 'b', 'g'])
+
+    assert anchor == 'a'
+    assert batches == [['a', 'b', 'c', 'd', 'e'], ['a', 'f', 'g']]
+    assert trendsbatch.make_batches(['a', 'b'], anchor='b') == ([['a', 'b']], None)
+
+
+def test_interest_over_time_puts_every_batch_on_the_first_batch_scale(monkeypatch):
+    monkeypatch.setattr(trendsbatch.trendscache, 'cached', lambda fetch, *args, **kwargs: fetch())
+    monkeypatch.setattr(trendsbatch.trendsscheduler, 'run',
+                        lambda func, *args, priority=None, **kwargs: func(*args, **kwargs))
+    interest = {'a': [10, 20], 'b': [5, 5], 'c': [40, 20], 'd': [1, 2], 'e': [2, 1], 'f': [200, 100]}
+    pytrends = FakePytrends(interest)
+
+    result = trendsbatch.interest_over_time(pytrends, list(interest))
+
+    assert pytrends.payloads == [['a', 'b', 'c', 'd', 'e'], ['a', 'f']]
+    assert list(result.columns) == list(interest)
+    # No primeiro lote o máximo é c=40; 'f' volta na mesma escala: 200 * 100 / 40
+    assert result['f'].tolist() == pytest.approx([500, 250])
+    assert result['c'].tolist() == pytest.approx([100, 50])
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+trendscache = pytest.importorskip("trendscache")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return trendscache.TrendsCache(str(tmp_path / 'trends.sqlite'), max_entries=2)
+
+
+def test_entries_expire_after_their_ttl(cache):
+    cache.set('curta', [1], ttl=0.1)
+    cache.set('longa', [2], ttl=60)
+    assert cache.get('curta') == [1]
+
+    time.sleep(0.15)
+
+    assert cache.get('curta') is None
+    assert cache.get('longa') == [2]
+    assert cache.stats()['expired'] == 1
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.set('a', 'A', ttl=60)
+    time.sleep(0.01)
+    cache.set('b', 'B', ttl=60)
+    time.sleep(0.01)
+    cache.get('a')  # 'a' passa a ser o mais recente
+    time.sleep(0.01)
+    cache.set('c', 'C', ttl=60)
+
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == ('A', None, 'C')
+    assert cache.stats()['evicted'] == 1
+
+
+def test_get_or_fetch_only_fetches_on_a_miss_and_skips_empty_results(cache):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {'valor': len(calls)}
+
+    assert cache.get_or_fetch('k', fetch, ttl=60) == {'valor': 1}
+    assert cache.get_or_fetch('k', fetch, ttl=60) == {'valor': 1}
+    assert cache.get_or_fetch('vazio', lambda: None, ttl=60) is None
+    assert cache.get('vazio') is None
+    assert len(calls) == 1
+
+
+def test_keys_and_ttls_depend_on_the_query():
+    key = trendscache.make_key('interest_over_time', ['a', 'b'], 'BR', 'today 5-y', 0)
+    assert key != trendscache.make_key('interest_over_time', ['a', 'b'], 'BR-SP', 'today 5-y', 0)
+    assert key != trendscache.make_key('interest_by_region', ['a', 'b'], 'BR', 'today 5-y', 0, resolution='REGION')
+    assert trendscache.ttl_for('now 1-H') < trendscache.ttl_for('today 5-y')
+    assert trendscache.ttl_for('2024-01-01 2024-02-01') == trendscache.DEFAULT_TTL
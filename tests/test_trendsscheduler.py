@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+trendsscheduler = pytest.importorskip("trendsscheduler")
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class ResponseError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"The request failed: Google returned a response with code {status_code}")
+        self.response = FakeResponse(status_code, headers)
+
+
+def flaky(failures):
+    calls = []
+
+    def func():
+        calls.append(time.monotonic())
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return 'ok'
+    return func, calls
+
+
+def test_429_is_retried_after_the_retry_after_delay():
+    scheduler = trendsscheduler.TrendsScheduler(rate=1000, capacity=10)
+    func, calls = flaky([ResponseError(429, {'Retry-After': '0.2'})])
+
+    assert scheduler.run(func) == 'ok'
+
+    assert len(calls) == 2
+    assert 0.2 <= calls[1] - calls[0] < trendsscheduler.BACKOFF_BASE / 2
+    stats = scheduler.stats()
+    assert (stats['throttled'], stats['completed'], stats['failed']) == (1, 1, 0)
+
+
+def test_other_errors_and_exhausted_retries_are_not_retried_forever():
+    scheduler = trendsscheduler.TrendsScheduler(rate=1000, capacity=10, max_retries=1)
+    func, calls = flaky([ResponseError(500)])
+    with pytest.raises(ResponseError):
+        scheduler.run(func)
+    assert len(calls) == 1
+
+    func, calls = flaky([ResponseError(429, {'Retry-After': '0'}), ResponseError(429, {'Retry-After': '0'})])
+    with pytest.raises(ResponseError):
+        scheduler.run(func)
+    assert len(calls) == 2
+    assert scheduler.stats()['failed'] == 2
+
+
+def test_higher_priority_jobs_run_first():
+    scheduler = trendsscheduler.TrendsScheduler(rate=1000, capacity=10)
+    order = []
+    blocker = scheduler.submit(time.sleep, 0.2)
+    futures = [scheduler.submit(order.append, name, priority=priority)
+               for name, priority in (('low', trendsscheduler.PRIORITY_LOW), ('high', trendsscheduler.PRIORITY_HIGH),
+                                      ('normal', trendsscheduler.PRIORITY_NORMAL))]
+    blocker.result()
+    for future in futures:
+        future.result()
+
+    assert order == ['high', 'normal', 'low']
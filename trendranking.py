@@ -0,0 +1,171 @@
+import os
+import re
+import logging
+import argparse
+from datetime import date
+import numpy as np
+import pandas as pd
+import metrics
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Escala usada para comparar as plataformas em cada snapshot:
+# - percentile: posição percentual da contagem dentro da plataforma (1.0 = maior contagem);
+# - zscore: z-score do log da contagem, que tem cauda longa (milhões no Twitter, 0–100 no Google).
+RANK_METHOD = os.environ.get("TRENDS_RANK_METHOD", "percentile")
+RANK_METHODS = ('percentile', 'zscore')
+
+# Ordem das colunas por plataforma na tabela final; plataformas novas vêm depois
+PLATFORMS = ('twitter', 'tiktok', 'google')
+
+# Sufixos de abreviação usados nas contagens (K = mil, M = milhão)
+COUNT_SUFFIXES = {'k': 1_000, 'mil': 1_000, 'm': 1_000_000, 'mi': 1_000_000, 'b': 1_000_000_000, 'bi': 1_000_000_000}
+COUNT_PATTERN = re.compile(r'(\d[\d.,]*)\s*(mil|mi|bi|k|m|b)?\b', re.IGNORECASE)
+
+
+def parse_counts(values):
+    """Converte uma coluna de contagens, como as lidas pelos coletores, em float.
+
+    Aceita '2.504.253', '12K', '1.2K', '1,5 mi' e '3,4 mil Postagens'. Sem sufixo, pontos e
+    vírgulas são separadores de milhar; com sufixo, o último separador é a casa decimal.
+    Valores já numéricos são mantidos; textos sem número viram NaN.
+    """
+    series = pd.Series(values, dtype=object) if not isinstance(values, pd.Series) else values
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+
+    series = series.astype(object)
+    is_text = series.map(type).eq(str)
+    counts = pd.to_numeric(series.where(~is_text), errors='coerce').astype(float)
+    if not is_text.any():
+        return counts
+
+    parts = series[is_text].astype(str).str.extract(COUNT_PATTERN)
+    number, suffix = parts[0], parts[1].str.lower()
+    plain = pd.to_numeric(number.str.replace(r'[.,]', '', regex=True), errors='coerce')
+    # Com sufixo: vírgula vira ponto e só o último ponto continua como casa decimal
+    decimal = pd.to_numeric(number.str.replace(',', '.', regex=False).str.replace(r'\.(?=.*\.)', '', regex=True),
+                            errors='coerce')
+    scaled = (decimal * suffix.map(COUNT_SUFFIXES)).round()
+    counts[is_text] = np.where(suffix.notna(), scaled, plain)
+    return counts
+
+
+def hashtag_keys(hashtags):
+    """Chave de junção entre plataformas: sem '#', acentos, espaços e pontuação, em casefold.
+
+    '#Finados', '# finados' e 'Finados' resultam na mesma chave, assim como 'Enem 2024' e '#Enem2024'.
+    """
+    # Em object, o .str usa o re do Python: com o dtype string do pandas 3 (RE2), \W só considera
+    # ASCII e hashtags em outros alfabetos virariam chaves vazias
+    text = hashtags.fillna('').astype(str).astype(object)
+    return (text.str.normalize('NFKD')
+            .str.replace('[\u0300-\u036f]', '', regex=True)
+            .str.casefold()
+            .str.replace(r'[\W_]+', '', regex=True))
+
+
+def _scores(trends, method):
+    groups = [trends['snapshot_date'], trends['platform']]
+    if method == 'percentile':
+        return trends['count'].groupby(groups).rank(pct=True, method='average')
+    values = np.log1p(trends['count'].clip(lower=0))
+    grouped = values.groupby(groups)
+    std = grouped.transform('std')
+    return ((values - grouped.transform('mean')) / std.where(std > 0)).fillna(0).where(values.notna())
+
+
+@metrics.timed('trends.rank')
+def rank_trends(trends, method=RANK_METHOD):
+    """Tabela única das tendências de todas as plataformas, ordenada por snapshot e pontuação.
+
+    trends tem uma linha por (snapshot_date, platform, hashtag, count); snapshot_date é opcional.
+    A pontuação de cada plataforma segue method, e a pontuação final é a média entre as
+    plataformas com dados no snapshot. Uma hashtag ausente em uma dessas plataformas (ou com
+    contagem ilegível) recebe a menor pontuação da plataforma, então aparecer em várias delas
+    sobe a posição.
+    """
+    if method not in RANK_METHODS:
+        raise ValueError(f"Método de ranking desconhecido: {method}. Use {' ou '.join(RANK_METHODS)}.")
+
+    df = pd.DataFrame({
+        'snapshot_date': trends['snapshot_date'].astype(str) if 'snapshot_date' in trends else date.today().isoformat(),
+        'platform': trends['platform'].astype(str),
+        'hashtag': trends['hashtag'].astype(str).str.strip().str.replace(r'^#\s+', '#', regex=True),
+        'count': parse_counts(trends['count']),
+    }, index=trends.index)
+    df['key'] = hashtag_keys(df['hashtag'])
+    df = df[df['key'] != ''].reset_index(drop=True)
+    metrics.current().add(rows=len(df))
+    if df.empty:
+        return pd.DataFrame(columns=['snapshot_date', 'rank', 'hashtag', 'score', 'platforms'])
+
+    df['score'] = _scores(df, method)
+    groups = [df['snapshot_date'], df['platform']]
+    df['score'] = df['score'].fillna(df['score'].groupby(groups).transform('min')).fillna(0)
+
+    # Grafias da mesma hashtag na mesma plataforma ficam com a maior contagem
+    wide = df.groupby(['snapshot_date', 'key', 'platform'])[['count', 'score']].max().unstack('platform')
+    platforms = [platform for platform in PLATFORMS if platform in df['platform'].unique()]
+    platforms += sorted(set(df['platform'].unique()) - set(platforms))
+    counts = wide['count'].reindex(columns=platforms)
+    scores = wide['score'].reindex(columns=platforms)
+
+    present = scores.notna()
+    # Plataformas sem dados no snapshot ficam fora da média; nas demais, ausência vale o mínimo
+    scores = scores.fillna(scores.groupby(level='snapshot_date').transform('min'))
+
+    # A grafia exibida é a da plataforma em que a hashtag pontuou mais
+    names = (df.sort_values('score', ascending=False, kind='stable')
+             .drop_duplicates(['snapshot_date', 'key'])
+             .set_index(['snapshot_date', 'key'])['hashtag'])
+
+    ranked = pd.DataFrame({
+        'hashtag': names.reindex(wide.index),
+        'score': scores.mean(axis=1).round(4),
+        'platforms': present.dot(pd.Index(platforms) + ',').str.rstrip(','),
+        'platform_count': present.sum(axis=1),
+    }, index=wide.index)
+    for platform in platforms:
+        ranked[f'count_{platform}'] = counts[platform].round().astype('Int64')
+        ranked[f'score_{platform}'] = wide['score'][platform].round(4)
+
+    ranked = ranked.reset_index().sort_values(
+        ['snapshot_date', 'score', 'platform_count', 'hashtag'], ascending=[True, False, False, True]
+    )
+    ranked.insert(1, 'rank', ranked.groupby('snapshot_date').cumcount() + 1)
+    return ranked.drop(columns=['key', 'platform_count']).reset_index(drop=True)
+
+
+def trends_frame(data_by_platform, snapshot_date=None):
+    """Junta as linhas [hashtag, contagem] de cada plataforma em um DataFrame longo."""
+    frames = []
+    for platform, data in data_by_platform.items():
+        if data is None:
+            continue
+        frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(list(data))
+        if frame.empty:
+            continue
+        frames.append(pd.DataFrame({'platform': platform, 'hashtag': frame.iloc[:, 0].values,
+                                    'count': frame.iloc[:, 1].values}))
+    if not frames:
+        return pd.DataFrame(columns=['snapshot_date', 'platform', 'hashtag', 'count'])
+    df = pd.concat(frames, ignore_index=True)
+    df.insert(0, 'snapshot_date', (snapshot_date or date.today()).isoformat()
+              if not isinstance(snapshot_date, str) else snapshot_date)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ranking unificado das tendências gravadas no histórico.")
+    parser.add_argument("filename", nargs="?", default="ranked_trends.tsv", help="Arquivo TSV de saída.")
+    parser.add_argument("--since", help="Considera snapshots a partir dessa data (AAAA-MM-DD).")
+    parser.add_argument("--method", choices=RANK_METHODS, default=RANK_METHOD, help="Escala de cada plataforma.")
+    args = parser.parse_args()
+
+    import storage
+    ranked = rank_trends(storage.read('trends', since=args.since), args.method)
+    ranked.to_csv(args.filename, sep='\t', index=False)
+    logger.info(f"{len(ranked)} tendências ranqueadas salvas em {args.filename}")
@@ -0,0 +1,109 @@
+import logging
+import pandas as pd
+import metrics
+import trendscache
+import trendsscheduler
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# O Google Trends aceita no máximo 5 termos por consulta
+MAX_KEYWORDS = 5
+
+
+def make_batches(keywords, anchor=None):
+    """Divide os termos em lotes de até 5.
+
+    Com mais de 5 termos, cada lote leva um termo âncora (o primeiro, se nenhum for
+    informado) para que os valores de lotes diferentes possam ser reescalados.
+    Retorna (lotes, âncora), com âncora None quando há um único lote.
+    """
+    keywords = list(dict.fromkeys(keywords))  # Remove duplicados mantendo a ordem
+    if len(keywords) <= MAX_KEYWORDS:
+        return [keywords], None
+
+    anchor = anchor or keywords[0]
+    others = [keyword for keyword in keywords if keyword != anchor]
+    size = MAX_KEYWORDS - 1
+    batches = [[anchor] + others[i:i + size] for i in range(0, len(others), size)]
+    return batches, anchor
+
+
+def _mean_factor(reference, batch_anchor, anchor):
+    reference, batch_anchor = reference.mean(), batch_anchor.mean()
+    if pd.notna(reference) and pd.notna(batch_anchor) and reference and batch_anchor:
+        return reference / batch_anchor
+    logger.warning(f"Termo âncora '{anchor}' sem interesse em um dos lotes; valores não reescalados.")
+    return 1
+
+
+def _rescale(frames, anchor, by_row=False):
+    """Coloca todos os lotes na escala do primeiro, usando o termo âncora.
+
+    Na série temporal o fator é a razão entre as médias da âncora. Por região, cada lote
+    divide o interesse entre os seus termos, então a âncora muda de estado para estado e
+    o fator é calculado linha a linha; regiões em que a âncora é zero ou falta em algum
+    dos lotes usam o fator das médias.
+    """
+    if anchor is None:
+        return frames[0]
+
+    reference = frames[0][anchor]
+    combined = frames[0]
+    for frame in frames[1:]:
+        factor = _mean_factor(reference, frame[anchor], anchor)
+        if by_row:
+            ratio = reference.reindex(frame.index) / frame[anchor]
+            valid = ratio.notna() & (ratio > 0) & (ratio != float('inf'))
+            factor = ratio.where(valid, factor)
+            combined = combined.join(frame.drop(columns=[anchor]).mul(factor, axis=0), how='outer')
+        else:
+            combined = combined.join(frame.drop(columns=[anchor]) * factor, how='outer')
+    return combined
+
+
+def _query(pytrends, batch, fetch, payload):
+    pytrends.build_payload(batch, **payload)
+    return fetch()
+
+
+def _run_batches(pytrends, keywords, fetch, kind, anchor=None, priority=trendsscheduler.PRIORITY_NORMAL,
+                 extra=None, by_row=False, **payload):
+    batches, anchor = make_batches(keywords, anchor)
+    frames = []
+    for batch in batches:
+        logger.info(f"Consultando lote de termos: {', '.join(batch)}")
+        # build_payload e a leitura formam um único job, no ritmo do agendador; o resultado
+        # de cada lote fica em cache conforme o período consultado
+        with metrics.span('google_trends.batch', kind=kind) as stage:
+            frame = trendscache.cached(
+                lambda: trendsscheduler.run(_query, pytrends, batch, fetch, payload, priority=priority),
+                kind, batch, payload['geo'], payload['timeframe'], payload['cat'], **(extra or {})
+            )
+            stage.add(rows=len(frame))
+        if frame.empty:
+            frame = pd.DataFrame(columns=batch)
+        frames.append(frame.drop(columns=['isPartial'], errors='ignore').astype(float))
+    combined = _rescale(frames, anchor, by_row)
+    # Garante uma coluna por termo, na ordem pedida, mesmo sem dados
+    return combined.reindex(columns=list(dict.fromkeys(keywords))).fillna(0)
+
+
+def interest_over_time(pytrends, keywords, timeframe='today 5-y', geo='', cat=0, anchor=None,
+                       priority=trendsscheduler.PRIORITY_NORMAL):
+    """interest_over_time para qualquer número de termos, em lotes de 5 com reescala pela âncora."""
+    return _run_batches(pytrends, keywords, pytrends.interest_over_time, 'interest_over_time', anchor, priority,
+                        cat=cat, timeframe=timeframe, geo=geo)
+
+
+def interest_by_region(pytrends, keywords, timeframe='today 5-y', geo='', cat=0, resolution='REGION', anchor=None,
+                       priority=trendsscheduler.PRIORITY_NORMAL):
+    """interest_by_region para qualquer número de termos, em lotes de 5 com reescala pela âncora."""
+    def fetch():
+        # Indexa pelo código da região (ex.: 'BR-SP') em vez do nome por extenso
+        frame = pytrends.interest_by_region(resolution=resolution, inc_geo_code=True)
+        return frame.set_index('geoCode') if 'geoCode' in frame.columns else frame
+
+    return _run_batches(pytrends, keywords, fetch, 'interest_by_region', anchor, priority,
+                        extra={'resolution': resolution}, by_row=True, cat=cat, timeframe=timeframe, geo=geo)
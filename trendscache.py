@@ -0,0 +1,152 @@
+import os
+import time
+import json
+import pickle
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+import metrics
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.environ.get("TRENDS_CACHE_PATH", os.path.join(".cache", "trends.sqlite"))
+MAX_ENTRIES = int(os.environ.get("TRENDS_CACHE_MAX_ENTRIES", "5000"))
+
+# Validade de cada resultado conforme o período consultado: séries curtas mudam rápido,
+# séries longas quase não mudam ao longo do dia
+TTL_BY_TIMEFRAME = {
+    'now 1-H': 5 * 60,
+    'now 4-H': 15 * 60,
+    'now 1-d': 30 * 60,
+    'now 7-d': 60 * 60,
+    'today 1-m': 6 * 3600,
+    'today 3-m': 6 * 3600,
+    'today 12-m': 24 * 3600,
+    'today 5-y': 24 * 3600,
+    'all': 7 * 24 * 3600,
+}
+DEFAULT_TTL = 60 * 60
+
+
+def ttl_for(timeframe):
+    """Tempo de validade, em segundos, para um período do Google Trends."""
+    return TTL_BY_TIMEFRAME.get(timeframe, DEFAULT_TTL)
+
+
+def make_key(kind, keywords=(), geo='', timeframe='', cat=0, **extra):
+    """Chave do cache: tipo de consulta, termos, região, período, categoria e demais parâmetros."""
+    return json.dumps([kind, list(keywords), geo, timeframe, cat, sorted(extra.items())], ensure_ascii=False)
+
+
+class TrendsCache:
+    """Cache persistente em SQLite com validade por período e descarte LRU acima de max_entries."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+                " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # Confirma a transação ao final do bloco
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Retorna o valor em cache ou None se não existir ou estiver vencido."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                metrics.count('google_trends.cache', result='miss')
+                return None
+            if row[1] < now:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._stats['misses'] += 1
+                self._stats['expired'] += 1
+                metrics.count('google_trends.cache', result='expired')
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._stats['hits'] += 1
+            metrics.count('google_trends.cache', result='hit')
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        """Guarda um valor e descarta os menos usados recentemente acima do limite."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(value), now + ttl, now)
+            )
+            excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)", (excess,)
+                )
+                self._stats['evicted'] += excess
+
+    def get_or_fetch(self, key, fetch, ttl):
+        """Retorna o valor em cache ou executa fetch() e guarda o resultado."""
+        value = self.get(key)
+        if value is None:
+            value = fetch()
+            if value is not None:
+                self.set(key, value, ttl)
+        return value
+
+    def clear(self):
+        """Remove todas as respostas guardadas."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        """Contadores de acertos, faltas, vencidos e descartados."""
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / total, 3) if total else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Retorna o cache compartilhado do processo, criando-o na primeira chamada."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TrendsCache()
+        return _cache
+
+
+def cached(fetch, kind, keywords=(), geo='', timeframe='', cat=0, ttl=None, **extra):
+    """Executa fetch() apenas se o resultado para esses parâmetros não estiver em cache."""
+    key = make_key(kind, keywords, geo, timeframe, cat, **extra)
+    return get_cache().get_or_fetch(key, fetch, ttl if ttl is not None else ttl_for(timeframe))
+
+
+def stats():
+    """Contadores do cache compartilhado."""
+    return get_cache().stats()
@@ -0,0 +1,182 @@
+import os
+import time
+import heapq
+import random
+import logging
+import threading
+import itertools
+from concurrent.futures import Future
+import metrics
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Vazão sustentada (requisições por segundo) e rajada máxima aceitas pelo Google Trends
+RATE = float(os.environ.get("TRENDS_RATE", "0.2"))
+BURST = int(os.environ.get("TRENDS_BURST", "3"))
+MAX_RETRIES = int(os.environ.get("TRENDS_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.environ.get("TRENDS_BACKOFF_BASE", "30"))
+BACKOFF_MAX = float(os.environ.get("TRENDS_BACKOFF_MAX", "900"))
+
+# Prioridades mais baixas são atendidas primeiro
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+
+class TokenBucket:
+    """Balde de fichas: libera até `capacity` requisições em rajada e `rate` por segundo depois."""
+
+    def __init__(self, rate=RATE, capacity=BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Bloqueia até haver uma ficha disponível e a consome."""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self):
+        """Esvazia o balde, para que a próxima requisição espere o reabastecimento."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0)
+
+
+def is_rate_limited(error):
+    """Verifica se a exceção do pytrends/requests corresponde a um HTTP 429."""
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) == 429:
+        return True
+    return type(error).__name__ == 'TooManyRequestsError' or '429' in str(error)
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'headers', {}).get('Retry-After') if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class TrendsScheduler:
+    """Fila de prioridade das consultas ao Google Trends, executadas no ritmo do TokenBucket.
+
+    Cada job deve ser atômico (build_payload + leitura), pois o objeto TrendReq guarda estado
+    entre as chamadas. Os jobs rodam em uma única thread, em ordem de prioridade e chegada.
+    """
+
+    def __init__(self, rate=RATE, capacity=BURST, max_retries=MAX_RETRIES):
+        self.bucket = TokenBucket(rate, capacity)
+        self.max_retries = max_retries
+        self._queue = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {'queued': 0, 'in_flight': 0, 'throttled': 0, 'completed': 0, 'failed': 0}
+        self._worker = threading.Thread(target=self._run, name="trends-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, func, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """Enfileira uma consulta e retorna um Future com o resultado."""
+        future = Future()
+        with self._cond:
+            heapq.heappush(self._queue, (priority, next(self._counter), future, func, args, kwargs))
+            self._stats['queued'] += 1
+            self._cond.notify()
+        return future
+
+    def run(self, func, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """Enfileira uma consulta e espera o resultado."""
+        return self.submit(func, *args, priority=priority, **kwargs).result()
+
+    def stats(self):
+        """Contadores de consultas na fila, em execução, limitadas (429), concluídas e com falha."""
+        with self._cond:
+            return dict(self._stats)
+
+    def _update(self, **deltas):
+        with self._cond:
+            for key, delta in deltas.items():
+                self._stats[key] += delta
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, future, func, args, kwargs = heapq.heappop(self._queue)
+            self._update(queued=-1, in_flight=1)
+            if not future.set_running_or_notify_cancel():
+                self._update(in_flight=-1)
+                continue
+            try:
+                result = self._execute(func, args, kwargs)
+            except Exception as e:
+                self._update(in_flight=-1, failed=1)
+                future.set_exception(e)
+            else:
+                self._update(in_flight=-1, completed=1)
+                future.set_result(result)
+
+    def _execute(self, func, args, kwargs):
+        with metrics.span('google_trends.request') as stage:
+            return self._attempt(stage, func, args, kwargs)
+
+    def _attempt(self, stage, func, args, kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == self.max_retries:
+                    raise
+                self._update(throttled=1)
+                stage.add(retries=1)
+                self.bucket.drain()
+                # Backoff exponencial com jitter, respeitando o Retry-After se houver
+                backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(backoff / 2, backoff)
+                logger.warning(f"Google Trends respondeu 429. Nova tentativa em {delay:.0f}s "
+                               f"({attempt + 1}/{self.max_retries}).")
+                time.sleep(delay)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Retorna o agendador compartilhado do processo, criando-o na primeira chamada."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = TrendsScheduler()
+        return _scheduler
+
+
+def run(func, *args, priority=PRIORITY_NORMAL, **kwargs):
+    """Executa uma consulta ao Google Trends pelo agendador compartilhado."""
+    return get_scheduler().run(func, *args, priority=priority, **kwargs)
+
+
+def stats():
+    """Contadores do agendador compartilhado."""
+    return get_scheduler().stats()